@@ -0,0 +1,45 @@
+import os
+import time
+from typing import Callable, Optional, Tuple, Type, TypeVar, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3 import Retry
+
+T = TypeVar("T")
+
+# Answered while the server is overloaded or failing, so the same request may succeed later on
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+
+class RetryableError(Exception):
+    pass
+
+
+def get_base_url(variable: str, default: str) -> str:
+    # Overridable, so a local server can stand in for the real one
+    return os.environ.get(variable, default).rstrip("/")
+
+
+def create_session(pool_size: int, max_retries: Union[int, Retry] = 0) -> requests.Session:
+    # Meant to be shared by every thread, so connections are kept alive and reused
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_maxsize=pool_size, max_retries=max_retries)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def retry_with_backoff(attempt: Callable[[], T], retry_on: Tuple[Type[BaseException], ...], retries: int,
+                       backoff: float, on_retry: Optional[Callable[[BaseException, float], None]] = None) -> T:
+    # Waits backoff seconds before the first retry, doubled on every following one; the last error is raised
+    for retry in range(retries + 1):
+        try:
+            return attempt()
+        except retry_on as e:
+            if retry >= retries:
+                raise
+            delay = backoff * 2 ** retry
+            if on_retry is not None:
+                on_retry(e, delay)
+            time.sleep(delay)
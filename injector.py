@@ -1,9 +1,25 @@
+import argparse
 import csv
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List, NamedTuple, Optional, Set, Tuple
 
 import requests
 
+from http_utils import RETRY_STATUS_CODES, RetryableError, create_session, get_base_url, retry_with_backoff
+
+API_URL = get_base_url("INJECTOR_API_URL", "https://api.horarios.barreiro.xyz")
+# Seconds to wait for every response
+REQUEST_TIMEOUT = 30
+# Answered before the request is processed, so they are also safe to retry on requests which are not idempotent
+NOT_PROCESSED_STATUS_CODES = (429, 503)
+# Answered when the entity already exists, e.g. if it was created but the response got lost before a retry
+ALREADY_DONE_STATUS_CODES = (409,)
+
 headers = {
-    'Authorization': 'Bearer ...'
+    'Authorization': f"Bearer {os.environ.get('INJECTOR_API_TOKEN', '...')}",
 }
 
 maps = {
@@ -15,153 +31,301 @@ maps = {
 }
 
 
-def create():
-    with open('data/courses.csv', encoding="utf8") as csvfile:
-        reader = csv.reader(csvfile, delimiter=',')
-        next(reader)
-        for row in reader:
-            url = 'https://api.horarios.barreiro.xyz/course/create/etse'
-            course = {
-                'code': row[1],
-                'name': row[2],
-                'period': maps[row[4]],
-            }
-            if row[3]:
-                course['shortName'] = row[3]
-            x = requests.post(url, headers=headers, json=course)
-            print(x.text)
+class InjectionRequest(NamedTuple):
+    # Unique and stable across runs, so completed requests can be skipped when resuming
+    key: str
+    path: str
+    body: Dict
+    # Keys of the requests which must succeed first, like the course of an edition
+    depends_on: Tuple[str, ...] = ()
+    # Whether posting it again is harmless, which is not the case when identical requests are posted on purpose
+    idempotent: bool = True
 
 
-def set_status():
-    with open('data/courses.csv', encoding="utf8") as csvfile:
-        reader = csv.reader(csvfile, delimiter=',')
-        next(reader)
-        for row in reader:
-            url = 'https://api.horarios.barreiro.xyz/course/set-status/etse'
-            course = {
-                'code': row[1],
-                'status': 'A',
-            }
-            x = requests.post(url, headers=headers, json=course)
-            print(x.text)
+class InjectionResult:
+    DONE = "done"
+    ALREADY_DONE = "already done"
+    FAILED = "failed"
+    BLOCKED = "blocked"
 
 
-def add_staff():
-    with open('data/courses.csv', encoding="utf8") as csvfile:
+def read_csv_rows(file_name: str) -> List[List[str]]:
+    with open(file_name, encoding="utf8") as csvfile:
         reader = csv.reader(csvfile, delimiter=',')
         next(reader)
-        for row in reader:
-            url = 'https://api.horarios.barreiro.xyz/course/add-staff/etse'
-            course = {
-                'code': row[1],
-                'user': 'diego.barreiro.perez@rai.usc.es',
-            }
-            x = requests.post(url, headers=headers, json=course)
-            print(x.text)
+        return list(reader)
 
 
-def create_editions():
-    with open('data/courses.csv', encoding="utf8") as csvfile:
-        reader = csv.reader(csvfile, delimiter=',')
-        next(reader)
-        for row in reader:
-            url = f'https://api.horarios.barreiro.xyz/course/create-edition/{row[1]}'
-            course = {
-                'edition': '2023-2024',
-            }
-            x = requests.post(url, headers=headers, json=course)
-            print(x.text)
+def create() -> List[InjectionRequest]:
+    requests_to_inject = []
+    for row in read_csv_rows('data/courses.csv'):
+        course = {
+            'code': row[1],
+            'name': row[2],
+            'period': maps[row[4]],
+        }
+        if row[3]:
+            course['shortName'] = row[3]
+        requests_to_inject.append(InjectionRequest(f"courses:{row[1]}", 'course/create/etse', course))
+    return requests_to_inject
 
 
-def create_session_groups():
-    with open('data/session_groups.csv', encoding="utf8") as csvfile:
-        reader = csv.reader(csvfile, delimiter=',')
-        next(reader)
-        for row in reader:
-            url = f'https://api.horarios.barreiro.xyz/course/create-session-group/{row[0]}'
-            course = {
-                'edition': '2023-2024',
-                'sessionType': row[1],
-                'duration': int(row[2]) * 60,
-                'numPerWeek': int(row[3]),
-                'numGroups': int(row[4]),
-            }
-            x = requests.post(url, headers=headers, json=course)
-            print(x.text)
+def set_status() -> List[InjectionRequest]:
+    requests_to_inject = []
+    for row in read_csv_rows('data/courses.csv'):
+        course = {
+            'code': row[1],
+            'status': 'A',
+        }
+        requests_to_inject.append(InjectionRequest(f"course-status:{row[1]}", 'course/set-status/etse', course,
+                                                   (f"courses:{row[1]}",)))
+    return requests_to_inject
 
 
-def include():
-    with open('data/courses.csv', encoding="utf8") as csvfile:
-        reader = csv.reader(csvfile, delimiter=',')
-        next(reader)
-        for row in reader:
-            url = f'https://api.horarios.barreiro.xyz/degree/include-course/{row[5]}'
-            course = {
-                'course': row[1],
-                'year': int(row[0]),
-            }
-            x = requests.post(url, headers=headers, json=course)
-            print(x.text)
+def add_staff() -> List[InjectionRequest]:
+    requests_to_inject = []
+    for row in read_csv_rows('data/courses.csv'):
+        course = {
+            'code': row[1],
+            'user': 'diego.barreiro.perez@rai.usc.es',
+        }
+        requests_to_inject.append(InjectionRequest(f"course-staff:{row[1]}", 'course/add-staff/etse', course,
+                                                   (f"courses:{row[1]}",)))
+    return requests_to_inject
+
 
+def create_editions() -> List[InjectionRequest]:
+    requests_to_inject = []
+    for row in read_csv_rows('data/courses.csv'):
+        course = {
+            'edition': '2023-2024',
+        }
+        requests_to_inject.append(InjectionRequest(f"editions:{row[1]}", f'course/create-edition/{row[1]}', course,
+                                                   (f"courses:{row[1]}",)))
+    return requests_to_inject
 
-def create_areas():
+
+def create_session_groups() -> List[InjectionRequest]:
+    requests_to_inject = []
+    # Identical rows are injected once each, as they always were
+    occurrences: Dict[str, int] = {}
+    for row in read_csv_rows('data/session_groups.csv'):
+        row_key = ":".join(row[:5])
+        occurrences[row_key] = occurrences.get(row_key, 0) + 1
+        course = {
+            'edition': '2023-2024',
+            'sessionType': row[1],
+            'duration': int(row[2]) * 60,
+            'numPerWeek': int(row[3]),
+            'numGroups': int(row[4]),
+        }
+        requests_to_inject.append(InjectionRequest(f"session-groups:{row_key}:{occurrences[row_key]}",
+                                                   f'course/create-session-group/{row[0]}', course,
+                                                   (f"editions:{row[0]}",), idempotent=False))
+    return requests_to_inject
+
+
+def include() -> List[InjectionRequest]:
+    requests_to_inject = []
+    for row in read_csv_rows('data/courses.csv'):
+        course = {
+            'course': row[1],
+            'year': int(row[0]),
+        }
+        requests_to_inject.append(InjectionRequest(f"degree-courses:{row[5]}:{row[1]}",
+                                                   f'degree/include-course/{row[5]}', course,
+                                                   (f"courses:{row[1]}",)))
+    return requests_to_inject
+
+
+def create_areas() -> List[InjectionRequest]:
     buildings = {
         '0adfb5b9-5cbb-472f-82a5-94c7a3b3a404': (["Bloque IV"], [0]),
         '2ba481e6-8ddb-4842-b40d-e993024d3298': (["Enxeñaría Química", "Docencia"], [-1, 0, 1, 2, 3]),
         '316e42cf-f6bc-4742-a980-e9d10b7628f1': ([], [-1, 0, 1]),
     }
 
+    requests_to_inject = []
     for building_code, data in buildings.items():
         sectors, floors = data
 
         for sector in sectors:
-            url = f'https://api.horarios.barreiro.xyz/building/add-sector/{building_code}'
             data = {
                 'sector': sector,
             }
-            x = requests.post(url, headers=headers, json=data)
-            print(x.text)
+            requests_to_inject.append(InjectionRequest(f"sectors:{building_code}:{sector}",
+                                                       f'building/add-sector/{building_code}', data))
 
         for floor in floors:
-            url = f'https://api.horarios.barreiro.xyz/building/add-floor/{building_code}'
             data = {
                 'floor': floor,
             }
-            x = requests.post(url, headers=headers, json=data)
-            print(x.text)
+            requests_to_inject.append(InjectionRequest(f"floors:{building_code}:{floor}",
+                                                       f'building/add-floor/{building_code}', data))
+    return requests_to_inject
 
 
-def create_rooms():
-    with open('data/zonificacion.csv', encoding="utf8") as csvfile:
-        reader = csv.reader(csvfile, delimiter=',')
-        next(reader)
-        for row in reader:
-            url = f'https://api.horarios.barreiro.xyz/building/create-room/{row[4]}'
-            tmp = row[1].split("/")
-            code = tmp[len(tmp) - 1].replace(".", "")
-            data = {
-                'code': code,
-                'name': row[2],
-            }
+def create_rooms() -> List[InjectionRequest]:
+    requests_to_inject = []
+    for row in read_csv_rows('data/zonificacion.csv'):
+        tmp = row[1].split("/")
+        code = tmp[len(tmp) - 1].replace(".", "")
+        data = {
+            'code': code,
+            'name': row[2],
+        }
+
+        depends_on = []
+        if row[3]:
+            data['capacity'] = int(row[3])
+        if row[5]:
+            data['floor'] = int(row[5])
+            depends_on.append(f"floors:{row[4]}:{data['floor']}")
+        if row[6]:
+            data['sector'] = row[6]
+            depends_on.append(f"sectors:{row[4]}:{row[6]}")
+
+        requests_to_inject.append(InjectionRequest(f"rooms:{row[4]}:{code}", f'building/create-room/{row[4]}', data,
+                                                   tuple(depends_on)))
+    return requests_to_inject
+
+
+# In dependency order: every stage only depends on requests of the stages before it
+STAGES: Dict[str, Callable[[], List[InjectionRequest]]] = {
+    "courses": create,
+    "course-status": set_status,
+    "course-staff": add_staff,
+    "editions": create_editions,
+    "session-groups": create_session_groups,
+    "degree-courses": include,
+    "areas": create_areas,
+    "rooms": create_rooms,
+}
+
+
+class InjectionState:
+    # Keys of the completed requests, appended as they finish, so an interrupted run resumes where it stopped
+    def __init__(self, path: Path):
+        self.__path = path
+        self.__lock = threading.Lock()
+        self.completed: Set[str] = set()
+        if path.exists():
+            with open(path, encoding="utf8") as f:
+                self.completed = {line.strip() for line in f if line.strip()}
+
+    def complete(self, key: str):
+        with self.__lock:
+            self.completed.add(key)
+            with open(self.__path, 'a', encoding="utf8") as f:
+                f.write(f"{key}\n")
+
 
-            if row[3]:
-                data['capacity'] = int(row[3])
-            if row[5]:
-                data['floor'] = int(row[5])
-            if row[6]:
-                data['sector'] = row[6]
+class BulkInjector:
+    def __init__(self, state: InjectionState, jobs: int, retries: int, backoff: float):
+        self.__state = state
+        self.__jobs = jobs
+        self.__retries = retries
+        self.__backoff = backoff
 
-            x = requests.post(url, headers=headers, json=data)
-            print(x.text)
+        self.__session = create_session(jobs)
+        self.__session.headers.update(headers)
+
+        self.failures: List[Tuple[str, str]] = []
+        self.summary: Dict[str, Dict[str, int]] = {}
+
+    def __post_once(self, request: InjectionRequest) -> Tuple[str, Optional[str]]:
+        try:
+            response = self.__session.post(f"{API_URL}/{request.path}", json=request.body, timeout=REQUEST_TIMEOUT)
+        except requests.ConnectTimeout as e:
+            # Never reached the server
+            raise RetryableError(repr(e)) from e
+        except (requests.ConnectionError, requests.Timeout) as e:
+            error, processed = repr(e), True
+        else:
+            if response.status_code // 100 == 2:
+                return InjectionResult.DONE, None
+            if response.status_code in ALREADY_DONE_STATUS_CODES:
+                return InjectionResult.ALREADY_DONE, None
+            error = f"HTTP {response.status_code}: {response.text.strip()[:200]}"
+            if response.status_code not in RETRY_STATUS_CODES:
+                return InjectionResult.FAILED, error
+            processed = response.status_code not in NOT_PROCESSED_STATUS_CODES
+
+        if processed and not request.idempotent:
+            # The server may have applied it, and a retry could apply it twice
+            return InjectionResult.FAILED, f"{error}; it may have been applied, check it before injecting it again"
+        raise RetryableError(error)
+
+    def __post(self, request: InjectionRequest) -> Tuple[str, Optional[str]]:
+        try:
+            return retry_with_backoff(lambda: self.__post_once(request), (RetryableError,), self.__retries,
+                                      self.__backoff)
+        except RetryableError as e:
+            return InjectionResult.FAILED, f"{e} after {self.__retries + 1} attempts"
+
+    def __inject(self, request: InjectionRequest) -> str:
+        # Dependencies are completed by the stages before, either in this run or in an earlier one
+        missing = [key for key in request.depends_on if key not in self.__state.completed]
+        if missing:
+            self.failures.append((request.key, f"blocked by {', '.join(missing)}, not completed"))
+            return InjectionResult.BLOCKED
+
+        result, error = self.__post(request)
+        if result == InjectionResult.FAILED:
+            self.failures.append((request.key, error))
+            print(f"Failed {request.key}: {error}")
+        else:
+            self.__state.complete(request.key)
+        return result
+
+    def run_stage(self, stage: str, requests_to_inject: List[InjectionRequest]):
+        pending = [request for request in requests_to_inject if request.key not in self.__state.completed]
+        counts = {"resumed": len(requests_to_inject) - len(pending)}
+        print(f"Injecting {stage}: {len(pending)} requests ({counts['resumed']} already completed)")
+
+        with ThreadPoolExecutor(max_workers=self.__jobs, thread_name_prefix="injector") as executor:
+            for result in executor.map(self.__inject, pending):
+                counts[result] = counts.get(result, 0) + 1
+        self.summary[stage] = counts
+
+    def print_summary(self):
+        columns = ["resumed", InjectionResult.DONE, InjectionResult.ALREADY_DONE, InjectionResult.FAILED,
+                   InjectionResult.BLOCKED]
+        print(f"{'Stage':<16}" + "".join(f"{column.capitalize():>14}" for column in columns))
+        for stage, counts in self.summary.items():
+            print(f"{stage:<16}" + "".join(f"{counts.get(column, 0):>14}" for column in columns))
+        for key, error in self.failures:
+            print(f"Not injected {key}: {error}")
+
+
+def inject(stages: List[str], jobs: int, retries: int, backoff: float, state_file: Path) -> bool:
+    injector = BulkInjector(InjectionState(state_file), jobs, retries, backoff)
+    # Stages always run in dependency order, whatever order they were asked in
+    for stage, build_requests in STAGES.items():
+        if stage in stages:
+            injector.run_stage(stage, build_requests())
+    injector.print_summary()
+    return not injector.failures
 
 
 if __name__ == "__main__":
-    # create()
-    # set_status()
-    # add_staff()
-    # create_editions()
-    # create_session_groups()
-    # include()
-    # create_areas()
-    # create_rooms()
-    pass
+    parser = argparse.ArgumentParser(
+        prog="TFG Timetable Data Injector",
+        description="Load courses, editions, session groups and rooms into the API from the CSV files in data."
+    )
+    parser.add_argument('stages', nargs='*',
+                        help=f"Stages to inject, out of {', '.join(STAGES)} (all by default); they always run in "
+                             f"dependency order")
+    parser.add_argument('-j', '--jobs', type=int, default=8, help='Concurrent requests')
+    parser.add_argument('-r', '--retries', type=int, default=5, help='Retries of every failed request')
+    parser.add_argument('-b', '--backoff', type=float, default=1.,
+                        help='Seconds before the first retry, doubled on every following one')
+    parser.add_argument('-s', '--state-file', type=Path, default=Path("data/injector_state.txt"),
+                        help='Keys of the completed requests, skipped when resuming; remove it to inject again')
+
+    args = parser.parse_args()
+    unknown_stages = [stage for stage in args.stages if stage not in STAGES]
+    if unknown_stages:
+        parser.error(f"Unknown stages: {', '.join(unknown_stages)}")
+    if not inject(args.stages or list(STAGES), args.jobs, args.retries, args.backoff, args.state_file):
+        raise SystemExit(1)
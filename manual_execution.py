@@ -1,9 +1,33 @@
 import argparse
+import gzip
+import io
 import os
+import shutil
+import tempfile
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import IO, Callable, Dict, Iterator, List, Optional, Tuple, TypeVar
 
 import requests
+from urllib3 import Retry
+
+from http_utils import RETRY_STATUS_CODES, RetryableError, create_session, retry_with_backoff
+
+T = TypeVar("T")
+
+__CHUNK_SIZE = 1024 * 1024
+__TRANSFER_THREADS = int(os.environ.get("TFG_TRANSFER_THREADS", "4"))
+__TRANSFER_RETRIES = int(os.environ.get("TFG_TRANSFER_RETRIES", "5"))
+# Seconds before the first retry, doubled on every following one
+__TRANSFER_BACKOFF = float(os.environ.get("TFG_TRANSFER_BACKOFF", "1"))
+# Connect and read timeouts, in seconds
+__TRANSFER_TIMEOUT = (10, 120)
+
+__http_session: Optional[requests.Session] = None
+__http_session_lock = threading.Lock()
 
 
 def get_api_url(path: str) -> str:
@@ -22,15 +46,177 @@ def get_api_key() -> str:
     return api_key
 
 
+def get_http_session() -> requests.Session:
+    # Used for both the API and the bucket
+    global __http_session
+    with __http_session_lock:
+        if __http_session is None:
+            # Only failed connections are retried here, as API requests were never sent; transfers retry on their own
+            retry = Retry(total=__TRANSFER_RETRIES, connect=__TRANSFER_RETRIES, read=0, status=0,
+                          backoff_factor=__TRANSFER_BACKOFF)
+            __http_session = create_session(__TRANSFER_THREADS, retry)
+        return __http_session
+
+
+class TransferProgress:
+    # Percentage step between progress reports, and files smaller than this only report once done
+    REPORT_STEP = 0.1
+    REPORT_MIN_SIZE = 8 * 1024 * 1024
+
+    def __init__(self, name: str, total_size: Optional[int]):
+        self.__name = name
+        self.__total_size = total_size
+        self.__transferred = 0
+        self.__next_report = self.REPORT_STEP
+        self.__lock = threading.Lock()
+
+    def add(self, size: int):
+        with self.__lock:
+            self.__transferred += size
+            if not self.__total_size or self.__total_size < self.REPORT_MIN_SIZE:
+                return
+            progress = self.__transferred / self.__total_size
+            if progress < self.__next_report or progress >= 1:
+                return
+            while self.__next_report <= progress:
+                self.__next_report += self.REPORT_STEP
+            print(f"{self.__name}: {progress:.0%} ({self.__transferred / 1024 / 1024:.1f}MB of "
+                  f"{self.__total_size / 1024 / 1024:.1f}MB)")
+
+
+class MultipartBody:
+    # Presigned POST form with the file as the last field, read from disk as it is sent instead of built in memory;
+    # its length is known upfront, as S3 does not accept chunked uploads
+    def __init__(self, fields: Dict, file_name: str, file: IO[bytes], file_size: int, progress: TransferProgress):
+        boundary = uuid.uuid4().hex
+        self.content_type = f"multipart/form-data; boundary={boundary}"
+        preamble = "".join(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'
+                           for name, value in fields.items())
+        preamble += f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{file_name}"\r\n\r\n'
+        preamble_bytes, epilogue_bytes = preamble.encode(), f"\r\n--{boundary}--\r\n".encode()
+
+        file.seek(0)
+        self.__parts: List[IO[bytes]] = [io.BytesIO(preamble_bytes), file, io.BytesIO(epilogue_bytes)]
+        self.__length = len(preamble_bytes) + file_size + len(epilogue_bytes)
+        self.__progress = progress
+        self.sent = 0
+
+    def __len__(self) -> int:
+        return self.__length
+
+    def read(self, size: int = -1) -> bytes:
+        data = b""
+        while self.__parts and (size < 0 or len(data) < size):
+            chunk = self.__parts[0].read(-1 if size < 0 else size - len(data))
+            if not chunk:
+                self.__parts.pop(0)
+                continue
+            data += chunk
+        self.sent += len(data)
+        self.__progress.add(len(data))
+        return data
+
+
+def with_retries(transfer: Callable[[], T], description: str) -> T:
+    retry_on = (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError, RetryableError)
+    try:
+        return retry_with_backoff(transfer, retry_on, __TRANSFER_RETRIES, __TRANSFER_BACKOFF,
+                                  lambda e, delay: print(f"Retrying to {description} in {delay:.1f}s: {e}"))
+    except retry_on as e:
+        raise RuntimeError(f"Failed to {description} after {__TRANSFER_RETRIES + 1} attempts: {e}") from e
+
+
+def check_transfer_response(response: requests.Response):
+    if response.status_code in RETRY_STATUS_CODES:
+        raise RetryableError(f"HTTP {response.status_code}")
+
+
+def get_artifact_name(file: Path) -> str:
+    return file.name[:-len(".gz")] if file.suffix == ".gz" else file.name
+
+
+@contextmanager
+def open_artifact(file: Path) -> Iterator[Tuple[IO[bytes], int]]:
+    # Compressed artifacts are uploaded decompressed, as upload policies do not allow setting the Content-Encoding;
+    # they are decompressed to a temporary file first, as the upload needs to know its length
+    if file.suffix != ".gz":
+        with open(file, 'rb') as f:
+            yield f, os.fstat(f.fileno()).st_size
+        return
+
+    with tempfile.TemporaryFile() as f:
+        with gzip.open(file, 'rb') as gz:
+            shutil.copyfileobj(gz, f, __CHUNK_SIZE)
+        yield f, f.tell()
+
+
+def find_asp_files(invocation_dir: Path) -> Dict[str, Path]:
+    asp_files: Dict[str, Path] = {}
+    # Sorted by modification time, so the latest one wins if both compressed and plain artifacts are present
+    for file in sorted(invocation_dir.iterdir(), key=lambda f: f.stat().st_mtime):
+        if file.is_file() and file.name.startswith("asp_") and file.name.endswith((".txt", ".txt.gz")):
+            asp_files[file.name[:file.name.index(".txt")]] = file
+    return asp_files
+
+
 def upload_s3_file(file: Path, url: str, fields: Dict):
-    with open(file, 'rb') as f:
-        files = {'file': (file.name, f)}
-        response = requests.post(url, data=fields, files=files)
+    artifact_name = get_artifact_name(file)
+
+    with open_artifact(file) as (f, file_size):
+        progress = TransferProgress(artifact_name, file_size)
+
+        def upload() -> requests.Response:
+            body = MultipartBody(fields, artifact_name, f, file_size, progress)
+            try:
+                response = get_http_session().post(url, data=body, headers={"Content-Type": body.content_type},
+                                                   timeout=__TRANSFER_TIMEOUT)
+                check_transfer_response(response)
+            except BaseException:
+                # The whole file is sent again if retried
+                progress.add(-body.sent)
+                raise
+            return response
+
+        response = with_retries(upload, f"upload {artifact_name}")
 
     if response.status_code != 204:
-        raise RuntimeError(f"Failed to upload {file.name}")
+        raise RuntimeError(f"Failed to upload {artifact_name}")
+
+    print(f"Uploaded {artifact_name}")
+
+
+def download_file(url: str, path: Path):
+    # Written next to the destination first, so an interrupted download never leaves a truncated file behind
+    partial_path = path.with_name(f"{path.name}.part")
+
+    def download():
+        with get_http_session().get(url, stream=True, timeout=__TRANSFER_TIMEOUT) as response:
+            check_transfer_response(response)
+            if response.status_code != 200:
+                raise RuntimeError(f"Failed to download {path.name}: HTTP {response.status_code}")
+
+            content_length = response.headers.get("Content-Length")
+            progress = TransferProgress(path.name, int(content_length) if content_length else None)
+            with open(partial_path, 'wb') as f:
+                for chunk in response.iter_content(__CHUNK_SIZE):
+                    f.write(chunk)
+                    progress.add(len(chunk))
+
+    with_retries(download, f"download {path.name}")
+    partial_path.replace(path)
+    print(f"Downloaded {path.name}")
+
+
+def upload_s3_files(uploads: List[Tuple[Path, Tuple[str, Dict]]]):
+    with ThreadPoolExecutor(max_workers=__TRANSFER_THREADS, thread_name_prefix="upload") as executor:
+        futures = [executor.submit(upload_s3_file, file, url, fields) for file, (url, fields) in uploads]
+        wait(futures)
 
-    print(f"Uploaded {file.name}")
+    failed = [future.exception() for future in futures if future.exception() is not None]
+    for exception in failed:
+        print(f"Could not upload: {exception}")
+    if failed:
+        raise RuntimeError(f"Failed to upload {len(failed)} of {len(uploads)} files")
 
 
 def api_create_manual_scheduler_execution(source_execution_id: str, alias: Optional[str] = None) -> Tuple[str, str]:
@@ -41,7 +227,7 @@ def api_create_manual_scheduler_execution(source_execution_id: str, alias: Optio
     if alias:
         body['alias'] = alias
 
-    response = requests.post(url, headers={'X-API-Key': get_api_key()}, json=body)
+    response = get_http_session().post(url, headers={'X-API-Key': get_api_key()}, json=body)
     data = response.json()
     if response.status_code // 200 > 2:
         raise RuntimeError(f"API Error: {data['message']}")
@@ -54,7 +240,7 @@ def api_retarget_manual_scheduler_execution(source_execution_id: str) -> Tuple[s
         'sourceExecutionId': source_execution_id,
     }
 
-    response = requests.post(url, headers={'X-API-Key': get_api_key()}, json=body)
+    response = get_http_session().post(url, headers={'X-API-Key': get_api_key()}, json=body)
     data = response.json()
     if response.status_code // 200 > 2:
         raise RuntimeError(f"API Error: {data['message']}")
@@ -73,7 +259,7 @@ def api_generate_manual_scheduler_execution_upload(execution_id: str,
     if additional_files:
         body['additionalFiles'] = additional_files
 
-    response = requests.post(url, headers={'X-API-Key': get_api_key()}, json=body)
+    response = get_http_session().post(url, headers={'X-API-Key': get_api_key()}, json=body)
     data = response.json()
     if response.status_code // 200 > 2:
         raise RuntimeError(f"API Error: {data['message']}")
@@ -95,7 +281,7 @@ def api_process_manual_scheduler_execution(execution_id: str) -> None:
         'executionId': execution_id,
     }
 
-    response = requests.post(url, headers={'X-API-Key': get_api_key()}, json=body)
+    response = get_http_session().post(url, headers={'X-API-Key': get_api_key()}, json=body)
     if response.status_code // 200 > 2:
         data = response.json()
         raise RuntimeError(f"API Error: {data['message']}")
@@ -110,9 +296,7 @@ def create_manual_execution(source_execution_id: str, alias: Optional[str] = Non
 
     execution_id, input_file_url = api_create_manual_scheduler_execution(source_execution_id, alias)
 
-    input_data = requests.get(input_file_url).text
-    with open(invocation_dir / 'input.json', 'w') as f:
-        f.write(input_data)
+    download_file(input_file_url, invocation_dir / 'input.json')
 
     with open(execution_id_file, 'w') as f:
         f.write(execution_id)
@@ -130,9 +314,7 @@ def retarget_manual_execution(source_execution_id: str):
     print("Retargeting and generating input.json; this may take a while...")
     execution_id, input_file_url = api_retarget_manual_scheduler_execution(source_execution_id)
 
-    input_data = requests.get(input_file_url).text
-    with open(invocation_dir / 'input.json', 'w') as f:
-        f.write(input_data)
+    download_file(input_file_url, invocation_dir / 'input.json')
 
     with open(execution_id_file, 'w') as f:
         f.write(execution_id)
@@ -150,19 +332,19 @@ def upload_manual_execution():
     with open(execution_id_file) as f:
         execution_id = f.read().strip()
 
-    asp_files = [f.replace(".txt", "") for f in os.listdir(invocation_dir)
-                 if (invocation_dir / f).is_file() and f.startswith("asp_") and f.endswith(".txt")]
+    asp_files = find_asp_files(invocation_dir)
 
-    output_file_url, additional_files_urls = api_generate_manual_scheduler_execution_upload(execution_id, asp_files)
+    output_file_url, additional_files_urls = api_generate_manual_scheduler_execution_upload(execution_id,
+                                                                                         list(asp_files))
 
+    uploads = []
     output_file = invocation_dir / 'output.json'
     if output_file.exists():
-        upload_s3_file(output_file, output_file_url[0], output_file_url[1])
+        uploads.append((output_file, output_file_url,))
+    for asp_filename, asp_file in asp_files.items():
+        uploads.append((asp_file, additional_files_urls[asp_filename],))
 
-    for asp_filename in asp_files:
-        asp_file_name = invocation_dir / f"{asp_filename}.txt"
-        additional_file_url = additional_files_urls[asp_filename]
-        upload_s3_file(asp_file_name, additional_file_url[0], additional_file_url[1])
+    upload_s3_files(uploads)
 
 
 def finalize_manual_execution():
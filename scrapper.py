@@ -1,18 +1,88 @@
+import argparse
 import csv
+import hashlib
 import json
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import date, timedelta
-from typing import List
+from html.parser import HTMLParser
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
 
 import requests
 from bs4 import BeautifulSoup
 
+from http_utils import create_session, get_base_url
+
+# A local server serving recorded pages can stand in for the USC one
+__BASE_URL = get_base_url("SCRAPE_BASE_URL", "https://matricula.usc.es")
+__CACHE_DIR = Path(os.environ.get("SCRAPE_CACHE_DIR", "data/scrape_cache"))
+__FETCH_THREADS = 4
+# Requests per second across all threads, to be polite with the USC servers
+__FETCH_RATE = 5.
+__FETCH_TIMEOUT = 30
+# Pages sent to each parsing process at once
+__PARSE_CHUNK_SIZE = 8
+
+# Course code, session type and group number, with the minutes it is scheduled for
+PageContent = Dict[str, Dict[str, Dict[int, int]]]
+
+
+class RateLimiter:
+    def __init__(self, rate: float):
+        self.__interval = 1. / rate
+        self.__next_request = time.monotonic()
+        self.__lock = threading.Lock()
+
+    def wait(self):
+        # Every caller reserves the next free request time, and sleeps outside the lock till then
+        with self.__lock:
+            now = time.monotonic()
+            request_time = max(now, self.__next_request)
+            self.__next_request = request_time + self.__interval
+        time.sleep(max(0., request_time - now))
+
+
+class ResponseCache:
+    # Pages are stored as fetched, next to the validators needed to ask the server whether they changed
+    def __init__(self, cache_dir: Path):
+        self.__cache_dir = cache_dir
+        self.__cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def __get_path(self, url: str, suffix: str) -> Path:
+        return self.__cache_dir / f"{hashlib.sha256(url.encode()).hexdigest()}{suffix}"
+
+    def contains(self, url: str) -> bool:
+        return self.__get_path(url, ".json").exists()
+
+    def get_metadata(self, url: str) -> Optional[Dict]:
+        path = self.__get_path(url, ".json")
+        if not path.exists():
+            return None
+        with open(path) as f:
+            return json.loads(f.read())
+
+    def get_content(self, url: str) -> bytes:
+        with open(self.__get_path(url, ".html"), 'rb') as f:
+            return f.read()
+
+    def put(self, url: str, content: bytes, metadata: Dict):
+        # Content first and metadata last, each replaced at once, so an interrupted run never leaves a broken entry
+        for suffix, data in ((".html", content,), (".json", json.dumps({"url": url, **metadata}).encode(),),):
+            path = self.__get_path(url, suffix)
+            partial_path = path.with_name(f"{path.name}.part")
+            with open(partial_path, 'wb') as f:
+                f.write(data)
+            partial_path.replace(path)
+
 
 def generate_url(d: date) -> str:
     faculty_code = 409  # etse
     academic_year = 73  # 2022-2023
 
-    return "https://matricula.usc.es/ServizosXML/Plantillas/actividades/Xsrm_Ocupacion_Dias.xml" \
+    return f"{__BASE_URL}/ServizosXML/Plantillas/actividades/Xsrm_Ocupacion_Dias.xml" \
            f"?Num_Organizacion_Nodo={faculty_code}" \
            f"&Num_Sistema_Ano_Academico={academic_year}" \
            "&Num_Sistema_Idioma=9" \
@@ -31,11 +101,132 @@ def generate_academic_year_dates() -> List[date]:
     return all_dates
 
 
-def get_schedule_content(d: date):
-    url = generate_url(d)
-    response = requests.get(url)
-    response.encoding = response.apparent_encoding
-    return BeautifulSoup(response.text, 'html.parser')
+def decode_page(content: bytes, encoding: Optional[str]) -> str:
+    # Stray bytes are replaced instead of failing the whole page, the same as requests does for response.text
+    return content.decode(encoding or "utf-8", errors="replace")
+
+
+def fetch_page(session: requests.Session, rate_limiter: RateLimiter, cache: ResponseCache, url: str,
+               refresh: bool) -> str:
+    metadata = cache.get_metadata(url)
+    if metadata is not None and not refresh:
+        return decode_page(cache.get_content(url), metadata["encoding"])
+
+    # Cached pages are only downloaded again if the server says they changed
+    headers = {}
+    if metadata is not None and metadata.get("etag"):
+        headers["If-None-Match"] = metadata["etag"]
+    if metadata is not None and metadata.get("lastModified"):
+        headers["If-Modified-Since"] = metadata["lastModified"]
+
+    rate_limiter.wait()
+    response = session.get(url, headers=headers, timeout=__FETCH_TIMEOUT)
+    if response.status_code == 304 and metadata is not None:
+        return decode_page(cache.get_content(url), metadata["encoding"])
+    response.raise_for_status()
+
+    # Detection gives nothing for an empty page
+    encoding = response.apparent_encoding or response.encoding or "utf-8"
+    cache.put(url, response.content, {
+        "etag": response.headers.get("ETag"),
+        "lastModified": response.headers.get("Last-Modified"),
+        "encoding": encoding,
+    })
+    return decode_page(response.content, encoding)
+
+
+def fetch_schedule_pages(dates: List[date], refresh: bool = False) -> List[str]:
+    # Dates already cached are read from disk, unless refreshing, so rebuilding only fetches the missing ones
+    cache = ResponseCache(__CACHE_DIR)
+    rate_limiter = RateLimiter(__FETCH_RATE)
+    urls = [generate_url(d) for d in dates]
+    missing_urls = [url for url in urls if not cache.contains(url)]
+    print(f"Fetching {len(urls) if refresh else len(missing_urls)} of {len(urls)} dates; "
+          f"{len(urls) - len(missing_urls)} already cached")
+
+    with create_session(__FETCH_THREADS, max_retries=3) as session, ThreadPoolExecutor(max_workers=__FETCH_THREADS) as executor:
+        return list(executor.map(lambda url: fetch_page(session, rate_limiter, cache, url, refresh), urls))
+
+
+def get_schedule_content(page: str) -> BeautifulSoup:
+    return BeautifulSoup(page, 'html.parser')
+
+
+def parse_activity(activity: str) -> Tuple[str, str, int]:
+    raw_data = activity.split("\n")[2].strip()[1:-1][12:].strip()
+    class_type, rest = raw_data.split(": ")
+    class_name, group = rest.split(" - ")
+    if class_type == "Clase":
+        pass
+    else:
+        raise RuntimeError(class_type)
+
+    class_name, class_code = class_name.rsplit(" ", 1)
+    class_code = class_code.replace("[", "").replace("]", "").strip()
+    group = group.replace("Grupo /", "").strip().replace("_inglés", "")
+    session_type, group_number = group.split("_")
+    return class_code, session_type, int(group_number)
+
+
+def add_class_time(output: PageContent, class_code: str, session_type: str, group_number: int):
+    if class_code not in output:
+        output[class_code] = {}
+    if session_type not in output[class_code]:
+        output[class_code][session_type] = {}
+    if group_number not in output[class_code][session_type]:
+        output[class_code][session_type][group_number] = 0
+    output[class_code][session_type][group_number] += 30
+
+
+class OccupancyParser(HTMLParser):
+    # Only looks at the cells of the occupancy table as tags stream by, instead of building the whole tree;
+    # attributes are unescaped by the same HTMLParser BeautifulSoup uses, so cells read exactly the same
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.output: PageContent = {}
+        self.__table_depth = 0
+        self.__in_class_cell = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "table":
+            if self.__table_depth or ("summary", "Ocupación") in attrs:
+                self.__table_depth += 1
+            return
+        if not self.__table_depth:
+            return
+
+        if tag == "td":
+            self.__in_class_cell = False
+            classes = (dict(attrs).get("class") or "").split()
+            if classes and all("hora" in cls for cls in classes):
+                return
+            if len(classes) != 1:
+                raise RuntimeError(classes)
+            cls = classes[0]
+            if cls == "oc0" or cls == "oc1" or cls == "oc" or cls == "oc4":
+                # Desocupado, solapamiento o examen
+                return
+            if cls != "oc3":
+                raise RuntimeError(cls)
+            # Clase
+            self.__in_class_cell = True
+        elif tag == "div" and self.__in_class_cell:
+            # Only the first div of every cell describes its class
+            self.__in_class_cell = False
+            add_class_time(self.output, *parse_activity(dict(attrs)["onmouseover"]))
+
+    def handle_endtag(self, tag):
+        if tag == "table" and self.__table_depth:
+            self.__table_depth -= 1
+        elif tag == "td":
+            self.__in_class_cell = False
+
+
+def parse_page(page: str) -> PageContent:
+    parser = OccupancyParser()
+    parser.feed(page)
+    parser.close()
+    return parser.output
 
 
 def parse_content(content: BeautifulSoup):
@@ -63,59 +254,45 @@ def parse_content(content: BeautifulSoup):
             else:
                 raise RuntimeError(cls)
 
-            raw_data = cell.div["onmouseover"].split("\n")[2].strip()[1:-1][12:].strip()
-            class_type, rest = raw_data.split(": ")
-            class_name, group = rest.split(" - ")
-            if class_type == "Clase":
-                pass
-            else:
-                raise RuntimeError(class_type)
-
-            class_name, class_code = class_name.rsplit(" ", 1)
-            class_code = class_code.replace("[", "").replace("]", "").strip()
-            group = group.replace("Grupo /", "").strip().replace("_inglés", "")
-            session_type, group_number = group.split("_")
-            group_number = int(group_number)
-
-            if class_code not in output:
-                output[class_code] = {}
-            if session_type not in output[class_code]:
-                output[class_code][session_type] = {}
-            if group_number not in output[class_code][session_type]:
-                output[class_code][session_type][group_number] = 0
-            output[class_code][session_type][group_number] += 30
+            class_code, session_type, group_number = parse_activity(cell.div["onmouseover"])
+            add_class_time(output, class_code, session_type, group_number)
 
     return output
 
 
-def scrape():
-    dates = generate_academic_year_dates()
-    content = {}
-    with ThreadPoolExecutor(max_workers=20) as executor:
-        future_to_content = {executor.submit(get_schedule_content, d): i for i, d in enumerate(dates)}
+def merge_page_content(content: Dict, partial: PageContent, week_number: int):
+    for course_code, course_data in partial.items():
+        if course_code not in content:
+            content[course_code] = {}
+
+        for session_type, session_data in course_data.items():
+            if session_type not in content[course_code]:
+                content[course_code][session_type] = {}
 
-        for future in as_completed(future_to_content):
-            i = future_to_content[future]
-            week_number = i // 5
-            print(f"Parsing Week#{week_number} Date#{(i % 5) + 1}")
+            for group_number, duration in session_data.items():
+                if group_number not in content[course_code][session_type]:
+                    content[course_code][session_type][group_number] = []
 
-            partial = parse_content(future.result())
+                if week_number not in [0, 21] and duration in content[course_code][session_type][group_number]:
+                    continue
+                content[course_code][session_type][group_number].append(duration)
 
-            for course_code, course_data in partial.items():
-                if course_code not in content:
-                    content[course_code] = {}
 
-                for session_type, session_data in course_data.items():
-                    if session_type not in content[course_code]:
-                        content[course_code][session_type] = {}
+def build_scrape_content(pages: List[str]) -> Dict:
+    content = {}
+    # Pages are parsed in other processes, but merged as they come back in date order, so the same pages always
+    # give the same durations
+    with ProcessPoolExecutor() as executor:
+        for i, partial in enumerate(executor.map(parse_page, pages, chunksize=__PARSE_CHUNK_SIZE)):
+            merge_page_content(content, partial, i // 5)
+    return content
 
-                    for group_number, duration in session_data.items():
-                        if group_number not in content[course_code][session_type]:
-                            content[course_code][session_type][group_number] = []
 
-                        if week_number not in [0, 21] and duration in content[course_code][session_type][group_number]:
-                            continue
-                        content[course_code][session_type][group_number].append(duration)
+def scrape(refresh: bool = False):
+    dates = generate_academic_year_dates()
+    pages = fetch_schedule_pages(dates, refresh)
+    print(f"Parsing {len(pages)} dates")
+    content = build_scrape_content(pages)
 
     with open("data/scrape.json", "w") as f:
         f.write(json.dumps(content))
@@ -174,7 +351,25 @@ def validate():
 
 
 if __name__ == "__main__":
-    # scrape()
-    # write_csv()
-    # validate()
-    pass
+    parser = argparse.ArgumentParser(
+        prog="USC Schedule Scrapper",
+        description="Scrape the ETSE schedules of the academic year and summarize their session groups."
+    )
+
+    sub_parsers = parser.add_subparsers(title="mode", dest="mode", required=True)
+
+    parser_scrape = sub_parsers.add_parser('scrape', help='Build data/scrape.json, only fetching dates not cached yet')
+    parser_scrape.add_argument('-r', '--refresh', action='store_true',
+                               help='Ask the server again for cached dates, downloading those which changed')
+    sub_parsers.add_parser('csv', help='Build data/session_groups.csv from data/scrape.json')
+    sub_parsers.add_parser('validate', help='Check every session group belongs to a known course')
+
+    args = parser.parse_args()
+    if args.mode == "scrape":
+        scrape(args.refresh)
+    elif args.mode == "csv":
+        write_csv()
+    elif args.mode == "validate":
+        validate()
+    else:
+        raise NotImplementedError(f"How's {args.mode} even possible?")
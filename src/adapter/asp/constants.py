@@ -1,10 +1,10 @@
 from typing import Union
 from uuid import UUID
 
+from adapter.time.minute_slot import MinuteSlot
 from models.room import Room
 from models.session import Session
-from models.slot import Slot
-from models.timeframe import Timeframe
+from utils.time_utils import format_minutes
 
 
 class ClingoVariables:
@@ -13,8 +13,17 @@ class ClingoVariables:
     TIMESLOT = "T"
     SESSION = "S"
     SESSION_DURATION = "H"
+    SESSION_TYPE = "Y"
     ROOM = "R"
     ROOM_CAPACITY = "RC"
+    ROOM_POOL_SIZE = "N"
+    START_RANGE = "K"
+    DAY = "D"
+    DIFF_BOUND = "B"
+    WINDOW = "W"
+    GAP = "G"
+    CONFLICT_GROUP = "C"
+    CONSTRAINT_GROUP = "Q"
 
     PENALTY_NAME = "PN"
     PENALTY_COST = "PC"
@@ -25,34 +34,69 @@ class ClingoVariables:
     BONUS_VALUE = "BV"
     BONUS_PRIORITY = "BP"
 
+    # Multi-shot program parameters
+    LEVEL = "l"
+    BOUND = "b"
+    STEP = "k"
+
 
 class ClingoPredicates:
     TIMESLOT = "timeslot"
     ROOM = "room"
+    ROOM_POOL = "roomPool"
     SESSION = "session"
 
-    ROOM_DISTANCE = "roomDistance"
+    ROOMS_TOO_FAR_FOR_GAP = "roomsTooFarForGap"
 
     SCHEDULED_SESSION = "scheduledSession"
     ASSIGNED_TIMESLOT = "assignedTimeslot"
     ASSIGNED_ROOM = "assignedRoom"
 
+    SESSION_TYPE = "sessionType"
+    ROOM_SUPPORTS_TYPE = "roomSupportsType"
+    DISALLOWED_ROOM_FOR_SESSION = "disallowedRoomForSession"
+
     ELIGIBLE_ROOM_FOR_SESSION = "eligibleRoomForSession"
     ELIGIBLE_TIMESLOT_FOR_SESSION = "eligibleTimeslotForSession"
 
     NO_TIMESLOT_OVERLAP_IN_SESSIONS = "noTimeslotOverlapInSessions"
     AVOID_TIMESLOT_OVERLAP_IN_SESSIONS = "avoidTimeslotOverlapInSessions"
+    NO_TIMESLOT_OVERLAP_GROUP = "noTimeslotOverlapGroup"
+    SESSION_IN_NO_TIMESLOT_OVERLAP_GROUP = "sessionInNoTimeslotOverlapGroup"
     UNDESIRABLE_TIMESLOT = "undesirableTimeslot"
     PREFERRED_ROOM_FOR_SESSION = "preferredRoomForSession"
     PENALIZED_ROOM_FOR_SESSION = "penalizedRoomForSession"
     PREFERRED_TIMESLOT_FOR_SESSION = "preferredTimeslotForSession"
     PENALIZED_TIMESLOT_FOR_SESSION = "penalizedTimeslotForSession"
-    SAME_ROOM_IF_CONTIGUOUS_SESSIONS = "sameRoomIfContiguousSessions"
-    APPLY_ROOM_DISTANCES_TO_SESSIONS = "applyRoomDistancesToSessions"
+    CONTIGUOUS_SESSIONS = "contiguousSessions"
+    SESSIONS_WITHIN_GAP = "sessionsWithinGap"
 
     PENALTY = "penalty"
     BONUS = "bonus"
 
+    # Difference logic encoding, where start times are integer variables instead of atoms
+    START = "start"
+    START_RANGE = "startRange"
+    ASSIGNED_START_RANGE = "assignedStartRange"
+    START_RANGE_PENALTY = "startRangePenalty"
+    START_RANGE_BONUS = "startRangeBonus"
+    SESSION_DAY = "sessionDay"
+    ROOM_DISTANCE = "roomDistance"
+    SAME_ROOM_IF_CONTIGUOUS = "sameRoomIfContiguous"
+    ROOM_DISTANCES_APPLY = "roomDistancesApply"
+    ORDERED_APART = "orderedApart"
+    STARTS_BEFORE = "startsBefore"
+    OVERLAPPING_SESSIONS = "overlappingSessions"
+    FORBIDDEN_GAP = "forbiddenGap"
+    CLEARS_GAP = "clearsGap"
+
+    OBJECTIVE_ACTIVE = "objectiveActive"
+    INCUMBENT_ACTIVE = "incumbentActive"
+
+    # Infeasibility diagnosis
+    CONSTRAINT_GROUP = "constraintGroup"
+    ENFORCED = "enforced"
+
     @staticmethod
     def timeslot(timeslot: str) -> str:
         return f"{ClingoPredicates.TIMESLOT}({timeslot})"
@@ -61,14 +105,19 @@ class ClingoPredicates:
     def room(room: str, room_capacity: int) -> str:
         return f"{ClingoPredicates.ROOM}({room},{room_capacity})"
 
+    @staticmethod
+    def room_pool(pool: str, pool_size: Union[str, int]) -> str:
+        # Interchangeable rooms, to which up to pool_size sessions can be assigned at the same time
+        return f"{ClingoPredicates.ROOM_POOL}({pool},{pool_size})"
+
     @staticmethod
     def session(session: str, session_duration: Union[str, int]):
         return f"{ClingoPredicates.SESSION}({session},{session_duration})"
 
     @staticmethod
-    def room_distance(room1: str, room2: str, distance: Union[str, int]):
-        # Note that distance is in number of timeslots
-        return f"{ClingoPredicates.ROOM_DISTANCE}({room1},{room2},{distance})"
+    def rooms_too_far_for_gap(room1: str, room2: str, gap: Union[str, int]):
+        # Note that gap is in number of timeslots
+        return f"{ClingoPredicates.ROOMS_TOO_FAR_FOR_GAP}({room1},{room2},{gap})"
 
     @staticmethod
     def scheduled_session(timeslot: Union[int, str], session: str, room: str) -> str:
@@ -82,6 +131,18 @@ class ClingoPredicates:
     def assigned_room(room: str, session: str) -> str:
         return f"{ClingoPredicates.ASSIGNED_ROOM}({room},{session})"
 
+    @staticmethod
+    def session_type(session: str, session_type: str):
+        return f"{ClingoPredicates.SESSION_TYPE}({session},{session_type})"
+
+    @staticmethod
+    def room_supports_type(room: str, session_type: str):
+        return f"{ClingoPredicates.ROOM_SUPPORTS_TYPE}({room},{session_type})"
+
+    @staticmethod
+    def disallowed_room_for_session(session: str, room: str):
+        return f"{ClingoPredicates.DISALLOWED_ROOM_FOR_SESSION}({session},{room})"
+
     @staticmethod
     def eligible_room_for_session(session: str, room: str):
         return f"{ClingoPredicates.ELIGIBLE_ROOM_FOR_SESSION}({session},{room})"
@@ -98,6 +159,15 @@ class ClingoPredicates:
     def avoid_timeslot_overlap_in_sessions(session1: str, session2: str) -> str:
         return f"{ClingoPredicates.AVOID_TIMESLOT_OVERLAP_IN_SESSIONS}({session1},{session2})"
 
+    @staticmethod
+    def no_timeslot_overlap_group(group: Union[str, int]) -> str:
+        return f"{ClingoPredicates.NO_TIMESLOT_OVERLAP_GROUP}({group})"
+
+    @staticmethod
+    def session_in_no_timeslot_overlap_group(group: Union[str, int], session: str) -> str:
+        # Every pair of sessions in the group cannot overlap in time
+        return f"{ClingoPredicates.SESSION_IN_NO_TIMESLOT_OVERLAP_GROUP}({group},{session})"
+
     @staticmethod
     def undesirable_timeslot(timeslot: Union[str, int], penalty: Union[str, int]):
         return f"{ClingoPredicates.UNDESIRABLE_TIMESLOT}({timeslot},{penalty})"
@@ -119,12 +189,14 @@ class ClingoPredicates:
         return f"{ClingoPredicates.PREFERRED_TIMESLOT_FOR_SESSION}({session},{timeslot})"
 
     @staticmethod
-    def same_room_if_contiguous_sessions(session1: str, session2: str):
-        return f"{ClingoPredicates.SAME_ROOM_IF_CONTIGUOUS_SESSIONS}({session1},{session2})"
+    def contiguous_sessions(session1: str, session2: str, timeslot: Union[str, int]):
+        # session2 starts right when session1, started at timeslot, ends
+        return f"{ClingoPredicates.CONTIGUOUS_SESSIONS}({session1},{session2},{timeslot})"
 
     @staticmethod
-    def apply_room_distances_to_sessions(session1: str, session2: str):
-        return f"{ClingoPredicates.APPLY_ROOM_DISTANCES_TO_SESSIONS}({session1},{session2})"
+    def sessions_within_gap(session1: str, session2: str, timeslot: Union[str, int], gap: Union[str, int]):
+        # session2 starts gap timeslots after session1, started at timeslot, ends
+        return f"{ClingoPredicates.SESSIONS_WITHIN_GAP}({session1},{session2},{timeslot},{gap})"
 
     @staticmethod
     def penalty(name: str, cost: Union[str, int], value: Union[str, int], priority: Union[str, int]):
@@ -134,9 +206,101 @@ class ClingoPredicates:
     def bonus(name: str, cost: Union[str, int], value: Union[str, int], priority: Union[str, int]):
         return f"{ClingoPredicates.BONUS}({name},{cost},{value},{priority})"
 
+    @staticmethod
+    def start(session: str) -> str:
+        return f"{ClingoPredicates.START}({session})"
+
+    @staticmethod
+    def start_range(session: str, start_range: Union[str, int], day: Union[str, int], first_start: Union[str, int],
+                    last_start: Union[str, int]) -> str:
+        # Starts of the session within a single day, all of them with the same timeslot penalties and bonuses
+        return f"{ClingoPredicates.START_RANGE}({session},{start_range},{day},{first_start},{last_start})"
+
+    @staticmethod
+    def assigned_start_range(session: str, start_range: Union[str, int]) -> str:
+        return f"{ClingoPredicates.ASSIGNED_START_RANGE}({session},{start_range})"
+
+    @staticmethod
+    def start_range_penalty(session: str, start_range: Union[str, int], name: str, cost: Union[str, int],
+                            priority: Union[str, int]) -> str:
+        return f"{ClingoPredicates.START_RANGE_PENALTY}({session},{start_range},{name},{cost},{priority})"
+
+    @staticmethod
+    def start_range_bonus(session: str, start_range: Union[str, int], name: str, cost: Union[str, int],
+                          priority: Union[str, int]) -> str:
+        return f"{ClingoPredicates.START_RANGE_BONUS}({session},{start_range},{name},{cost},{priority})"
+
+    @staticmethod
+    def session_day(session: str, day: Union[str, int]) -> str:
+        return f"{ClingoPredicates.SESSION_DAY}({session},{day})"
+
+    @staticmethod
+    def room_distance(room1: str, room2: str, distance: Union[str, int]) -> str:
+        # Note that distance is in number of timeslots
+        return f"{ClingoPredicates.ROOM_DISTANCE}({room1},{room2},{distance})"
+
+    @staticmethod
+    def same_room_if_contiguous(session1: str, session2: str) -> str:
+        return f"{ClingoPredicates.SAME_ROOM_IF_CONTIGUOUS}({session1},{session2})"
+
+    @staticmethod
+    def room_distances_apply(session1: str, session2: str) -> str:
+        return f"{ClingoPredicates.ROOM_DISTANCES_APPLY}({session1},{session2})"
+
+    @staticmethod
+    def ordered_apart(session1: str, session2: str) -> str:
+        # Sessions which cannot overlap in time, so one of them must end before the other starts
+        return f"{ClingoPredicates.ORDERED_APART}({session1},{session2})"
+
+    @staticmethod
+    def starts_before(session1: str, session2: str) -> str:
+        return f"{ClingoPredicates.STARTS_BEFORE}({session1},{session2})"
+
+    @staticmethod
+    def overlapping_sessions(session1: str, session2: str) -> str:
+        return f"{ClingoPredicates.OVERLAPPING_SESSIONS}({session1},{session2})"
+
+    @staticmethod
+    def forbidden_gap(session1: str, session2: str, window: Union[str, int]) -> str:
+        # session2 cannot start within the window timeslots after session1 ends
+        return f"{ClingoPredicates.FORBIDDEN_GAP}({session1},{session2},{window})"
+
+    @staticmethod
+    def clears_gap(session1: str, session2: str, window: Union[str, int]) -> str:
+        return f"{ClingoPredicates.CLEARS_GAP}({session1},{session2},{window})"
+
+    @staticmethod
+    def diff(variable1: str, variable2: str, bound: Union[str, int]) -> str:
+        # Difference logic theory atom: variable1 - variable2 <= bound
+        return f"&diff {{ {variable1} - {variable2} }} <= {bound}"
+
+    @staticmethod
+    def objective_active(level: Union[str, int]):
+        return f"{ClingoPredicates.OBJECTIVE_ACTIVE}({level})"
+
+    @staticmethod
+    def incumbent_active(step: Union[str, int]):
+        return f"{ClingoPredicates.INCUMBENT_ACTIVE}({step})"
+
+    @staticmethod
+    def constraint_group(group: str):
+        return f"{ClingoPredicates.CONSTRAINT_GROUP}({group})"
+
+    @staticmethod
+    def enforced(group: str):
+        return f"{ClingoPredicates.ENFORCED}({group})"
+
+
+class ClingoPrograms:
+    BASE = "base"
+    OBJECTIVE = "objective"
+    FREEZE = "freeze"
+    INCUMBENT = "incumbent"
+
 
 class ClingoNaming:
     ROOM = "room"
+    POOL = "pool"
     SESSION = "session"
 
     @staticmethod
@@ -145,19 +309,29 @@ class ClingoNaming:
             return f"{ClingoNaming.ROOM}_{room.hex}"
         return f"{ClingoNaming.ROOM}_{room.id.hex}"
 
+    @staticmethod
+    def pool_to_clingo(first_room: Room) -> str:
+        return f"{ClingoNaming.POOL}_{first_room.id.hex}"
+
     @staticmethod
     def session_to_clingo(session: Union[Session, UUID]) -> str:
         if isinstance(session, UUID):
             return f"{ClingoNaming.SESSION}_{session.hex}"
         return f"{ClingoNaming.SESSION}_{session.id.hex}"
 
+    @staticmethod
+    def session_type_to_clingo(session_type: str) -> str:
+        # Session types are free text, so they are kept as strings rather than constants
+        escaped_session_type = session_type.replace("\\", "\\\\").replace('"', '\\"')
+        return f'"{escaped_session_type}"'
+
     @staticmethod
     def get_id_from_clingo(clingo: str) -> str:
         _, data = clingo.split("_")
         return data
 
     @staticmethod
-    def get_timeslot_for_comment(slot: Slot):
+    def get_timeslot_for_comment(slot: MinuteSlot):
         days = [
             "MON",
             "TUE",
@@ -168,17 +342,13 @@ class ClingoNaming:
             "SUN",
         ]
         day = days[(slot.week_day - 1) % 7]
-        return f"{day} @ {slot.timeframe.start} - {slot.timeframe.end}"
+        return f"{day} @ {format_minutes(slot.start)} - {format_minutes(slot.end)}"
 
     @staticmethod
-    def get_timeslot_range_for_comment(a: Slot, b: Slot):
-        return ClingoNaming.get_timeslot_for_comment(Slot(
-            week_day=a.week_day,
-            timeframe=Timeframe(
-                start=min(a.timeframe.start, b.timeframe.start),
-                end=max(a.timeframe.start, b.timeframe.start),
-            ),
-        ))
+    def get_timeslot_range_for_comment(a: MinuteSlot, b: MinuteSlot):
+        return ClingoNaming.get_timeslot_for_comment(
+            MinuteSlot(a.week_day, min(a.start, b.start), max(a.start, b.start)),
+        )
 
     @staticmethod
     def get_room_for_comment(room: Room):
@@ -0,0 +1,231 @@
+from typing import Dict, List, Tuple
+
+from adapter.asp.constants import ClingoNaming as ClN, ClingoPredicates as ClP, ClingoVariables as ClV
+from adapter.asp.rules import ChoiceRules, ConstraintRules, FactRules, NormalRules, Rules
+from adapter.time.week import Week
+from models.dto.input import Room, Session
+from utils.session_utils import get_eligible_rooms, get_eligible_timeslot_ranges, get_eligible_timeslots
+
+
+class ConstraintGroups:
+    # Hard constraints which can be relaxed while diagnosing, each one guarded by its own assumption
+    DISALLOWED_SLOTS = "disallowedSlots"
+    DISALLOWED_ROOMS = "disallowedRooms"
+    CANNOT_CONFLICT = "cannotConflict"
+    ROOM_TYPE = "roomType"
+
+    @staticmethod
+    def disallowed_slots(session: str) -> str:
+        return f"{ConstraintGroups.DISALLOWED_SLOTS}({session})"
+
+    @staticmethod
+    def disallowed_rooms(session: str) -> str:
+        return f"{ConstraintGroups.DISALLOWED_ROOMS}({session})"
+
+    @staticmethod
+    def cannot_conflict(session1: str, session2: str) -> str:
+        return f"{ConstraintGroups.CANNOT_CONFLICT}({session1},{session2})"
+
+    @staticmethod
+    def room_type(session_type: str) -> str:
+        return f"{ConstraintGroups.ROOM_TYPE}({session_type})"
+
+
+def __without_disallowed_slots(session: Session) -> Session:
+    preferences = session.constraints.timeslots_preferences.copy(update={"disallowed_slots": []})
+    constraints = session.constraints.copy(update={"timeslots_preferences": preferences})
+    return session.copy(update={"constraints": constraints})
+
+
+def get_relaxed_timeslot_ranges(session: Session, week: Week) -> List[Tuple[int, int]]:
+    # Starts only left out because of the disallowed slots of the session
+    eligible_timeslots = get_eligible_timeslots(session, week)
+    return [(a, b,) for a, b in get_eligible_timeslot_ranges(__without_disallowed_slots(session), week)
+            if any(t not in eligible_timeslots for t in range(a, b + 1))]
+
+
+class DiagnosisFactRules:
+    @staticmethod
+    def generate_guarded_eligible_timeslots_for_sessions(sessions: List[Session], week: Week) -> List[str]:
+        statements: List[str] = []
+        for session in sessions:
+            relaxed_ranges = get_relaxed_timeslot_ranges(session, week)
+            if not relaxed_ranges:
+                continue
+
+            clingo_session = ClN.session_to_clingo(session)
+            group = ConstraintGroups.disallowed_slots(clingo_session)
+            statements.append(f"{ClP.constraint_group(group)}.")
+            # Overlapping with the enforced ranges is harmless, as they are facts anyway
+            for a, b in relaxed_ranges:
+                eligible_timeslot = ClP.eligible_timeslot_for_session(clingo_session, f"{a}..{b}")
+                statements.append(f"{eligible_timeslot} :- not {ClP.enforced(group)}.")
+        return statements
+
+    @staticmethod
+    def generate_guarded_disallowed_rooms_for_sessions(sessions: List[Session], rooms: List[Room]) -> List[str]:
+        statements: List[str] = []
+        rooms_by_id = {room.id: room for room in rooms}
+        for session in sessions:
+            disallowed_rooms = [rooms_by_id[room_uuid]
+                                for room_uuid in session.constraints.rooms_preferences.disallowed_rooms
+                                if room_uuid in rooms_by_id]
+            if not disallowed_rooms:
+                continue
+
+            clingo_session = ClN.session_to_clingo(session)
+            group = ConstraintGroups.disallowed_rooms(clingo_session)
+            statements.append(f"{ClP.constraint_group(group)}.")
+            # Every room is listed, as rooms of other types become eligible if the room type is relaxed too
+            for room in disallowed_rooms:
+                disallowed_room = ClP.disallowed_room_for_session(clingo_session, ClN.room_to_clingo(room))
+                statements.append(f"{disallowed_room} :- {ClP.enforced(group)}.")
+        return statements
+
+    @staticmethod
+    def generate_guarded_no_overlapping_sessions(sessions: List[Session]) -> List[str]:
+        # Pairwise, so the core names the exact pairs instead of a whole clique
+        statements: List[str] = []
+        pairs = FactRules.find_related_pairs_of_sessions(sessions, lambda s: s.constraints.cannot_conflict_in_time)
+        for session1, session2 in pairs:
+            clingo_session1, clingo_session2 = ClN.session_to_clingo(session1), ClN.session_to_clingo(session2)
+            group = ConstraintGroups.cannot_conflict(clingo_session1, clingo_session2)
+            statements.append(f"{ClP.constraint_group(group)}.")
+            no_overlap = ClP.no_timeslot_overlap_in_sessions(clingo_session1, clingo_session2)
+            statements.append(f"{no_overlap} :- {ClP.enforced(group)}.")
+        return statements
+
+    @staticmethod
+    def generate_room_type_groups(sessions: List[Session]) -> List[str]:
+        session_types = sorted({session.constraints.session_type for session in sessions})
+        return [f"{ClP.constraint_group(ConstraintGroups.room_type(ClN.session_type_to_clingo(session_type)))}."
+                for session_type in session_types]
+
+
+class DiagnosisRules:
+    def __init__(self, week: Week, sessions: List[Session], rooms: List[Room]):
+        self.sessions = sessions
+        self.rooms = rooms
+        self.week = week
+
+    @staticmethod
+    def generate_enforced_groups() -> str:
+        # Left free, as the solver only decides them through the assumptions
+        enforced = ClP.enforced(ClV.CONSTRAINT_GROUP)
+        constraint_group = ClP.constraint_group(ClV.CONSTRAINT_GROUP)
+        return f"{{ {enforced} : {constraint_group} }}."
+
+    @staticmethod
+    def generate_relaxed_eligible_rooms_for_sessions() -> str:
+        # Any room will do, if the room types of the session are not enforced
+        eligible_room = ClP.eligible_room_for_session(ClV.SESSION, ClV.ROOM)
+        session_type = ClP.session_type(ClV.SESSION, ClV.SESSION_TYPE)
+        room = ClP.room(ClV.ROOM, ClV.ANY)
+        room_type = ConstraintGroups.room_type(ClV.SESSION_TYPE)
+        disallowed_room = ClP.disallowed_room_for_session(ClV.SESSION, ClV.ROOM)
+        return f"{eligible_room} :- {session_type}, {room}, not {ClP.enforced(room_type)}, not {disallowed_room}."
+
+    def __generate_facts(self) -> str:
+        # Without room pools, so every room can be told apart in the core
+        return "\n".join([
+            Rules.generate_week_facts(self.week),
+
+            *FactRules.generate_rooms(self.rooms, []),
+            *FactRules.generate_rooms_too_far_for_gaps(self.rooms, self.week),
+
+            *FactRules.generate_sessions(self.sessions, self.week),
+            *FactRules.generate_eligible_timeslots_for_sessions(self.sessions, self.week),
+            *FactRules.generate_session_types(self.sessions),
+            *FactRules.generate_room_supported_types(self.rooms, []),
+            *FactRules.generate_same_room_if_sessions_contiguous_in_time(self.sessions, self.rooms, self.week),
+            *FactRules.generate_apply_room_distances_to_sessions(self.sessions, self.rooms, self.week),
+
+            *DiagnosisFactRules.generate_guarded_eligible_timeslots_for_sessions(self.sessions, self.week),
+            *DiagnosisFactRules.generate_guarded_disallowed_rooms_for_sessions(self.sessions, self.rooms),
+            *DiagnosisFactRules.generate_guarded_no_overlapping_sessions(self.sessions),
+            *DiagnosisFactRules.generate_room_type_groups(self.sessions),
+        ])
+
+    @staticmethod
+    def generate_static_rules() -> str:
+        # Only the hard constraints; preferences and penalties cannot make the input infeasible
+        return "\n\n".join([
+            "\n".join([
+                DiagnosisRules.generate_enforced_groups(),
+                ChoiceRules.generate_assigned_timeslots(),
+                ChoiceRules.generate_assigned_rooms(),
+            ]),
+            "\n".join([
+                NormalRules.generate_eligible_rooms_for_sessions(),
+                DiagnosisRules.generate_relaxed_eligible_rooms_for_sessions(),
+                NormalRules.generate_scheduled_sessions(),
+            ]),
+            "\n".join([
+                ConstraintRules.exclude_more_than_one_session_in_same_room_and_timeslot(),
+                ConstraintRules.exclude_sessions_assigned_in_same_overlapping_timeslot(),
+                ConstraintRules.exclude_sessions_scheduled_in_contiguous_timeslots_but_different_rooms(),
+                ConstraintRules.exclude_sessions_scheduled_closer_than_room_distance(),
+            ]),
+            "\n".join([
+                # Facts which may not be generated at all, depending on the input
+                f"#defined {ClP.CONSTRAINT_GROUP}/1.",
+                f"#defined {ClP.ROOM_SUPPORTS_TYPE}/2.",
+                f"#defined {ClP.DISALLOWED_ROOM_FOR_SESSION}/2.",
+                f"#defined {ClP.NO_TIMESLOT_OVERLAP_IN_SESSIONS}/2.",
+                f"#defined {ClP.CONTIGUOUS_SESSIONS}/3.",
+                f"#defined {ClP.SESSIONS_WITHIN_GAP}/4.",
+                f"#defined {ClP.ROOMS_TOO_FAR_FOR_GAP}/3.",
+                f"#show {ClP.ENFORCED}/1.",
+            ]),
+        ])
+
+    def generate_diagnosis_problem(self) -> str:
+        return "\n\n".join([
+            self.__generate_facts(),
+            DiagnosisRules.generate_static_rules(),
+        ]) + "\n"
+
+    @staticmethod
+    def __describe_session(session: Session) -> str:
+        comment = ClN.get_session_for_comment(session)
+        return f"{ClN.session_to_clingo(session)} ({comment})" if comment else ClN.session_to_clingo(session)
+
+    @staticmethod
+    def __describe_rooms(rooms: List[Room]) -> str:
+        descriptions = []
+        for room in rooms:
+            # Same text as the comments of the ASP problem, without its leading " % "
+            comment = ClN.get_room_for_comment(room).lstrip(" %")
+            descriptions.append(f"{ClN.room_to_clingo(room)} ({comment})" if comment else ClN.room_to_clingo(room))
+        return ", ".join(descriptions) or "none"
+
+    def describe_group(self, name: str, arguments: Tuple[str, ...]) -> str:
+        # One line per group of the core, naming the sessions and rooms involved
+        sessions_by_name: Dict[str, Session] = {ClN.session_to_clingo(s): s for s in self.sessions}
+
+        if name == ConstraintGroups.DISALLOWED_SLOTS:
+            session = sessions_by_name[arguments[0]]
+            starts = len(get_eligible_timeslots(session, self.week))
+            return f"Disallowed slots of {DiagnosisRules.__describe_session(session)} leave it {starts} possible " \
+                   f"starts"
+
+        if name == ConstraintGroups.DISALLOWED_ROOMS:
+            session = sessions_by_name[arguments[0]]
+            return f"Disallowed rooms of {DiagnosisRules.__describe_session(session)} leave it the rooms: " \
+                   f"{DiagnosisRules.__describe_rooms(get_eligible_rooms(session, self.rooms))}"
+
+        if name == ConstraintGroups.CANNOT_CONFLICT:
+            session1, session2 = sessions_by_name[arguments[0]], sessions_by_name[arguments[1]]
+            return f"{DiagnosisRules.__describe_session(session1)} cannot overlap " \
+                   f"{DiagnosisRules.__describe_session(session2)}"
+
+        if name == ConstraintGroups.ROOM_TYPE:
+            sessions = [s for s in self.sessions if ClN.session_type_to_clingo(s.constraints.session_type) ==
+                        arguments[0]]
+            session_type = sessions[0].constraints.session_type
+            rooms = [room for room in self.rooms if session_type in room.constraints.session_types]
+            return f"Sessions of type {session_type} ({len(sessions)}) can only use the rooms: " \
+                   f"{DiagnosisRules.__describe_rooms(rooms)}"
+
+        raise ValueError(f"Unknown constraint group {name}")
+
@@ -0,0 +1,259 @@
+from typing import Dict, List, Set, Tuple
+
+from adapter.asp.constants import ClingoNaming as ClN, ClingoPredicates as ClP, ClingoVariables as ClV
+from adapter.asp.optimizations import BonusCosts, BonusNames, OptimizationPriorities, PenaltyCosts, PenaltyNames
+from adapter.asp.rules import ChoiceRules, Directives, FactRules, NormalRules, OptimizationRules
+from adapter.time.week import Week
+from models.dto.input import Room, Session
+from models.slot import SlotType
+from utils.session_utils import get_eligible_timeslot_ranges, get_room_distances_in_timeslots, \
+    get_session_slots_count
+
+# Penalties and bonuses of a start range, as (name, cost, priority)
+RangeCosts = Tuple[Tuple[str, int, int], ...]
+
+
+class DifferenceLogicFactRules:
+    @staticmethod
+    def __get_start_costs(covered_timeslots: Set[int], undesirable_timeslots: Dict[SlotType, Set[int]],
+                          penalized_timeslots: Set[int],
+                          preferred_timeslots: Set[int]) -> Tuple[RangeCosts, RangeCosts]:
+        undesirable_penalties = (
+            (SlotType.UNDESIRABLE_1, PenaltyCosts.UNDESIRABLE_TIMESLOT_1,
+             OptimizationPriorities.PENALTY__UNDESIRABLE_TIMESLOT_1,),
+            (SlotType.UNDESIRABLE_2, PenaltyCosts.UNDESIRABLE_TIMESLOT_2,
+             OptimizationPriorities.PENALTY__UNDESIRABLE_TIMESLOT_2,),
+            (SlotType.UNDESIRABLE_5, PenaltyCosts.UNDESIRABLE_TIMESLOT_5,
+             OptimizationPriorities.PENALTY__UNDESIRABLE_TIMESLOT_5,),
+        )
+
+        penalties = [(PenaltyNames.UNDESIRABLE_TIMESLOT.value, cost.value, priority.value,)
+                     for slot_type, cost, priority in undesirable_penalties
+                     if covered_timeslots & undesirable_timeslots[slot_type]]
+        if covered_timeslots & penalized_timeslots:
+            penalties.append((PenaltyNames.AVOID_TIMESLOT_FOR_SESSION.value,
+                              PenaltyCosts.AVOID_TIMESLOT_FOR_SESSION.value,
+                              OptimizationPriorities.PENALTY__AVOID_TIMESLOT_FOR_SESSION.value,))
+
+        bonuses = []
+        if covered_timeslots & preferred_timeslots:
+            bonuses.append((BonusNames.PREFER_TIMESLOT_FOR_SESSION.value,
+                            BonusCosts.PREFER_TIMESLOT_FOR_SESSION.value,
+                            OptimizationPriorities.BONUS__PREFER_TIMESLOT_FOR_SESSION.value,))
+        return tuple(penalties), tuple(bonuses)
+
+    @staticmethod
+    def generate_start_ranges(sessions: List[Session], week: Week) -> List[str]:
+        # Timeslot penalties and bonuses only depend on the start of each session, so consecutive starts with the
+        # same ones are grouped; the solver picks a range, and the exact start is left to the difference constraints
+        statements: List[str] = []
+        undesirable_timeslots = {slot_type: set(week.get_slot_ids_per_type(slot_type))
+                                 for slot_type in (SlotType.UNDESIRABLE_1, SlotType.UNDESIRABLE_2,
+                                                   SlotType.UNDESIRABLE_5,)}
+
+        for session in sessions:
+            clingo_session = ClN.session_to_clingo(session)
+            session_slots = get_session_slots_count(session, week)
+            preferences = session.constraints.timeslots_preferences
+            penalized_timeslots = {t for slot in preferences.penalized_slots for t in week.get_sub_slot_ids(slot)}
+            preferred_timeslots = {t for slot in preferences.preferred_slots for t in week.get_sub_slot_ids(slot)}
+
+            start_ranges: List[Tuple[int, int, Tuple[RangeCosts, RangeCosts]]] = []
+            for a, b in get_eligible_timeslot_ranges(session, week):
+                for t in range(a, b + 1):
+                    costs = DifferenceLogicFactRules.__get_start_costs(
+                        set(range(t, t + session_slots)), undesirable_timeslots, penalized_timeslots,
+                        preferred_timeslots,
+                    )
+                    if start_ranges and start_ranges[-1][1] == t - 1 and start_ranges[-1][2] == costs \
+                            and t != a:
+                        start_ranges[-1] = (start_ranges[-1][0], t, costs,)
+                    else:
+                        start_ranges.append((t, t, costs,))
+
+            for k, (first_start, last_start, (penalties, bonuses)) in enumerate(start_ranges, start=1):
+                day = week.get_slot_by_number(first_start - 1).week_day
+                statements.append(f"{ClP.start_range(clingo_session, k, day, first_start, last_start)}.")
+                for name, cost, priority in penalties:
+                    statements.append(f"{ClP.start_range_penalty(clingo_session, k, name, cost, priority)}.")
+                for name, cost, priority in bonuses:
+                    statements.append(f"{ClP.start_range_bonus(clingo_session, k, name, cost, priority)}.")
+
+        return statements
+
+    @staticmethod
+    def generate_room_distances(rooms: List[Room], week: Week) -> List[str]:
+        return [f"{ClP.room_distance(ClN.room_to_clingo(room1), ClN.room_to_clingo(room2), distance)}."
+                for (room1, room2), distance in get_room_distances_in_timeslots(rooms, week).items()]
+
+    @staticmethod
+    def generate_no_overlapping_sessions(sessions: List[Session]) -> List[str]:
+        # Pairwise, as every pair needs its own ordering anyway
+        pairs = FactRules.find_related_pairs_of_sessions(sessions, lambda s: s.constraints.cannot_conflict_in_time)
+        return [f"{ClP.no_timeslot_overlap_in_sessions(ClN.session_to_clingo(s1), ClN.session_to_clingo(s2))}."
+                for s1, s2 in pairs]
+
+    @staticmethod
+    def generate_related_sessions_in_both_directions(sessions: List[Session]) -> List[str]:
+        statements: List[str] = []
+        for predicate, getter in (
+                (ClP.same_room_if_contiguous, lambda s: s.constraints.same_room_if_contiguous_in_time,),
+                (ClP.room_distances_apply, lambda s: s.constraints.apply_room_distances,),
+        ):
+            for session1, session2 in FactRules.find_related_pairs_of_sessions(sessions, getter):
+                clingo_session1, clingo_session2 = ClN.session_to_clingo(session1), ClN.session_to_clingo(session2)
+                statements.append(f"{predicate(clingo_session1, clingo_session2)}.")
+                statements.append(f"{predicate(clingo_session2, clingo_session1)}.")
+        return statements
+
+
+class DifferenceLogicRules:
+    def __init__(self, week: Week, sessions: List[Session], rooms: List[Room]):
+        self.sessions = sessions
+        self.rooms = rooms
+        self.week = week
+
+    @staticmethod
+    def generate_assigned_start_ranges() -> List[str]:
+        assigned_start_range = ClP.assigned_start_range(ClV.SESSION, ClV.START_RANGE)
+        any_start_range = ClP.start_range(ClV.SESSION, ClV.START_RANGE, ClV.ANY, ClV.ANY, ClV.ANY)
+        session = ClP.session(ClV.SESSION, ClV.ANY)
+        choice = f"1 {{ {assigned_start_range} : {any_start_range} }} 1 :- {session}."
+
+        day_start_range = ClP.start_range(ClV.SESSION, ClV.START_RANGE, ClV.DAY, ClV.ANY, ClV.ANY)
+        session_day = f"{ClP.session_day(ClV.SESSION, ClV.DAY)} :- {assigned_start_range}, {day_start_range}."
+
+        # Starts are measured from the 0 variable, which is always 0
+        start, zero = ClP.start(ClV.SESSION), "0"
+        last_start_range = ClP.start_range(ClV.SESSION, ClV.START_RANGE, ClV.ANY, ClV.ANY, ClV.DIFF_BOUND)
+        latest_start = f"{ClP.diff(start, zero, ClV.DIFF_BOUND)} :- {assigned_start_range}, {last_start_range}."
+        first_start_range = ClP.start_range(ClV.SESSION, ClV.START_RANGE, ClV.ANY, ClV.TIMESLOT, ClV.ANY)
+        earliest_start = f"{ClP.diff(zero, start, ClV.DIFF_BOUND)} :- {assigned_start_range}, {first_start_range}, " \
+                         f"{ClV.DIFF_BOUND} = -{ClV.TIMESLOT}."
+        return [choice, session_day, latest_start, earliest_start]
+
+    @staticmethod
+    def generate_ordered_apart_sessions() -> List[str]:
+        # Instead of one atom per session, room and timeslot, every pair of sessions which cannot overlap is ordered
+        s1, s2 = f"{ClV.SESSION}1", f"{ClV.SESSION}2"
+        ordered_apart = ClP.ordered_apart(s1, s2)
+        overlapping = ClP.overlapping_sessions(s1, s2)
+        avoid_overlap = ClP.avoid_timeslot_overlap_in_sessions(s1, s2)
+        starts_before = ClP.starts_before(s1, s2)
+
+        same_room = f"{ordered_apart} :- {ClP.assigned_room(ClV.ROOM, s1)}, {ClP.assigned_room(ClV.ROOM, s2)}, " \
+                    f"{s1} < {s2}."
+        no_overlap = f"{ordered_apart} :- {ClP.no_timeslot_overlap_in_sessions(s1, s2)}."
+        may_overlap = f"{{ {overlapping} }} :- {avoid_overlap}."
+        avoided_overlap = f"{ordered_apart} :- {avoid_overlap}, not {overlapping}."
+        ordering = f"{{ {starts_before} }} :- {ordered_apart}."
+
+        first_before = f"{ClP.diff(ClP.start(s1), ClP.start(s2), ClV.DIFF_BOUND)} :- {ordered_apart}, " \
+                       f"{starts_before}, {ClP.session(s1, ClV.SESSION_DURATION)}, " \
+                       f"{ClV.DIFF_BOUND} = -{ClV.SESSION_DURATION}."
+        second_before = f"{ClP.diff(ClP.start(s2), ClP.start(s1), ClV.DIFF_BOUND)} :- {ordered_apart}, " \
+                        f"not {starts_before}, {ClP.session(s2, ClV.SESSION_DURATION)}, " \
+                        f"{ClV.DIFF_BOUND} = -{ClV.SESSION_DURATION}."
+        return [same_room, no_overlap, may_overlap, avoided_overlap, ordering, first_before, second_before]
+
+    @staticmethod
+    def generate_forbidden_gaps() -> List[str]:
+        # Contiguous sessions in different rooms, or sessions closer than the distance between their rooms
+        s1, s2 = f"{ClV.SESSION}1", f"{ClV.SESSION}2"
+        r1, r2 = f"{ClV.ROOM}1", f"{ClV.ROOM}2"
+        rooms = f"{ClP.assigned_room(r1, s1)}, {ClP.assigned_room(r2, s2)}"
+        same_day = f"{ClP.session_day(s1, ClV.DAY)}, {ClP.session_day(s2, ClV.DAY)}"
+        forbidden_gap = ClP.forbidden_gap(s1, s2, ClV.WINDOW)
+        clears_gap = ClP.clears_gap(s1, s2, ClV.WINDOW)
+        session = ClP.session(s1, ClV.SESSION_DURATION)
+
+        contiguous = f"{ClP.forbidden_gap(s1, s2, 1)} :- {ClP.same_room_if_contiguous(s1, s2)}, {rooms}, " \
+                     f"{r1} != {r2}, {same_day}."
+        too_far = f"{forbidden_gap} :- {ClP.room_distances_apply(s1, s2)}, {rooms}, " \
+                  f"{ClP.room_distance(r1, r2, ClV.WINDOW)}, {same_day}."
+        choice = f"{{ {clears_gap} }} :- {forbidden_gap}."
+        after_gap = f"{ClP.diff(ClP.start(s1), ClP.start(s2), ClV.DIFF_BOUND)} :- {forbidden_gap}, {clears_gap}, " \
+                    f"{session}, {ClV.DIFF_BOUND} = -{ClV.SESSION_DURATION}-{ClV.WINDOW}."
+        before_end = f"{ClP.diff(ClP.start(s2), ClP.start(s1), ClV.DIFF_BOUND)} :- {forbidden_gap}, " \
+                     f"not {clears_gap}, {session}, {ClV.DIFF_BOUND} = {ClV.SESSION_DURATION}-1."
+        return [contiguous, too_far, choice, after_gap, before_end]
+
+    @staticmethod
+    def generate_optimizations() -> List[str]:
+        assigned_start_range = ClP.assigned_start_range(ClV.SESSION, ClV.START_RANGE)
+        penalty = ClP.penalty(ClV.PENALTY_NAME, ClV.PENALTY_COST, ClV.SESSION, ClV.PENALTY_PRIORITY)
+        range_penalty = ClP.start_range_penalty(ClV.SESSION, ClV.START_RANGE, ClV.PENALTY_NAME, ClV.PENALTY_COST,
+                                                ClV.PENALTY_PRIORITY)
+        bonus = ClP.bonus(ClV.BONUS_NAME, ClV.BONUS_COST, ClV.SESSION, ClV.BONUS_PRIORITY)
+        range_bonus = ClP.start_range_bonus(ClV.SESSION, ClV.START_RANGE, ClV.BONUS_NAME, ClV.BONUS_COST,
+                                            ClV.BONUS_PRIORITY)
+
+        overlap_penalty = ClP.penalty(PenaltyNames.AVOID_SESSION_OVERLAP, PenaltyCosts.AVOID_SESSION_OVERLAP,
+                                      f"{ClV.SESSION}1", OptimizationPriorities.PENALTY__AVOID_SESSION_OVERLAP)
+        overlapping = ClP.overlapping_sessions(f"{ClV.SESSION}1", f"{ClV.SESSION}2")
+
+        return [
+            f"{penalty} :- {assigned_start_range}, {range_penalty}.",
+            f"{bonus} :- {assigned_start_range}, {range_bonus}.",
+            *OptimizationRules.apply_room_preferences_in_sessions(),
+            f"{overlap_penalty} :- {overlapping}.",
+        ]
+
+    def __generate_facts(self) -> str:
+        return "\n".join([
+            *FactRules.generate_sessions(self.sessions, self.week),
+            *FactRules.generate_session_types(self.sessions),
+            *FactRules.generate_room_supported_types(self.rooms, []),
+            *FactRules.generate_disallowed_rooms_for_sessions(self.sessions, self.rooms),
+            *DifferenceLogicFactRules.generate_start_ranges(self.sessions, self.week),
+            *DifferenceLogicFactRules.generate_room_distances(self.rooms, self.week),
+            *DifferenceLogicFactRules.generate_no_overlapping_sessions(self.sessions),
+            *FactRules.generate_avoid_overlapping_sessions(self.sessions),
+            *DifferenceLogicFactRules.generate_related_sessions_in_both_directions(self.sessions),
+            *FactRules.generate_room_preferences_for_sessions(self.sessions),
+        ])
+
+    @staticmethod
+    def generate_static_rules() -> str:
+        return "\n\n".join([
+            "\n".join([
+                *DifferenceLogicRules.generate_assigned_start_ranges(),
+                ChoiceRules.generate_assigned_rooms(),
+                NormalRules.generate_eligible_rooms_for_sessions(),
+            ]),
+            "\n".join([
+                *DifferenceLogicRules.generate_ordered_apart_sessions(),
+                *DifferenceLogicRules.generate_forbidden_gaps(),
+            ]),
+            "\n".join(DifferenceLogicRules.generate_optimizations()),
+            "\n".join([
+                # Facts which may not be generated at all, depending on the input
+                f"#defined {ClP.NO_TIMESLOT_OVERLAP_IN_SESSIONS}/2.",
+                f"#defined {ClP.AVOID_TIMESLOT_OVERLAP_IN_SESSIONS}/2.",
+                f"#defined {ClP.SAME_ROOM_IF_CONTIGUOUS}/2.",
+                f"#defined {ClP.ROOM_DISTANCES_APPLY}/2.",
+                f"#defined {ClP.ROOM_DISTANCE}/3.",
+                f"#defined {ClP.DISALLOWED_ROOM_FOR_SESSION}/2.",
+                f"#defined {ClP.PENALIZED_ROOM_FOR_SESSION}/2.",
+                f"#defined {ClP.PREFERRED_ROOM_FOR_SESSION}/2.",
+                f"#defined {ClP.START_RANGE_PENALTY}/5.",
+                f"#defined {ClP.START_RANGE_BONUS}/5.",
+            ]),
+            "\n".join([
+                Directives.generate_penalty_definition(),
+                Directives.generate_bonus_definition(),
+                f"#show {ClP.ASSIGNED_ROOM}/2.",
+                f"#show {ClP.PENALTY}/4.",
+                f"#show {ClP.BONUS}/4.",
+            ]),
+        ])
+
+    def generate_dl_problem(self) -> str:
+        return "\n\n".join([
+            self.__generate_facts(),
+            DifferenceLogicRules.generate_static_rules(),
+        ]) + "\n"
+
+
+def get_session_durations(sessions: List[Session], week: Week) -> Dict[str, int]:
+    return {ClN.session_to_clingo(session): get_session_slots_count(session, week) for session in sessions}
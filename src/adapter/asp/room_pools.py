@@ -0,0 +1,110 @@
+from collections import defaultdict
+from typing import Dict, List, Set, Tuple
+
+from pydantic import UUID4
+
+from adapter.asp.constants import ClingoNaming as ClN, ClingoPredicates as ClP
+from models.room import Room
+from models.session import Session
+
+
+class RoomPool:
+    def __init__(self, rooms: List[Room]):
+        self.rooms = rooms
+        self.name = ClN.pool_to_clingo(rooms[0])
+
+    def __repr__(self):
+        return f"RoomPool({self.name}, {len(self.rooms)})"
+
+
+def find_room_pools(sessions: List[Session], rooms: List[Room]) -> List[RoomPool]:
+    # Rooms are interchangeable for the solver if they accept the same session types, and neither any session
+    # preference nor any distance refers to them; choosing among them only multiplies symmetric search
+    referenced_rooms: Set[UUID4] = set()
+    for session in sessions:
+        rooms_preferences = session.constraints.rooms_preferences
+        referenced_rooms.update(rooms_preferences.disallowed_rooms)
+        referenced_rooms.update(rooms_preferences.penalized_rooms)
+        referenced_rooms.update(rooms_preferences.preferred_rooms)
+    for room in rooms:
+        if room.constraints.distances_in_minutes:
+            referenced_rooms.add(room.id)
+            referenced_rooms.update(UUID4(other_room_uuid) for other_room_uuid in room.constraints.distances_in_minutes)
+
+    interchangeable_rooms: Dict[Tuple[str, ...], List[Room]] = defaultdict(list)
+    for room in rooms:
+        if room.id not in referenced_rooms:
+            interchangeable_rooms[tuple(sorted(set(room.constraints.session_types)))].append(room)
+    return [RoomPool(pool_rooms) for pool_rooms in interchangeable_rooms.values() if len(pool_rooms) > 1]
+
+
+def get_pooled_rooms(room_pools: List[RoomPool]) -> Dict[str, str]:
+    # Pool which replaces every pooled room in the ASP program
+    return {ClN.room_to_clingo(room): room_pool.name for room_pool in room_pools for room in room_pool.rooms}
+
+
+def __find_contiguous_chains(pool_sessions: Dict[str, Tuple[int, int]],
+                             sessions: List[Session]) -> List[List[str]]:
+    # Sessions which must stay in the same room when contiguous in time; the encoding ensures every session is
+    # followed and preceded by at most one of them, so they form chains
+    related_sessions: Dict[str, Set[str]] = defaultdict(set)
+    for session in sessions:
+        clingo_session = ClN.session_to_clingo(session)
+        for other_session_uuid in session.constraints.same_room_if_contiguous_in_time:
+            clingo_other_session = ClN.session_to_clingo(other_session_uuid)
+            related_sessions[clingo_session].add(clingo_other_session)
+            related_sessions[clingo_other_session].add(clingo_session)
+
+    following_session: Dict[str, str] = {}
+    preceded_sessions: Set[str] = set()
+    for clingo_session, (_, end) in pool_sessions.items():
+        for other_session in sorted(related_sessions[clingo_session]):
+            if other_session in pool_sessions and pool_sessions[other_session][0] == end + 1 \
+                    and other_session not in preceded_sessions:
+                following_session[clingo_session] = other_session
+                preceded_sessions.add(other_session)
+                break
+
+    chains: List[List[str]] = []
+    for clingo_session in pool_sessions:
+        if clingo_session in preceded_sessions:
+            continue
+        chain = [clingo_session]
+        while chain[-1] in following_session:
+            chain.append(following_session[chain[-1]])
+        chains.append(chain)
+    return chains
+
+
+def assign_pooled_rooms(solution: List[Tuple[str, tuple]], room_pools: List[RoomPool],
+                        sessions: List[Session]) -> List[Tuple[str, tuple]]:
+    # The encoding never puts more sessions in a pool than rooms it has, so assigning the earliest starting
+    # chains of sessions first to any free room always succeeds, as in interval graph colouring
+    pools_by_name = {room_pool.name: room_pool for room_pool in room_pools}
+    pools_sessions: Dict[str, Dict[str, Tuple[int, int]]] = defaultdict(dict)
+    for predicate, variables in solution:
+        if predicate != ClP.SCHEDULED_SESSION or variables[2] not in pools_by_name:
+            continue
+        timeslot, clingo_session, pool = variables
+        start, end = pools_sessions[pool].get(clingo_session, (timeslot, timeslot,))
+        pools_sessions[pool][clingo_session] = (min(start, timeslot), max(end, timeslot),)
+
+    concrete_rooms: Dict[str, str] = {}
+    for pool, pool_sessions in pools_sessions.items():
+        chains = __find_contiguous_chains(pool_sessions, sessions)
+        chains.sort(key=lambda c: (pool_sessions[c[0]][0], c[0],))
+        rooms_free_from = {ClN.room_to_clingo(room): 0 for room in pools_by_name[pool].rooms}
+        for chain in chains:
+            start, end = pool_sessions[chain[0]][0], pool_sessions[chain[-1]][1]
+            clingo_room = next((r for r, free_from in rooms_free_from.items() if free_from <= start), None)
+            if clingo_room is None:
+                raise RuntimeError(f"Could not assign a room of {pools_by_name[pool]} to {', '.join(chain)}")
+            rooms_free_from[clingo_room] = end + 1
+            for clingo_session in chain:
+                concrete_rooms[clingo_session] = clingo_room
+
+    if not concrete_rooms:
+        return solution
+    return [(predicate, (variables[0], variables[1], concrete_rooms[variables[1]],))
+            if predicate == ClP.SCHEDULED_SESSION and variables[1] in concrete_rooms else (predicate, variables,)
+            for predicate, variables in solution]
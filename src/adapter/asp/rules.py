@@ -1,14 +1,23 @@
-from datetime import timedelta
-from typing import List
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Set, Tuple
 
 from pydantic import UUID4
 
 from adapter.asp.constants import ClingoNaming as ClN, ClingoPredicates as ClP, ClingoVariables as ClV
 from adapter.asp.optimizations import BonusCosts, BonusNames, OptimizationPriorities, PenaltyCosts, PenaltyNames
+from adapter.asp.room_pools import RoomPool, find_room_pools, get_pooled_rooms
 from adapter.time.week import Week
 from models.dto.input import Room, Session
-from models.slot import Slot, SlotType
-from utils.slot_utils import generate_slot_groups, generate_sub_slots
+from models.slot import SlotType
+from utils.clique_utils import find_clique_cover
+from utils.session_utils import get_eligible_rooms, get_eligible_timeslot_ranges, get_eligible_timeslots, \
+    get_room_distances_in_timeslots, get_session_slots_count
+from utils.slot_utils import generate_slot_groups
+
+if TYPE_CHECKING:
+    from adapter.compilation import CompiledSettings
+
+# Bump whenever the generated program changes, so previously compiled encodings are never reused
+ENCODING_VERSION = 4
 
 
 class FactRules:
@@ -37,38 +46,26 @@ class FactRules:
         return statements
 
     @staticmethod
-    def generate_rooms(rooms: List[Room]) -> List[str]:
+    def generate_rooms(rooms: List[Room], room_pools: List[RoomPool]) -> List[str]:
         statements: List[str] = []
+        pooled_rooms = get_pooled_rooms(room_pools)
         for room in rooms:
+            if ClN.room_to_clingo(room) in pooled_rooms:
+                continue
             clingo_room = ClP.room(ClN.room_to_clingo(room), room.constraints.capacity)
             statements.append(f"{clingo_room}.{ClN.get_room_for_comment(room)}")
+        for room_pool in room_pools:
+            statements.append(f"{ClP.room_pool(room_pool.name, len(room_pool.rooms))}.")
         return statements
 
     @staticmethod
-    def __generate_pair_of_rooms(rooms: List[Room], room: Room, other_room_uuid: UUID4):
-        other_room = next(room for room in rooms if room.id == other_room_uuid)
-        room1, room2 = sorted((
-            ClN.room_to_clingo(room),
-            ClN.room_to_clingo(other_room),
-        ))
-        return room1, room2
-
-    @staticmethod
-    def generate_room_distances(rooms: List[Room], week: Week) -> List[str]:
+    def generate_rooms_too_far_for_gaps(rooms: List[Room], week: Week) -> List[str]:
         statements: List[str] = []
 
-        for room in rooms:
-            for other_room_uuid, distance in room.constraints.distances_in_minutes.items():
-                if distance <= 0:
-                    continue
-                room1, room2 = FactRules.__generate_pair_of_rooms(rooms, room, UUID4(other_room_uuid))
-
-                delta = timedelta(minutes=distance)
-                timeslots = week.get_slots_count_for_timedelta_ceil(delta)
-
-                statement = f"{ClP.room_distance(room1, room2, timeslots)}."
-                if statement not in statements:
-                    statements.append(statement)
+        for (room1, room2), distance in get_room_distances_in_timeslots(rooms, week).items():
+            clingo_room1, clingo_room2 = ClN.room_to_clingo(room1), ClN.room_to_clingo(room2)
+            gaps = f"0..{distance - 1}" if distance > 1 else "0"
+            statements.append(f"{ClP.rooms_too_far_for_gap(clingo_room1, clingo_room2, gaps)}.")
 
         return statements
 
@@ -83,34 +80,14 @@ class FactRules:
             statements.append(f"{clingo_session}.% {ClN.get_session_for_comment(session)}")
         return statements
 
-    @staticmethod
-    def __find_subslot_ids(slot: Slot, week: Week) -> List[int]:
-        return [week.get_slot_id(subslot) for subslot in generate_sub_slots(slot, week.slot_duration)]
-
     @staticmethod
     def generate_eligible_timeslots_for_sessions(sessions: List[Session], week: Week) -> List[str]:
         statements: List[str] = []
 
-        blocked_slots = week.get_slot_ids_per_type(SlotType.BLOCKED)
-        common_eligible_slots = [i for i in range(1, week.get_total_slot_count() + 1) if i not in blocked_slots]
-        day_breaks = [first for first, _ in week.get_day_breaks()]
-
         for session in sessions:
             clingo_session = ClN.session_to_clingo(session)
-            session_eligible_slots = common_eligible_slots.copy()
-            session_slots = week.get_slots_count_for_timedelta(session.constraints.duration)
-
-            for disallowed_slots in session.constraints.timeslots_preferences.disallowed_slots:
-                for subslot_id in FactRules.__find_subslot_ids(disallowed_slots, week):
-                    if subslot_id in session_eligible_slots:
-                        session_eligible_slots.remove(subslot_id)
-
-            slot_ranges = [(a, b - session_slots + 1,)
-                           for a, b
-                           in generate_slot_groups(session_eligible_slots, day_breaks)
-                           if (abs(a - b) + 1) >= session_slots]
 
-            for a, b in slot_ranges:
+            for a, b in get_eligible_timeslot_ranges(session, week):
                 eligible_timeslot = ClP.eligible_timeslot_for_session(clingo_session, f"{a}..{b}")
                 slot_a, slot_b = week.get_slot_by_number(a - 1), week.get_slot_by_number(b - 1)
 
@@ -121,84 +98,152 @@ class FactRules:
         return statements
 
     @staticmethod
-    def generate_eligible_rooms_for_sessions(sessions: List[Session], rooms: List[Room]) -> List[str]:
+    def generate_session_types(sessions: List[Session]) -> List[str]:
+        # Rooms eligible for each session are derived from these, instead of listing every session and room pair
+        return [f"{ClP.session_type(ClN.session_to_clingo(s), ClN.session_type_to_clingo(s.constraints.session_type))}."
+                for s in sessions]
+
+    @staticmethod
+    def generate_room_supported_types(rooms: List[Room], room_pools: List[RoomPool]) -> List[str]:
         statements: List[str] = []
+        pooled_rooms = get_pooled_rooms(room_pools)
+        supported_types: Set[Tuple[str, str]] = set()
+        for room in rooms:
+            clingo_room = pooled_rooms.get(ClN.room_to_clingo(room), ClN.room_to_clingo(room))
+            for session_type in room.constraints.session_types:
+                if (clingo_room, session_type,) in supported_types:
+                    continue
+                supported_types.add((clingo_room, session_type,))
+                clingo_session_type = ClN.session_type_to_clingo(session_type)
+                statements.append(f"{ClP.room_supports_type(clingo_room, clingo_session_type)}.")
+        return statements
 
+    @staticmethod
+    def generate_disallowed_rooms_for_sessions(sessions: List[Session], rooms: List[Room]) -> List[str]:
+        # Only the exceptions which actually remove an otherwise eligible room; pools never contain these rooms
+        statements: List[str] = []
+        rooms_by_id = {room.id: room for room in rooms}
         for session in sessions:
             clingo_session = ClN.session_to_clingo(session)
-            for room in rooms:
-                clingo_room = ClN.room_to_clingo(room)
-                if session.constraints.session_type not in room.constraints.session_types:
+            for disallowed_room_uuid in session.constraints.rooms_preferences.disallowed_rooms:
+                room = rooms_by_id.get(disallowed_room_uuid)
+                if room is None or session.constraints.session_type not in room.constraints.session_types:
                     continue
-
-                if room.id in session.constraints.rooms_preferences.disallowed_rooms:
-                    continue
-
-                eligible_room = ClP.eligible_room_for_session(clingo_session, clingo_room)
-                statements.append(f"{eligible_room}.")
-
+                disallowed_room = ClP.disallowed_room_for_session(clingo_session, ClN.room_to_clingo(room))
+                statements.append(f"{disallowed_room}.")
         return statements
 
-    @staticmethod
-    def __generate_conflicting_pair_of_sessions(sessions: List[Session],
-                                                session: Session, no_overlapping_session_uuid: UUID4):
-        other_session = next(session for session in sessions if session.id == no_overlapping_session_uuid)
-        session1, session2 = sorted((
-            ClN.session_to_clingo(session),
-            ClN.session_to_clingo(other_session),
-        ))
-        return session1, session2
-
     @staticmethod
     def generate_no_overlapping_sessions(sessions: List[Session]) -> List[str]:
         statements: List[str] = []
-        for session in sessions:
-            for no_overlapping_session_uuid in session.constraints.cannot_conflict_in_time:
-                session1, session2 = FactRules.__generate_conflicting_pair_of_sessions(
-                    sessions, session, no_overlapping_session_uuid,
-                )
-                statement = f"{ClP.no_timeslot_overlap_in_sessions(session1, session2)}."
-                if statement not in statements:
-                    statements.append(statement)
+
+        pairs = FactRules.find_related_pairs_of_sessions(
+            sessions, lambda s: s.constraints.cannot_conflict_in_time,
+        )
+        clingo_pairs = [(ClN.session_to_clingo(session1), ClN.session_to_clingo(session2),)
+                        for session1, session2 in pairs]
+
+        # Conflicts come from whole cohorts, so groups of mutually conflicting sessions are constrained at once,
+        # once per timeslot, instead of once per pair of sessions in them
+        group = 0
+        for clique in find_clique_cover(clingo_pairs):
+            if len(clique) == 2:
+                statements.append(f"{ClP.no_timeslot_overlap_in_sessions(*clique)}.")
+                continue
+
+            group += 1
+            statements.append(f"{ClP.no_timeslot_overlap_group(group)}.")
+            for clingo_session in clique:
+                statements.append(f"{ClP.session_in_no_timeslot_overlap_group(group, clingo_session)}.")
         return statements
 
     @staticmethod
     def generate_avoid_overlapping_sessions(sessions: List[Session]) -> List[str]:
-        statements: List[str] = []
+        # Kept pairwise, as the overlap penalty is charged per pair of sessions
+        pairs = FactRules.find_related_pairs_of_sessions(
+            sessions, lambda s: s.constraints.avoid_conflict_in_time,
+        )
+        return [f"{ClP.avoid_timeslot_overlap_in_sessions(ClN.session_to_clingo(s1), ClN.session_to_clingo(s2))}."
+                for s1, s2 in pairs]
+
+    @staticmethod
+    def find_related_pairs_of_sessions(sessions: List[Session],
+                                       related_uuids_getter: Callable[[Session], List[UUID4]],
+                                       ) -> List[Tuple[Session, Session]]:
+        sessions_by_id = {session.id: session for session in sessions}
+        pairs: Dict[Tuple[str, str], Tuple[Session, Session]] = {}
         for session in sessions:
-            for no_overlapping_session_uuid in session.constraints.avoid_conflict_in_time:
-                session1, session2 = FactRules.__generate_conflicting_pair_of_sessions(
-                    sessions, session, no_overlapping_session_uuid,
-                )
-                statement = f"{ClP.avoid_timeslot_overlap_in_sessions(session1, session2)}."
-                if statement not in statements:
-                    statements.append(statement)
-        return statements
+            for other_session_uuid in related_uuids_getter(session):
+                other_session = sessions_by_id[other_session_uuid]
+                session1, session2 = sorted((session, other_session,), key=lambda s: ClN.session_to_clingo(s))
+                pairs[(ClN.session_to_clingo(session1), ClN.session_to_clingo(session2),)] = (session1, session2,)
+        return list(pairs.values())
 
     @staticmethod
-    def generate_same_room_if_sessions_contiguous_in_time(sessions: List[Session]) -> List[str]:
+    def __find_starts_followed_by(first_starts: Set[int], first_slots: int, second_starts: Set[int],
+                                  gap: int, week: Week) -> List[int]:
+        # Starts of the first session such that the second one starts exactly gap timeslots after it ends,
+        # without crossing to another day
+        slots_per_day = week.get_slots_per_day_count()
+        return [t for t in first_starts
+                if (t + first_slots + gap) in second_starts
+                and (t - 1) // slots_per_day == (t + first_slots + gap - 1) // slots_per_day]
+
+    @staticmethod
+    def generate_same_room_if_sessions_contiguous_in_time(sessions: List[Session], rooms: List[Room],
+                                                          week: Week) -> List[str]:
         statements: List[str] = []
-        for session in sessions:
-            for no_overlapping_session_uuid in session.constraints.same_room_if_contiguous_in_time:
-                session1, session2 = FactRules.__generate_conflicting_pair_of_sessions(
-                    sessions, session, no_overlapping_session_uuid,
+
+        pairs = FactRules.find_related_pairs_of_sessions(
+            sessions, lambda s: s.constraints.same_room_if_contiguous_in_time,
+        )
+        for session1, session2 in pairs:
+            rooms1, rooms2 = get_eligible_rooms(session1, rooms), get_eligible_rooms(session2, rooms)
+            if len(rooms1) == 1 and rooms1 == rooms2:
+                # Both can only go to the very same room, so there is nothing to enforce
+                continue
+
+            for first, second in ((session1, session2,), (session2, session1,)):
+                starts = FactRules.__find_starts_followed_by(
+                    get_eligible_timeslots(first, week), get_session_slots_count(first, week),
+                    get_eligible_timeslots(second, week), 0, week,
                 )
-                statement = f"{ClP.same_room_if_contiguous_sessions(session1, session2)}."
-                if statement not in statements:
-                    statements.append(statement)
+                clingo_first, clingo_second = ClN.session_to_clingo(first), ClN.session_to_clingo(second)
+                for a, b in generate_slot_groups(starts):
+                    timeslots = f"{a}..{b}" if a != b else a
+                    statements.append(f"{ClP.contiguous_sessions(clingo_first, clingo_second, timeslots)}.")
+
         return statements
 
     @staticmethod
-    def generate_apply_room_distances_to_sessions(sessions: List[Session]) -> List[str]:
+    def generate_apply_room_distances_to_sessions(sessions: List[Session], rooms: List[Room],
+                                                  week: Week) -> List[str]:
         statements: List[str] = []
-        for session in sessions:
-            for no_overlapping_session_uuid in session.constraints.apply_room_distances:
-                session1, session2 = FactRules.__generate_conflicting_pair_of_sessions(
-                    sessions, session, no_overlapping_session_uuid,
-                )
-                statement = f"{ClP.apply_room_distances_to_sessions(session1, session2)}."
-                if statement not in statements:
-                    statements.append(statement)
+
+        room_distances = get_room_distances_in_timeslots(rooms, week)
+        if not room_distances:
+            return statements
+
+        pairs = FactRules.find_related_pairs_of_sessions(
+            sessions, lambda s: s.constraints.apply_room_distances,
+        )
+        for session1, session2 in pairs:
+            for first, second in ((session1, session2,), (session2, session1,)):
+                # Only gaps shorter than the longest distance between rooms they can use may be violated
+                max_distance = max([room_distances.get((room1.id, room2.id,), 0)
+                                    for room1 in get_eligible_rooms(first, rooms)
+                                    for room2 in get_eligible_rooms(second, rooms)], default=0)
+
+                first_starts, second_starts = get_eligible_timeslots(first, week), get_eligible_timeslots(second, week)
+                first_slots = get_session_slots_count(first, week)
+                clingo_first, clingo_second = ClN.session_to_clingo(first), ClN.session_to_clingo(second)
+                for gap in range(max_distance):
+                    starts = FactRules.__find_starts_followed_by(first_starts, first_slots, second_starts, gap, week)
+                    for a, b in generate_slot_groups(starts):
+                        timeslots = f"{a}..{b}" if a != b else a
+                        within_gap = ClP.sessions_within_gap(clingo_first, clingo_second, timeslots, gap)
+                        statements.append(f"{within_gap}.")
+
         return statements
 
     @staticmethod
@@ -226,7 +271,7 @@ class FactRules:
 
             all_penalized_slots: List[int] = []
             for penalized_slots in session.constraints.timeslots_preferences.penalized_slots:
-                all_penalized_slots.extend(FactRules.__find_subslot_ids(penalized_slots, week))
+                all_penalized_slots.extend(week.get_sub_slot_ids(penalized_slots))
             for a, b in generate_slot_groups(all_penalized_slots):
                 slot_a, slot_b = week.get_slot_by_number(a - 1), week.get_slot_by_number(b - 1)
 
@@ -237,7 +282,7 @@ class FactRules:
 
             all_preferred_slots: List[int] = []
             for preferred_slots in session.constraints.timeslots_preferences.preferred_slots:
-                all_preferred_slots.extend(FactRules.__find_subslot_ids(preferred_slots, week))
+                all_preferred_slots.extend(week.get_sub_slot_ids(preferred_slots))
             for a, b in generate_slot_groups(all_preferred_slots):
                 slot_a, slot_b = week.get_slot_by_number(a - 1), week.get_slot_by_number(b - 1)
 
@@ -270,6 +315,14 @@ class ChoiceRules:
 
 
 class NormalRules:
+    @staticmethod
+    def generate_eligible_rooms_for_sessions() -> str:
+        eligible_room = ClP.eligible_room_for_session(ClV.SESSION, ClV.ROOM)
+        session_type = ClP.session_type(ClV.SESSION, ClV.SESSION_TYPE)
+        room_supports_type = ClP.room_supports_type(ClV.ROOM, ClV.SESSION_TYPE)
+        disallowed_room = ClP.disallowed_room_for_session(ClV.SESSION, ClV.ROOM)
+        return f"{eligible_room} :- {session_type}, {room_supports_type}, not {disallowed_room}."
+
     @staticmethod
     def generate_scheduled_sessions() -> str:
         scheduled_session = ClP.scheduled_session(
@@ -294,6 +347,46 @@ class ConstraintRules:
         timeslot = ClP.timeslot(ClV.TIMESLOT)
         return f":- not {{ {scheduled_session} }} 1, {room}, {timeslot}."
 
+    @staticmethod
+    def exclude_more_sessions_than_rooms_in_pool_and_timeslot() -> str:
+        scheduled_session = ClP.scheduled_session(ClV.TIMESLOT, ClV.ANY, ClV.ROOM)
+        room_pool = ClP.room_pool(ClV.ROOM, ClV.ROOM_POOL_SIZE)
+        timeslot = ClP.timeslot(ClV.TIMESLOT)
+        return f":- not {{ {scheduled_session} }} {ClV.ROOM_POOL_SIZE}, {room_pool}, {timeslot}."
+
+    @staticmethod
+    def exclude_sessions_contiguous_to_the_same_session_in_pool() -> List[str]:
+        # Already impossible within a single room; in pools, it lets the contiguous sessions form chains, which are
+        # kept in the same concrete room when rooms are assigned afterwards
+        room_pool = ClP.room_pool(ClV.ROOM, ClV.ANY)
+
+        contiguous_one = ClP.contiguous_sessions(f"{ClV.SESSION}1", f"{ClV.SESSION}2", ClV.TIMESLOT)
+        contiguous_two = ClP.contiguous_sessions(f"{ClV.SESSION}1", f"{ClV.SESSION}3", ClV.TIMESLOT)
+        session = ClP.session(f"{ClV.SESSION}1", ClV.SESSION_DURATION)
+        assigned_timeslot_one = ClP.assigned_timeslot(ClV.TIMESLOT, f"{ClV.SESSION}1")
+        assigned_timeslot_two = ClP.assigned_timeslot(f"{ClV.TIMESLOT}+{ClV.SESSION_DURATION}", f"{ClV.SESSION}2")
+        assigned_timeslot_three = ClP.assigned_timeslot(f"{ClV.TIMESLOT}+{ClV.SESSION_DURATION}", f"{ClV.SESSION}3")
+        assigned_room = ClP.assigned_room(ClV.ROOM, f"{ClV.SESSION}1")
+        followed_twice = f":- {contiguous_one}, {contiguous_two}, {ClV.SESSION}2 < {ClV.SESSION}3, {session}, " \
+                         f"{assigned_timeslot_one}, {assigned_timeslot_two}, {assigned_timeslot_three}, " \
+                         f"{assigned_room}, {room_pool}."
+
+        contiguous_one = ClP.contiguous_sessions(f"{ClV.SESSION}1", f"{ClV.SESSION}3", f"{ClV.TIMESLOT}1")
+        contiguous_two = ClP.contiguous_sessions(f"{ClV.SESSION}2", f"{ClV.SESSION}3", f"{ClV.TIMESLOT}2")
+        session_one = ClP.session(f"{ClV.SESSION}1", f"{ClV.SESSION_DURATION}1")
+        session_two = ClP.session(f"{ClV.SESSION}2", f"{ClV.SESSION_DURATION}2")
+        assigned_timeslot_one = ClP.assigned_timeslot(f"{ClV.TIMESLOT}1", f"{ClV.SESSION}1")
+        assigned_timeslot_two = ClP.assigned_timeslot(f"{ClV.TIMESLOT}2", f"{ClV.SESSION}2")
+        assigned_timeslot_three = ClP.assigned_timeslot(f"{ClV.TIMESLOT}1+{ClV.SESSION_DURATION}1",
+                                                        f"{ClV.SESSION}3")
+        same_end = f"{ClV.TIMESLOT}1+{ClV.SESSION_DURATION}1 == {ClV.TIMESLOT}2+{ClV.SESSION_DURATION}2"
+        assigned_room = ClP.assigned_room(ClV.ROOM, f"{ClV.SESSION}3")
+        preceded_twice = f":- {contiguous_one}, {contiguous_two}, {ClV.SESSION}1 < {ClV.SESSION}2, " \
+                         f"{session_one}, {session_two}, {assigned_timeslot_one}, {assigned_timeslot_two}, " \
+                         f"{assigned_timeslot_three}, {same_end}, {assigned_room}, {room_pool}."
+
+        return [followed_twice, preceded_twice]
+
     @staticmethod
     def exclude_sessions_assigned_in_same_overlapping_timeslot() -> str:
         scheduled_session_one = ClP.scheduled_session(ClV.TIMESLOT, f"{ClV.SESSION}1", ClV.ANY)
@@ -303,18 +396,39 @@ class ConstraintRules:
         return f":- not {{ {scheduled_session_one}; {scheduled_session_two} }} 1, {no_overlap}, {t}."
 
     @staticmethod
-    def exclude_sessions_scheduled_in_contiguous_timeslots_but_different_rooms() -> str:
-        scheduled_session_one = ClP.scheduled_session(ClV.TIMESLOT, f"{ClV.SESSION}1", f"{ClV.ROOM}1")
-        scheduled_session_two_a = ClP.scheduled_session(f"{ClV.TIMESLOT}-1", f"{ClV.SESSION}2", f"{ClV.ROOM}2")
-        scheduled_session_two_b = ClP.scheduled_session(f"{ClV.TIMESLOT}+1", f"{ClV.SESSION}2", f"{ClV.ROOM}2")
+    def exclude_sessions_of_same_no_overlap_group_in_same_timeslot() -> str:
+        scheduled_session = ClP.scheduled_session(ClV.TIMESLOT, ClV.SESSION, ClV.ANY)
+        in_group = ClP.session_in_no_timeslot_overlap_group(ClV.CONFLICT_GROUP, ClV.SESSION)
+        group = ClP.no_timeslot_overlap_group(ClV.CONFLICT_GROUP)
+        t = ClP.timeslot(ClV.TIMESLOT)
+        return f":- not {{ {scheduled_session} : {in_group} }} 1, {group}, {t}."
 
-        same_room = ClP.same_room_if_contiguous_sessions(f"{ClV.SESSION}1", f"{ClV.SESSION}2")
+    @staticmethod
+    def exclude_sessions_scheduled_in_contiguous_timeslots_but_different_rooms() -> str:
+        contiguous = ClP.contiguous_sessions(f"{ClV.SESSION}1", f"{ClV.SESSION}2", ClV.TIMESLOT)
+        session = ClP.session(f"{ClV.SESSION}1", ClV.SESSION_DURATION)
+        assigned_timeslot_one = ClP.assigned_timeslot(ClV.TIMESLOT, f"{ClV.SESSION}1")
+        assigned_timeslot_two = ClP.assigned_timeslot(f"{ClV.TIMESLOT}+{ClV.SESSION_DURATION}", f"{ClV.SESSION}2")
+        assigned_room_one = ClP.assigned_room(ClV.ROOM, f"{ClV.SESSION}1")
+        assigned_room_two = ClP.assigned_room(ClV.ROOM, f"{ClV.SESSION}2")
+
+        body = f"{contiguous}, {session}, {assigned_timeslot_one}, {assigned_timeslot_two}, {assigned_room_one}"
+        return f":- {body}, not {assigned_room_two}."
+
+    @staticmethod
+    def exclude_sessions_scheduled_closer_than_room_distance() -> str:
+        within_gap = ClP.sessions_within_gap(f"{ClV.SESSION}1", f"{ClV.SESSION}2", ClV.TIMESLOT, ClV.GAP)
+        session = ClP.session(f"{ClV.SESSION}1", ClV.SESSION_DURATION)
+        assigned_timeslot_one = ClP.assigned_timeslot(ClV.TIMESLOT, f"{ClV.SESSION}1")
+        assigned_timeslot_two = ClP.assigned_timeslot(
+            f"{ClV.TIMESLOT}+{ClV.SESSION_DURATION}+{ClV.GAP}", f"{ClV.SESSION}2",
+        )
         assigned_room_one = ClP.assigned_room(f"{ClV.ROOM}1", f"{ClV.SESSION}1")
         assigned_room_two = ClP.assigned_room(f"{ClV.ROOM}2", f"{ClV.SESSION}2")
-        not_equal = f"{ClV.ROOM}1 != {ClV.ROOM}2"
+        too_far = ClP.rooms_too_far_for_gap(f"{ClV.ROOM}1", f"{ClV.ROOM}2", ClV.GAP)
 
-        choice = f"{{ {scheduled_session_two_a}; {scheduled_session_one}; {scheduled_session_two_b} }} 1"
-        return f":- not {choice}, {same_room}, {assigned_room_one}, {assigned_room_two}, {not_equal}."
+        return f":- {within_gap}, {session}, {assigned_timeslot_one}, {assigned_timeslot_two}, " \
+               f"{assigned_room_one}, {assigned_room_two}, {too_far}."
 
 
 class OptimizationRules:
@@ -403,6 +517,37 @@ class Directives:
         bonus = ClP.bonus(ClV.BONUS_NAME, ClV.BONUS_COST, ClV.BONUS_VALUE, ClV.BONUS_PRIORITY)
         return f"#maximize {{ {bonus_calc} : {bonus} }}."
 
+    @staticmethod
+    def generate_stepwise_objective() -> str:
+        # Objective of a single priority level, which can be switched off once its bound is frozen
+        objective_active = ClP.objective_active(ClV.LEVEL)
+        penalty_calc = f"{ClV.PENALTY_COST}@{ClV.LEVEL},{ClV.PENALTY_NAME},{ClV.PENALTY_VALUE}"
+        penalty = ClP.penalty(ClV.PENALTY_NAME, ClV.PENALTY_COST, ClV.PENALTY_VALUE, ClV.LEVEL)
+        bonus_calc = f"-{ClV.BONUS_COST}@{ClV.LEVEL},{ClV.BONUS_NAME},{ClV.BONUS_VALUE}"
+        bonus = ClP.bonus(ClV.BONUS_NAME, ClV.BONUS_COST, ClV.BONUS_VALUE, ClV.LEVEL)
+        return "\n".join([
+            f"#external {objective_active}.",
+            f"#minimize {{ {penalty_calc} : {penalty}, {objective_active}; "
+            f"{bonus_calc} : {bonus}, {objective_active} }}.",
+        ])
+
+    @staticmethod
+    def generate_stepwise_freeze() -> str:
+        penalty_calc = f"{ClV.PENALTY_COST},{ClV.PENALTY_NAME},{ClV.PENALTY_VALUE}"
+        penalty = ClP.penalty(ClV.PENALTY_NAME, ClV.PENALTY_COST, ClV.PENALTY_VALUE, ClV.LEVEL)
+        bonus_calc = f"-{ClV.BONUS_COST},{ClV.BONUS_NAME},{ClV.BONUS_VALUE}"
+        bonus = ClP.bonus(ClV.BONUS_NAME, ClV.BONUS_COST, ClV.BONUS_VALUE, ClV.LEVEL)
+        return f":- #sum {{ {penalty_calc} : {penalty}; {bonus_calc} : {bonus} }} > {ClV.BOUND}."
+
+    @staticmethod
+    def generate_warm_start(placements: Dict[str, Tuple[int, str]]) -> List[str]:
+        # Initial truth values to try for the decision atoms; only followed with the domain heuristic
+        statements: List[str] = []
+        for session, (timeslot, room) in placements.items():
+            statements.append(f"#heuristic {ClP.assigned_timeslot(timeslot, session)}. [1,true]")
+            statements.append(f"#heuristic {ClP.assigned_room(room, session)}. [1,true]")
+        return statements
+
     @staticmethod
     def generate_show() -> List[str]:
         return [
@@ -417,23 +562,31 @@ class Rules:
         self.sessions = sessions
         self.rooms = rooms
         self.week = week
+        self.room_pools = find_room_pools(sessions, rooms)
 
-    def __generate_facts(self) -> str:
+    @staticmethod
+    def generate_week_facts(week: Week) -> str:
         return "\n".join([
-            FactRules.generate_timeslot(self.week),
-            *FactRules.generate_undesirable_timeslots(self.week),
+            FactRules.generate_timeslot(week),
+            *FactRules.generate_undesirable_timeslots(week),
+        ])
 
-            *FactRules.generate_rooms(self.rooms),
-            *FactRules.generate_room_distances(self.rooms, self.week),
+    def __generate_facts(self, week_facts: str) -> str:
+        return "\n".join([
+            week_facts,
+
+            *FactRules.generate_rooms(self.rooms, self.room_pools),
+            *FactRules.generate_rooms_too_far_for_gaps(self.rooms, self.week),
 
             *FactRules.generate_sessions(self.sessions, self.week),
             *FactRules.generate_eligible_timeslots_for_sessions(self.sessions, self.week),
-            *FactRules.generate_eligible_rooms_for_sessions(self.sessions, self.rooms),
+            *FactRules.generate_session_types(self.sessions),
+            *FactRules.generate_room_supported_types(self.rooms, self.room_pools),
+            *FactRules.generate_disallowed_rooms_for_sessions(self.sessions, self.rooms),
             *FactRules.generate_no_overlapping_sessions(self.sessions),
             *FactRules.generate_avoid_overlapping_sessions(self.sessions),
-            *FactRules.generate_same_room_if_sessions_contiguous_in_time(self.sessions),
-            # TODO: Pending ASP restriction...
-            *FactRules.generate_apply_room_distances_to_sessions(self.sessions),
+            *FactRules.generate_same_room_if_sessions_contiguous_in_time(self.sessions, self.rooms, self.week),
+            *FactRules.generate_apply_room_distances_to_sessions(self.sessions, self.rooms, self.week),
             *FactRules.generate_room_preferences_for_sessions(self.sessions),
             *FactRules.generate_timeslot_preferences_for_sessions(self.sessions, self.week),
         ])
@@ -448,6 +601,7 @@ class Rules:
     @staticmethod
     def __generate_normals() -> str:
         return "\n".join([
+            NormalRules.generate_eligible_rooms_for_sessions(),
             NormalRules.generate_scheduled_sessions(),
         ])
 
@@ -455,9 +609,12 @@ class Rules:
     def __generate_constraints() -> str:
         return "\n".join([
             ConstraintRules.exclude_more_than_one_session_in_same_room_and_timeslot(),
+            ConstraintRules.exclude_more_sessions_than_rooms_in_pool_and_timeslot(),
+            *ConstraintRules.exclude_sessions_contiguous_to_the_same_session_in_pool(),
             ConstraintRules.exclude_sessions_assigned_in_same_overlapping_timeslot(),
-            # TODO...
-            # ConstraintRules.exclude_sessions_scheduled_in_contiguous_timeslots_but_different_rooms(),
+            ConstraintRules.exclude_sessions_of_same_no_overlap_group_in_same_timeslot(),
+            ConstraintRules.exclude_sessions_scheduled_in_contiguous_timeslots_but_different_rooms(),
+            ConstraintRules.exclude_sessions_scheduled_closer_than_room_distance(),
         ])
 
     @staticmethod
@@ -470,26 +627,44 @@ class Rules:
         ])
 
     @staticmethod
-    def __generate_directives() -> str:
+    def __generate_directives(optimization_directives: bool) -> str:
+        if not optimization_directives:
+            return "\n".join(Directives.generate_show())
         return "\n".join([
             Directives.generate_penalty_definition(),
             Directives.generate_bonus_definition(),
             *Directives.generate_show(),
         ])
 
-    def generate_asp_problem(self) -> str:
-        facts = self.__generate_facts()
+    @staticmethod
+    def generate_static_rules(optimization_directives: bool = True) -> str:
+        # Everything which does not depend on the sessions, rooms nor week being scheduled
         choices = Rules.__generate_choices()
         normals = Rules.__generate_normals()
         constraints = Rules.__generate_constraints()
         optimizations = Rules.__generate_optimizations()
-        directives = Rules.__generate_directives()
+        directives = Rules.__generate_directives(optimization_directives)
 
         return "\n\n".join([
-            facts,
             choices,
             normals,
             constraints,
             optimizations,
             directives,
+        ])
+
+    def generate_asp_problem(self, optimization_directives: bool = True,
+                             compiled_settings: Optional["CompiledSettings"] = None) -> str:
+        if compiled_settings is not None:
+            week_facts = compiled_settings.week_facts
+            static_rules = compiled_settings.get_static_rules(optimization_directives)
+        else:
+            week_facts = Rules.generate_week_facts(self.week)
+            static_rules = Rules.generate_static_rules(optimization_directives)
+
+        facts = self.__generate_facts(week_facts)
+
+        return "\n\n".join([
+            facts,
+            static_rules,
         ]) + "\n"
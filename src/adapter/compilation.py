@@ -0,0 +1,62 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+from adapter.asp.rules import ENCODING_VERSION, Rules
+from adapter.time.week import Week
+from models.settings import Settings
+
+__CACHE_SIZE = int(os.environ.get("COMPILED_SETTINGS__CACHE_SIZE", "8"))
+
+
+class CompiledSettings:
+    def __init__(self, settings: Settings):
+        self.week = Week(settings)
+        self.week_facts = Rules.generate_week_facts(self.week)
+        self.__static_rules = {
+            optimization_directives: Rules.generate_static_rules(optimization_directives)
+            for optimization_directives in (True, False)
+        }
+
+    def get_static_rules(self, optimization_directives: bool) -> str:
+        return self.__static_rules[optimization_directives]
+
+
+def get_settings_key(settings: Settings) -> str:
+    serialized_settings = settings.json(by_alias=True, sort_keys=True)
+    return hashlib.sha256(f"{ENCODING_VERSION}:{serialized_settings}".encode()).hexdigest()
+
+
+class CompiledSettingsCache:
+    def __init__(self, max_size: int):
+        self.__max_size = max_size
+        self.__entries: "OrderedDict[str, CompiledSettings]" = OrderedDict()
+        self.__lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, settings: Settings) -> CompiledSettings:
+        key = get_settings_key(settings)
+        with self.__lock:
+            if key in self.__entries:
+                self.hits += 1
+                self.__entries.move_to_end(key)
+                return self.__entries[key]
+            self.misses += 1
+
+        # Compiled outside the lock; if two threads race for the same settings, both results are equivalent
+        compiled_settings = CompiledSettings(settings)
+        with self.__lock:
+            self.__entries[key] = compiled_settings
+            self.__entries.move_to_end(key)
+            while len(self.__entries) > self.__max_size:
+                self.__entries.popitem(last=False)
+        return compiled_settings
+
+
+__compiled_settings_cache = CompiledSettingsCache(__CACHE_SIZE)
+
+
+def get_compiled_settings_cache() -> CompiledSettingsCache:
+    return __compiled_settings_cache
@@ -0,0 +1,43 @@
+from typing import Optional
+
+from models.slot import Slot, SlotType
+from models.timeframe import Timeframe
+from utils.time_utils import format_minutes, minutes_to_time, time_to_minutes
+
+
+class MinuteSlot:
+    # Internal counterpart of Slot, with times as minutes since midnight; cheap enough to be built in hot loops
+    __slots__ = ("week_day", "start", "end", "slot_type",)
+
+    def __init__(self, week_day: int, start: int, end: int, slot_type: Optional[SlotType] = None):
+        self.week_day = week_day
+        self.start = start
+        self.end = end
+        self.slot_type = slot_type
+
+    @staticmethod
+    def from_slot(slot: Slot) -> "MinuteSlot":
+        return MinuteSlot(
+            slot.week_day,
+            time_to_minutes(slot.timeframe.start),
+            time_to_minutes(slot.timeframe.end),
+            slot.slot_type,
+        )
+
+    def to_slot(self) -> Slot:
+        return Slot(
+            week_day=self.week_day,
+            timeframe=Timeframe(start=minutes_to_time(self.start), end=minutes_to_time(self.end)),
+            slot_type=self.slot_type,
+        )
+
+    def __hash__(self):
+        return hash((self.week_day, self.start, self.end,))
+
+    def __eq__(self, other):
+        return isinstance(other, MinuteSlot) and other.week_day == self.week_day \
+            and other.start == self.start and other.end == self.end
+
+    def __repr__(self):
+        return f"MinuteSlot({self.week_day}, {format_minutes(self.start)} - {format_minutes(self.end)}, " \
+               f"{self.slot_type})"
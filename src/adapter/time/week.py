@@ -4,39 +4,42 @@ from collections import defaultdict
 from datetime import timedelta
 from typing import Dict, List, Tuple
 
+from adapter.time.minute_slot import MinuteSlot
 from models.settings import Settings
 from models.slot import Slot, SlotType
-from models.timeframe import Timeframe
 from utils.slot_utils import generate_sub_slots
-from utils.time_utils import time_to_datetime
+from utils.time_utils import time_to_minutes, timedelta_to_minutes
 
 
 class Week:
     def __init__(self, settings: Settings):
-        self.__day_timeframe: Timeframe = Timeframe(start=settings.day_start, end=settings.day_end)
+        self.__day_start: int = time_to_minutes(settings.day_start)
+        self.__day_end: int = time_to_minutes(settings.day_end)
         self.__slot_duration: timedelta = settings.slot_duration
+        self.__slot_minutes: int = timedelta_to_minutes(settings.slot_duration)
+        self.__slots_per_day: int = (self.__day_end - self.__day_start) // self.__slot_minutes
 
-        self.slots: Dict[int, List[Slot]] = defaultdict(list)
+        self.slots: Dict[int, List[MinuteSlot]] = defaultdict(list)
         for day in settings.week_days:
-            day_slot = Slot(
-                week_day=day,
-                timeframe=self.__day_timeframe,
-            )
-            self.slots[day] = generate_sub_slots(day_slot, self.__slot_duration)
+            day_slot = MinuteSlot(day, self.__day_start, self.__day_end)
+            self.slots[day] = generate_sub_slots(day_slot, self.__slot_minutes)
 
         for slot in settings.modified_slots:
-            self.__update_slot_type(slot)
+            self.__update_slot_type(MinuteSlot.from_slot(slot))
 
-    def __update_slot_type(self, full_slot: Slot):
-        slots_to_update = generate_sub_slots(full_slot, self.__slot_duration)
+    def __update_slot_type(self, full_slot: MinuteSlot):
         original_slots = self.slots[full_slot.week_day]
-        for slot in slots_to_update:
-            current_index = original_slots.index(slot)
-            original_slots[current_index] = slot
+        for slot in generate_sub_slots(full_slot, self.__slot_minutes):
+            original_slots[self.__get_day_index(slot)] = slot
+
+    def __get_day_index(self, slot: MinuteSlot) -> int:
+        index, remainder = divmod(slot.start - self.__day_start, self.__slot_minutes)
+        if remainder or not 0 <= index < len(self.slots.get(slot.week_day, [])):
+            raise ValueError(f"{slot} is not in the week")
+        return index
 
     def get_slots_per_day_count(self) -> int:
-        delta = time_to_datetime(self.__day_timeframe.end) - time_to_datetime(self.__day_timeframe.start)
-        return int(delta / self.__slot_duration)
+        return self.__slots_per_day
 
     def get_slots_count_for_timedelta(self, td: timedelta) -> int:
         return int(td / self.__slot_duration)
@@ -47,14 +50,17 @@ class Week:
     def get_total_slot_count(self) -> int:
         return sum(map(len, self.slots.values()))
 
-    def get_slot_by_number(self, number: int) -> Slot:
+    def get_slot_by_number(self, number: int) -> MinuteSlot:
         slots_per_day = self.get_slots_per_day_count()
         day = math.floor(number / slots_per_day)
         return self.slots[day + 1][number - slots_per_day * day]
 
-    def get_slot_id(self, slot: Slot) -> int:
-        day_slots = self.slots[slot.week_day]
-        return (slot.week_day - 1) * self.get_slots_per_day_count() + day_slots.index(slot) + 1
+    def get_slot_id(self, slot: MinuteSlot) -> int:
+        return (slot.week_day - 1) * self.get_slots_per_day_count() + self.__get_day_index(slot) + 1
+
+    def get_sub_slot_ids(self, full_slot: Slot) -> List[int]:
+        sub_slots = generate_sub_slots(MinuteSlot.from_slot(full_slot), self.__slot_minutes)
+        return [self.get_slot_id(slot) for slot in sub_slots]
 
     def get_day_breaks(self) -> List[Tuple[int, int]]:
         total_slots = self.get_total_slot_count()
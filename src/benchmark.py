@@ -0,0 +1,277 @@
+import argparse
+import glob
+import os
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import timedelta
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from adapter.asp.constants import ClingoPrograms as ClPr
+from adapter.asp.rules import Rules
+from adapter.time.week import Week
+from models.dto.input import SolverInput
+from models.dto.output import Output
+from sdk.compression import Compression, compress_text, decompress_bytes
+from sdk.output_json import iter_output_json, write_output_json
+from utils.table_utils import print_table
+
+
+def ground_asp_problem(asp_problem: str, timeout: Optional[int]) -> List[str]:
+    # Grounds the program in gringo mode, measuring how big the resulting ground program is
+    start = time.perf_counter()
+    try:
+        grounded = subprocess.run(["clingo", "--mode=gringo", "--output=smodels"],
+                                  input=asp_problem.encode(), stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                  timeout=timeout)
+    except subprocess.TimeoutExpired:
+        return ["TIMEOUT", "-", "-"]
+    elapsed = time.perf_counter() - start
+
+    ground_rules = grounded.stdout.count(b"\n")
+    return [f"{elapsed:.2f}s", str(ground_rules), f"{len(grounded.stdout) / 1024 / 1024:.2f}MB"]
+
+
+def benchmark_grounding(input_files: List[str], timeout: Optional[int]):
+    rows = [["Input", "Program Size", "Generation", "Grounding", "Ground Rules", "Ground Size"]]
+    for input_file in input_files:
+        input_data = SolverInput.parse_file(input_file)
+
+        start = time.perf_counter()
+        week = Week(input_data.settings)
+        asp_problem = Rules(week, input_data.sessions, input_data.rooms).generate_asp_problem()
+        elapsed = time.perf_counter() - start
+
+        rows.append([
+            input_file,
+            f"{len(asp_problem) / 1024:.0f}KB",
+            f"{elapsed:.2f}s",
+            *ground_asp_problem(asp_problem, timeout),
+        ])
+    print_table(rows)
+
+
+def collect_artifacts(input_file: str) -> Dict[str, str]:
+    # The generated problem, plus any artifact already stored next to the input by a previous execution
+    input_data = SolverInput.parse_file(input_file)
+    artifacts = {"asp_problem": Rules(Week(input_data.settings), input_data.sessions,
+                                      input_data.rooms).generate_asp_problem()}
+    for artifact_file in sorted(Path(input_file).parent.glob("asp_*.txt")):
+        if artifact_file.stem not in artifacts:
+            artifacts[artifact_file.stem] = artifact_file.read_text()
+    return artifacts
+
+
+def benchmark_compression(input_files: List[str], compression: Compression):
+    rows = [["Input", "Artifact", "Plain Size", "Compressed Size", "Ratio", "Compression", "Decompression"]]
+    for input_file in input_files:
+        for artifact_name, content in collect_artifacts(input_file).items():
+            plain_size = len(content.encode(encoding="utf-8"))
+
+            start = time.perf_counter()
+            with compress_text(content, compression) as compressed:
+                compressed_data = compressed.read()
+            compression_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            decompress_bytes(compressed_data, compression.value)
+            decompression_time = time.perf_counter() - start
+
+            rows.append([
+                input_file,
+                artifact_name,
+                f"{plain_size / 1024:.0f}KB",
+                f"{len(compressed_data) / 1024:.0f}KB",
+                f"{plain_size / max(len(compressed_data), 1):.1f}x",
+                f"{compression_time:.3f}s",
+                f"{decompression_time:.3f}s",
+            ])
+    print_table(rows)
+
+
+def measure_serialization(serialize: Callable[[], object]) -> Tuple[float, float]:
+    # Peak memory allocated while serializing, on top of the already parsed output
+    tracemalloc.start()
+    start = time.perf_counter()
+    serialize()
+    elapsed = time.perf_counter() - start
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak_memory / 1024 / 1024
+
+
+def benchmark_serialization(output_files: List[str]) -> bool:
+    identical = True
+    rows = [["Output", "Units", "Size", "Serializer", "Time", "Peak Memory"]]
+    for output_file in output_files:
+        output = Output.parse_file(output_file)
+        # Parsed units hold their own copy of every session and room, while solvers share the input ones
+        sessions = {unit.session.id: unit.session for unit in output.timetable}
+        rooms = {unit.room.id: unit.room for unit in output.timetable}
+        for unit in output.timetable:
+            unit.session, unit.room = sessions[unit.session.id], rooms[unit.room.id]
+        expected = output.json(by_alias=True, exclude_none=True)
+        identical = identical and "".join(iter_output_json(output)) == expected
+
+        # Both write to a file, as saving the output does
+        with open(os.devnull, 'w') as f:
+            for name, serialize in (
+                    ("pydantic", lambda: f.write(output.json(by_alias=True, exclude_none=True)),),
+                    ("output_json", lambda: write_output_json(f, output),),
+            ):
+                elapsed, peak_memory = measure_serialization(serialize)
+                rows.append([output_file, str(len(output.timetable)), f"{len(expected) / 1024:.0f}KB", name,
+                             f"{elapsed:.3f}s", f"{peak_memory:.1f}MB"])
+    print_table(rows)
+    print("Identical output" if identical else "DIFFERENT OUTPUT")
+    return identical
+
+
+def measure_startup(statement: str, runs: int) -> List[float]:
+    # Every run is a fresh interpreter, as a cold start would be
+    code = f"import time\nstart = time.perf_counter()\n{statement}\nprint(time.perf_counter() - start)"
+    timings = []
+    for _ in range(runs):
+        measured = subprocess.run([sys.executable, "-c", code], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                  check=True)
+        timings.append(float(measured.stdout.decode().strip().splitlines()[-1]) * 1000)
+    return timings
+
+
+def benchmark_startup(runs: int, budget: Optional[float]) -> bool:
+    stages = [
+        ("import lambda_handlers", "import lambda_handlers"),
+        ("import cli", "import cli"),
+        ("init S3 client", "from sdk.aws_s3 import get_s3_client\nget_s3_client()"),
+    ]
+
+    within_budget = True
+    rows = [["Stage", "Median", "Min", "Max", "Budget"]]
+    for name, statement in stages:
+        timings = measure_startup(statement, runs)
+        median = statistics.median(timings)
+        status = "-"
+        if budget is not None and name.startswith("import"):
+            status = "OK" if median <= budget else "OVER"
+            within_budget = within_budget and median <= budget
+        rows.append([name, f"{median:.0f}ms", f"{min(timings):.0f}ms", f"{max(timings):.0f}ms", status])
+    print_table(rows)
+    return within_budget
+
+
+def solve_asp_problem(asp_problem: str, time_limit: int) -> List[str]:
+    # Same shape as the difference logic solver statistics: grounding, first model and best costs in time
+    from clingo import Control
+
+    first_model_time, costs = None, None
+
+    def on_model(model):
+        nonlocal first_model_time, costs
+        if first_model_time is None:
+            first_model_time = time.perf_counter() - start
+        costs = list(model.cost)
+
+    start = time.perf_counter()
+    control = Control(["--opt-mode=opt"])
+    control.add(ClPr.BASE, [], asp_problem)
+    control.ground([(ClPr.BASE, [])])
+    grounding_time = time.perf_counter() - start
+    with control.solve(on_model=on_model, async_=True) as handle:
+        if not handle.wait(max(0., time_limit - grounding_time)):
+            handle.cancel()
+        handle.get()
+
+    return [
+        f"{grounding_time:.2f}s",
+        f"{first_model_time:.2f}s" if first_model_time is not None else "-",
+        str(costs) if costs is not None else "-",
+    ]
+
+
+def solve_dl_problem(dl_problem: str, durations: Dict[str, int], time_limit: int) -> List[str]:
+    from business.difference_logic import DifferenceLogicSolver
+    from models.solver_options import SolverOptions
+
+    solver = DifferenceLogicSolver(dl_problem, durations, SolverOptions(), log=lambda _: None)
+    solver.solve(timedelta(seconds=time_limit))
+    return [
+        f"{solver.grounding_time:.2f}s",
+        f"{solver.first_model_time:.2f}s" if solver.first_model_time is not None else "-",
+        str(solver.costs) if solver.costs is not None else "-",
+    ]
+
+
+def benchmark_backends(input_files: List[str], time_limit: int):
+    from adapter.asp.difference_logic import DifferenceLogicRules, get_session_durations
+
+    rows = [["Input", "Backend", "Program Size", "Grounding", "First Model", f"Costs in {time_limit}s"]]
+    for input_file in input_files:
+        input_data = SolverInput.parse_file(input_file)
+        week = Week(input_data.settings)
+
+        asp_problem = Rules(week, input_data.sessions, input_data.rooms).generate_asp_problem()
+        rows.append([input_file, "asp", f"{len(asp_problem) / 1024:.0f}KB",
+                     *solve_asp_problem(asp_problem, time_limit)])
+
+        dl_problem = DifferenceLogicRules(week, input_data.sessions, input_data.rooms).generate_dl_problem()
+        durations = get_session_durations(input_data.sessions, week)
+        rows.append([input_file, "difference logic", f"{len(dl_problem) / 1024:.0f}KB",
+                     *solve_dl_problem(dl_problem, durations, time_limit)])
+    print_table(rows)
+
+
+def expand_input_files(patterns: List[str]) -> List[str]:
+    input_files: List[str] = []
+    for pattern in patterns:
+        input_files.extend(sorted(glob.glob(pattern)) or [pattern])
+    return input_files
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        prog='ASP Solver Benchmarks',
+        description='Measure the different stages of the solver on benchmark instances')
+
+    sub_parsers = parser.add_subparsers(title="benchmark", dest="benchmark", required=True)
+
+    parser_grounding = sub_parsers.add_parser('grounding', help='Measure program generation and grounding size')
+    parser_grounding.add_argument('inputs', nargs='+', help="input.json files (or glob patterns) to ground")
+    parser_grounding.add_argument('-t', '--timeout', type=int, help="Grounding will timeout after these seconds")
+
+    parser_compression = sub_parsers.add_parser('compression', help='Measure artifact compression size and time')
+    parser_compression.add_argument('inputs', nargs='+', help="input.json files (or glob patterns) to compress "
+                                                             "their artifacts")
+    parser_compression.add_argument('-c', '--compression', type=str, choices=[c.value for c in Compression],
+                                    default=Compression.GZIP.value, help="Compression algorithm")
+
+    parser_serialization = sub_parsers.add_parser('serialization', help='Measure output.json serialization')
+    parser_serialization.add_argument('outputs', nargs='+', help="output.json files (or glob patterns) to serialize")
+
+    parser_startup = sub_parsers.add_parser('startup', help='Measure entry points import and initialization time')
+    parser_startup.add_argument('-r', '--runs', type=int, default=5, help="Fresh interpreters to measure")
+    parser_startup.add_argument('-b', '--budget', type=float,
+                                help="Import time budget in milliseconds; exits with an error if exceeded")
+
+    parser_backends = sub_parsers.add_parser('backends', help='Compare the ASP and difference logic encodings')
+    parser_backends.add_argument('inputs', nargs='+', help="input.json files (or glob patterns) to solve")
+    parser_backends.add_argument('-t', '--timeLimit', type=int, default=60,
+                                 help="Seconds given to each backend on each input")
+
+    args = parser.parse_args()
+    if args.benchmark == "grounding":
+        benchmark_grounding(expand_input_files(args.inputs), args.timeout)
+    elif args.benchmark == "compression":
+        benchmark_compression(expand_input_files(args.inputs), Compression(args.compression))
+    elif args.benchmark == "backends":
+        benchmark_backends(expand_input_files(args.inputs), args.timeLimit)
+    elif args.benchmark == "serialization":
+        if not benchmark_serialization(expand_input_files(args.outputs)):
+            sys.exit(1)
+    elif args.benchmark == "startup":
+        if not benchmark_startup(args.runs, args.budget):
+            sys.exit(1)
+    else:
+        raise NotImplementedError("Unknown Benchmark")
@@ -0,0 +1,128 @@
+import glob
+import os
+import signal
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from adapter.asp.constants import ClingoPredicates as ClP
+from models.solver_options import SolverOptions
+from sdk.local_fs import read_local_txt_file
+
+__CLI_FILE = Path(__file__).parent.parent / "cli.py"
+# Time granted on top of the solver timeout for program generation, grounding and storing the output
+__GRACE_TIME = 60
+# Same default as AspSolver, for jobs without an explicit timeout
+__DEFAULT_TIMEOUT = 60 * 60
+
+
+class BatchJobResult:
+    def __init__(self, work_dir: str, status: str, penalty: Optional[int], wall_time: float):
+        self.work_dir = work_dir
+        self.status = status
+        self.penalty = penalty
+        self.wall_time = wall_time
+
+
+def expand_work_dirs(patterns: List[str]) -> List[str]:
+    work_dirs: List[str] = []
+    for pattern in patterns:
+        matches = sorted(path for path in glob.glob(pattern) if (Path(path) / "input.json").exists())
+        work_dirs.extend(matches or [pattern])
+    return work_dirs
+
+
+def plan_batch(jobs: Optional[int], threads: Optional[int]) -> Tuple[int, int]:
+    # Concurrent jobs times clingo threads per job never exceed the available CPUs
+    cpus = os.cpu_count() or 1
+    if jobs is None:
+        threads = max(1, min(threads or 1, cpus))
+        return max(1, cpus // threads), threads
+    return jobs, max(1, min(threads or 1, cpus // jobs))
+
+
+def get_solver_options_arguments(solver_options: SolverOptions) -> List[str]:
+    arguments: List[str] = []
+    for flag, value in (
+            ("--configuration", solver_options.configuration),
+            ("--optStrategy", solver_options.optimization_strategy),
+            ("--heuristic", solver_options.heuristic),
+            ("--restarts", solver_options.restart_policy),
+            ("--seed", solver_options.seed),
+            ("--threads", solver_options.threads),
+            ("--stagnation", solver_options.stagnation_timeout),
+            ("--gap", solver_options.gap_threshold),
+    ):
+        if value is not None:
+            arguments.extend([flag, str(value.value if hasattr(value, "value") else value)])
+    if solver_options.stepwise:
+        arguments.append("--stepwise")
+    if solver_options.warm_start:
+        arguments.append("--warmStart")
+    if solver_options.multi_resolution:
+        arguments.append("--multiResolution")
+    if solver_options.difference_logic:
+        arguments.append("--differenceLogic")
+    if solver_options.diagnose:
+        arguments.append("--diagnose")
+    return arguments
+
+
+def get_solution_penalty(optimization: Optional[str]) -> Optional[int]:
+    if optimization is None:
+        return None
+
+    penalty = 0
+    for line in optimization.splitlines():
+        predicate, _, _, cost, _ = line.split("\t")
+        penalty += int(cost) if predicate == ClP.PENALTY else -int(cost)
+    return penalty
+
+
+def run_batch_job(work_dir: str, timeout: Optional[int], solver_options: SolverOptions,
+                  greedy: bool = False) -> BatchJobResult:
+    command = [sys.executable, str(__CLI_FILE), "-f", work_dir, *get_solver_options_arguments(solver_options)]
+    if greedy:
+        command.append("--greedy")
+    if timeout is not None:
+        command.extend(["-t", str(timeout)])
+
+    start = time.time()
+    # Own session, so a timed out job is killed together with the clingo processes it spawned
+    process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, start_new_session=True)
+    try:
+        _, stderr = process.communicate(timeout=(timeout or __DEFAULT_TIMEOUT) + __GRACE_TIME)
+    except subprocess.TimeoutExpired:
+        os.killpg(process.pid, signal.SIGKILL)
+        process.communicate()
+        return BatchJobResult(work_dir, "KILLED", None, time.time() - start)
+    wall_time = time.time() - start
+
+    status = read_local_txt_file(Path(work_dir), "asp_status", modified_after=start)
+    status = status.splitlines()[0] if status else "ERROR"
+    if process.returncode != 0 and status == "ERROR":
+        print(f"[{work_dir}] {stderr.decode().strip().splitlines()[-1] if stderr.strip() else 'Unknown error'}")
+
+    optimization = read_local_txt_file(Path(work_dir), "asp_optimization", modified_after=start)
+    return BatchJobResult(work_dir, status, get_solution_penalty(optimization), wall_time)
+
+
+def run_batch(work_dirs: List[str], timeout: Optional[int], solver_options: SolverOptions,
+              jobs: Optional[int] = None, greedy: bool = False) -> List[BatchJobResult]:
+    jobs, threads = plan_batch(jobs, solver_options.threads)
+    if solver_options.threads is not None and threads < solver_options.threads:
+        print(f"Capping clingo threads per job from {solver_options.threads} to {threads}")
+    solver_options = solver_options.copy(update={"threads": threads if threads > 1 else None})
+    print(f"Solving {len(work_dirs)} working directories, {jobs} at a time with {threads} threads each")
+
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        futures = [executor.submit(run_batch_job, work_dir, timeout, solver_options, greedy) for work_dir in work_dirs]
+        results = []
+        for future in futures:
+            result = future.result()
+            print(f"[{result.work_dir}] {result.status} in {result.wall_time:.1f}s")
+            results.append(result)
+    return results
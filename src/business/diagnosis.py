@@ -0,0 +1,107 @@
+import threading
+import time
+from datetime import timedelta
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from clingo import Control, Function, Symbol
+
+from adapter.asp.constants import ClingoPredicates as ClP, ClingoPrograms as ClPr
+from adapter.asp.diagnosis import DiagnosisRules
+from business.stepwise import summarize_clingo_statistics, wait_for_solve
+
+
+class InfeasibilityDiagnoser:
+    def __init__(self, diagnosis_rules: DiagnosisRules, log: Callable[[str], None] = print,
+                 cancelled: Optional[threading.Event] = None):
+        self.__rules = diagnosis_rules
+        self.__log = log
+        self.__cancelled = cancelled
+        self.__control = Control()
+
+        self.core: Optional[List[Symbol]] = None
+        self.minimal = False
+        self.checks = 0
+        self.grounding_time: Optional[float] = None
+        self.__literals: Dict[Symbol, int] = {}
+        self.__deadline = 0.
+
+    def __check(self, enforced_groups: Sequence[Symbol]) -> Tuple[Optional[bool], List[Symbol]]:
+        # Enforces exactly the given groups, and relaxes all the others; the core is only known if unsatisfiable
+        enforced = set(enforced_groups)
+        assumptions = [literal if group in enforced else -literal for group, literal in self.__literals.items()]
+        groups_by_literal = {literal: group for group, literal in self.__literals.items()}
+
+        remaining_time = self.__deadline - time.monotonic()
+        if remaining_time <= 0:
+            # Preparing the solve is not interruptible either, so it is not even started without time left
+            return None, []
+
+        self.checks += 1
+        with self.__control.solve(assumptions=assumptions, async_=True) as handle:
+            if not wait_for_solve(handle, remaining_time, self.__cancelled):
+                handle.cancel()
+            result = handle.get()
+            if result.satisfiable:
+                return True, []
+            if not result.unsatisfiable:
+                return None, []
+            # Relaxed groups can only make it easier, so just the enforced ones are part of the core
+            return False, [groups_by_literal[literal] for literal in handle.core() if literal in groups_by_literal]
+
+    def diagnose(self, timeout: timedelta) -> Tuple[str, Dict]:
+        start = time.monotonic()
+        self.__deadline = start + timeout.total_seconds()
+        self.__control.add(ClPr.BASE, [], self.__rules.generate_diagnosis_problem())
+        self.__control.ground([(ClPr.BASE, [])])
+        self.grounding_time = time.monotonic() - start
+
+        for atom in self.__control.symbolic_atoms.by_signature(ClP.CONSTRAINT_GROUP, 1):
+            group = atom.symbol.arguments[0]
+            self.__literals[group] = self.__control.symbolic_atoms[Function(ClP.ENFORCED, [group])].literal
+        self.__log(f"Diagnosing with {len(self.__literals)} constraint groups, {self.grounding_time:.1f}s of the "
+                   f"{timeout.total_seconds():.1f}s budget spent grounding")
+
+        satisfiable, core = self.__check(list(self.__literals))
+        if satisfiable is None:
+            status = "TIMEOUT"
+        elif satisfiable:
+            status = "SATISFIABLE"
+        else:
+            status = "UNSATISFIABLE"
+            self.core, self.minimal = self.__minimize(core)
+            self.__log(f"Found {'minimal ' if self.minimal else ''}unsatisfiable core of {len(self.core)} groups")
+
+        statistics = {"Diagnosis": status}
+        if self.core is not None:
+            statistics.update({"Unsat Core": len(self.core), "Minimal Core": self.minimal})
+        statistics.update({
+            "Diagnosis Checks": self.checks,
+            "Diagnosis Grounding Time": f"{self.grounding_time:.3f}s",
+            "Diagnosis Time": f"{time.monotonic() - start:.3f}s",
+        })
+        statistics.update({f"Diagnosis {key}": value
+                           for key, value in summarize_clingo_statistics(self.__control.statistics).items()})
+        return status, statistics
+
+    def __minimize(self, core: List[Symbol]) -> Tuple[List[Symbol], bool]:
+        # Deletion based: every group which can be relaxed while staying unsatisfiable is dropped, and the smaller
+        # core found by that check is kept; it stops being minimal as soon as a check runs out of time
+        minimal = True
+        for group in list(core):
+            if group not in core:
+                continue
+            satisfiable, smaller_core = self.__check([g for g in core if g != group])
+            if satisfiable is None:
+                minimal = False
+                break
+            if not satisfiable:
+                core = smaller_core
+        return core, minimal
+
+    def describe_core(self) -> str:
+        lines = [f"{str(group)}\t{self.__rules.describe_group(group.name, tuple(str(a) for a in group.arguments))}"
+                 for group in self.core or []]
+        if self.core is not None and not self.core:
+            lines.append("Infeasible even without any of the constraint groups: check the rooms, durations and "
+                         "blocked slots")
+        return "\n".join(lines)
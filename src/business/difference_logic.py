@@ -0,0 +1,82 @@
+import threading
+import time
+from datetime import timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+from clingo import Control, Model, ast
+
+from adapter.asp.constants import ClingoPredicates as ClP, ClingoPrograms as ClPr
+from business.stepwise import Solution, summarize_clingo_statistics, symbols_to_solution, wait_for_solve
+from models.solver_options import SolverOptions
+
+
+class DifferenceLogicSolver:
+    def __init__(self, dl_problem: str, durations: Dict[str, int], solver_options: SolverOptions,
+                 log: Callable[[str], None] = print, cancelled: Optional[threading.Event] = None):
+        # Imported here, as the theory extension is only needed by this backend
+        from clingodl import ClingoDLTheory
+
+        self.__dl_problem = dl_problem
+        self.__durations = durations
+        self.__log = log
+        self.__cancelled = cancelled
+        self.__theory = ClingoDLTheory()
+        self.__control = Control([*solver_options.to_clingo_options(), "--opt-mode=opt"])
+        self.__theory.register(self.__control)
+
+        self.costs: Optional[List[int]] = None
+        self.grounding_time: Optional[float] = None
+        self.first_model_time: Optional[float] = None
+        self.__solution: Optional[Solution] = None
+        self.__start = time.monotonic()
+
+    def __get_solution(self, model: Model) -> Solution:
+        # Sessions span from their start variable, so they are expanded back as the ASP encoding would have
+        shown = symbols_to_solution(model.symbols(shown=True))
+        solution = [(predicate, variables) for predicate, variables in shown if predicate != ClP.ASSIGNED_ROOM]
+        rooms = {variables[1]: variables[0] for predicate, variables in shown if predicate == ClP.ASSIGNED_ROOM}
+        for variable, start in self.__theory.assignment(model.thread_id):
+            if not variable.match(ClP.START, 1):
+                continue
+            session = str(variable.arguments[0])
+            for timeslot in range(start, start + self.__durations[session]):
+                solution.append((ClP.SCHEDULED_SESSION, (timeslot, session, rooms[session],),))
+        return solution
+
+    def __on_model(self, model: Model):
+        self.__theory.on_model(model)
+        self.__solution = self.__get_solution(model)
+        self.costs = list(model.cost)
+        if self.first_model_time is None:
+            self.first_model_time = time.monotonic() - self.__start
+        self.__log(f"Found solution #{model.number} with {tuple(self.costs)} penalty")
+
+    def solve(self, timeout: timedelta) -> Tuple[Optional[Solution], str, Dict]:
+        self.__start = time.monotonic()
+        with ast.ProgramBuilder(self.__control) as builder:
+            ast.parse_string(self.__dl_problem, lambda statement: self.__theory.rewrite_ast(statement, builder.add))
+        self.__control.ground([(ClPr.BASE, [])])
+        self.__theory.prepare(self.__control)
+        self.grounding_time = time.monotonic() - self.__start
+
+        remaining_time = max(0., timeout.total_seconds() - self.grounding_time)
+        with self.__control.solve(on_model=self.__on_model, async_=True) as handle:
+            if not wait_for_solve(handle, remaining_time, self.__cancelled):
+                handle.cancel()
+            result = handle.get()
+
+        if self.__solution is None:
+            status = "UNSATISFIABLE" if result.unsatisfiable else "TIMEOUT"
+        elif result.exhausted and not result.interrupted:
+            status = "SATISFIABLE_BEST"
+        else:
+            status = "SATISFIABLE"
+
+        statistics = {
+            "Backend": "difference logic",
+            "Costs": self.costs,
+            "Grounding Time": f"{self.grounding_time:.3f}s",
+            "First Model Time": f"{self.first_model_time:.3f}s" if self.first_model_time is not None else None,
+        }
+        statistics.update(summarize_clingo_statistics(self.__control.statistics))
+        return self.__solution, status, statistics
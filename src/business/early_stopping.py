@@ -0,0 +1,153 @@
+import os
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from clingo import Control
+
+from adapter.asp.constants import ClingoPrograms as ClPr
+from business.stepwise import Solution, summarize_clingo_statistics, symbols_to_solution
+from models.solver_options import OptimizationStrategy, SolverOptions
+
+
+class StopReason:
+    STAGNATION = "STAGNATION"
+    GAP = "GAP"
+    TIMEOUT = "TIMEOUT"
+    CANCELLED = "CANCELLED"
+
+
+def get_optimality_gap(costs: Sequence[int], lower_bound: Sequence[int]) -> Optional[float]:
+    # Costs are lexicographic, so the gap is measured on the most significant priority which is still open
+    for cost, lower in zip(costs, lower_bound):
+        if cost > lower:
+            return (cost - lower) / max(abs(cost), abs(lower), 1)
+    if len(lower_bound) >= len(costs):
+        return 0.
+    return None
+
+
+class EarlyStoppingSolver:
+    POLL_INTERVAL = 1.
+
+    def __init__(self, asp_problem: str, solver_options: SolverOptions, log: Callable[[str], None] = print,
+                 cancelled: Optional[threading.Event] = None):
+        self.__asp_problem = asp_problem
+        self.__solver_options = solver_options
+        self.__log = log
+        self.__cancelled = cancelled
+
+        self.costs: Optional[List[int]] = None
+        self.lower_bound: Optional[List[int]] = None
+        self.stop_reason: Optional[str] = None
+        self.grounding_time: Optional[float] = None
+        self.__solution: Optional[Solution] = None
+        self.__last_improvement = time.monotonic()
+
+    def __on_model(self, model):
+        self.__solution = symbols_to_solution(model.symbols(shown=True))
+        self.costs = list(model.cost)
+        self.__last_improvement = time.monotonic()
+        self.__log(f"Found solution #{model.number} with {tuple(self.costs)} penalty")
+
+    def __on_unsat(self, lower_bound: Sequence[int]):
+        self.lower_bound = list(lower_bound)
+        self.__log(f"Proven lower bound {tuple(self.lower_bound)}")
+
+    def __get_gap(self) -> Optional[float]:
+        if self.costs is None or self.lower_bound is None:
+            return None
+        return get_optimality_gap(self.costs, self.lower_bound)
+
+    def __check_stopping_criteria(self) -> Optional[str]:
+        # Nothing is stopped before the first model, otherwise there would be nothing to return
+        if self.__solution is None:
+            return None
+
+        stagnation_timeout = self.__solver_options.stagnation_timeout
+        if stagnation_timeout is not None and time.monotonic() - self.__last_improvement >= stagnation_timeout:
+            return StopReason.STAGNATION
+
+        gap_threshold = self.__solver_options.gap_threshold
+        gap = self.__get_gap()
+        if gap_threshold is not None and gap is not None and gap <= gap_threshold:
+            return StopReason.GAP
+        return None
+
+    def __write_portfolio(self) -> Optional[str]:
+        # Lower bounds are only proven by core-guided strategies; a dedicated thread is added when the incumbent
+        # search is model-guided, sharing the ground program and the learnt bounds with the rest of threads
+        solver_options = self.__solver_options
+        if solver_options.gap_threshold is None:
+            return None
+        if solver_options.optimization_strategy is not None and solver_options.optimization_strategy.is_core_guided:
+            return None
+
+        incumbent_options = solver_options.copy(update={"configuration": None, "seed": None, "threads": None})
+        incumbent_options = incumbent_options.to_clingo_options()
+        if solver_options.optimization_strategy is None:
+            incumbent_options.insert(0, f"--opt-strategy={OptimizationStrategy.BB_LIN.value}")
+
+        portfolio_file, portfolio_path = tempfile.mkstemp(suffix=".port")
+        with os.fdopen(portfolio_file, 'w') as f:
+            f.write(f"[incumbent]: {' '.join(incumbent_options)}\n")
+            f.write(f"[bound]: --opt-strategy={OptimizationStrategy.USC_OLL.value}\n")
+        return portfolio_path
+
+    def __get_clingo_options(self, portfolio_path: Optional[str]) -> List[str]:
+        solver_options = self.__solver_options
+        if portfolio_path is None:
+            return [*solver_options.to_clingo_options(), "--opt-mode=opt"]
+
+        options = [f"--configuration={portfolio_path}", f"--parallel-mode={max(2, solver_options.threads or 1)}"]
+        if solver_options.seed is not None:
+            options.append(f"--seed={solver_options.seed}")
+        return [*options, "--opt-mode=opt"]
+
+    def solve(self, timeout: timedelta) -> Tuple[Optional[Solution], str, Dict]:
+        deadline = time.monotonic() + timeout.total_seconds()
+        portfolio_path = self.__write_portfolio()
+        try:
+            control = Control(self.__get_clingo_options(portfolio_path))
+            control.add(ClPr.BASE, [], self.__asp_problem)
+            grounding_start = time.monotonic()
+            control.ground([(ClPr.BASE, [])])
+            self.grounding_time = time.monotonic() - grounding_start
+
+            self.__last_improvement = time.monotonic()
+            with control.solve(on_model=self.__on_model, on_unsat=self.__on_unsat, async_=True) as handle:
+                while not handle.wait(max(0., min(self.POLL_INTERVAL, deadline - time.monotonic()))):
+                    if self.__cancelled is not None and self.__cancelled.is_set():
+                        self.stop_reason = StopReason.CANCELLED
+                    elif time.monotonic() >= deadline:
+                        self.stop_reason = StopReason.TIMEOUT
+                    else:
+                        self.stop_reason = self.__check_stopping_criteria()
+                    if self.stop_reason is not None:
+                        self.__log(f"Stopping search: {self.stop_reason}")
+                        handle.cancel()
+                        break
+                result = handle.get()
+        finally:
+            if portfolio_path is not None:
+                os.remove(portfolio_path)
+
+        if self.__solution is None:
+            status = "UNSATISFIABLE" if result.unsatisfiable else "TIMEOUT"
+        elif result.exhausted and not result.interrupted:
+            status = "SATISFIABLE_BEST"
+            self.lower_bound = self.costs
+        else:
+            status = "SATISFIABLE"
+
+        statistics = {
+            "Stop Reason": self.stop_reason or "EXHAUSTED",
+            "Costs": self.costs,
+            "Lower Bound": self.lower_bound,
+            "Gap": self.__get_gap(),
+            "Grounding Time": f"{self.grounding_time:.3f}s",
+        }
+        statistics.update(summarize_clingo_statistics(control.statistics))
+        return self.__solution, status, statistics
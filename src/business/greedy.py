@@ -0,0 +1,282 @@
+import time
+from itertools import accumulate
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from pydantic import UUID4
+
+from adapter.asp.constants import ClingoNaming as ClN, ClingoPredicates as ClP
+from adapter.asp.optimizations import BonusCosts, OptimizationPriorities, PenaltyCosts
+from adapter.compilation import get_compiled_settings_cache
+from adapter.time.week import Week
+from business.solver_status import save_status
+from models.dto.output import Output
+from models.room import Room
+from models.schedule import ScheduleUnit
+from models.session import Session
+from models.slot import SlotType
+from models.solver import Solver
+from sdk.artifact_writer import get_artifact_writer
+from utils.session_utils import get_eligible_timeslots, get_room_distances_in_timeslots, \
+    get_session_slots_count, is_room_eligible_for_session
+
+# Start timeslot and room of a session, or None if it could not be placed
+Placement = Optional[Tuple[int, Room]]
+
+__LEVELS = sorted({priority.value for priority in OptimizationPriorities}, reverse=True)
+
+
+def get_level_index(priority: OptimizationPriorities) -> int:
+    return __LEVELS.index(priority.value)
+
+
+def get_levels_count() -> int:
+    return len(__LEVELS)
+
+
+class GreedySolver(Solver):
+    # Places sessions one at a time, the most constrained ones first, each in the cheapest feasible timeslot
+    # and room. Sessions which cannot be placed are moved to the front of the order, and placement starts over
+    MAX_ATTEMPTS = 100
+    MAX_TIME = 10.
+
+    def __prepare(self, week: Week):
+        sessions, rooms = self._sessions, self._rooms
+        session_index = {session.id: i for i, session in enumerate(sessions)}
+        room_index = {room.id: r for r, room in enumerate(rooms)}
+
+        self.__slots_per_day = week.get_slots_per_day_count()
+        self.__durations = [get_session_slots_count(session, week) for session in sessions]
+        self.__eligible_starts = [sorted(get_eligible_timeslots(session, week)) for session in sessions]
+        self.__eligible_rooms = [[r for r, room in enumerate(rooms) if is_room_eligible_for_session(session, room)]
+                                 for session in sessions]
+
+        # Prefix sums of undesirable timeslots, so whether a placement touches any of them is known right away
+        self.__undesirable: List[Tuple[int, int, List[int]]] = []
+        total_slots = week.get_total_slot_count()
+        for slot_type, priority, cost in (
+                (SlotType.UNDESIRABLE_1, OptimizationPriorities.PENALTY__UNDESIRABLE_TIMESLOT_1,
+                 PenaltyCosts.UNDESIRABLE_TIMESLOT_1,),
+                (SlotType.UNDESIRABLE_2, OptimizationPriorities.PENALTY__UNDESIRABLE_TIMESLOT_2,
+                 PenaltyCosts.UNDESIRABLE_TIMESLOT_2,),
+                (SlotType.UNDESIRABLE_5, OptimizationPriorities.PENALTY__UNDESIRABLE_TIMESLOT_5,
+                 PenaltyCosts.UNDESIRABLE_TIMESLOT_5,),
+        ):
+            undesirable_slots = set(week.get_slot_ids_per_type(slot_type))
+            prefix = list(accumulate((1 if t in undesirable_slots else 0 for t in range(1, total_slots + 1)),
+                                     initial=0))
+            self.__undesirable.append((get_level_index(priority), cost, prefix,))
+
+        self.__penalized_slots: List[Set[int]] = []
+        self.__preferred_slots: List[Set[int]] = []
+        self.__penalized_rooms: List[Set[int]] = []
+        self.__preferred_rooms: List[Set[int]] = []
+        for session in sessions:
+            timeslots_preferences = session.constraints.timeslots_preferences
+            self.__penalized_slots.append({t for slot in timeslots_preferences.penalized_slots
+                                           for t in week.get_sub_slot_ids(slot)})
+            self.__preferred_slots.append({t for slot in timeslots_preferences.preferred_slots
+                                           for t in week.get_sub_slot_ids(slot)})
+            rooms_preferences = session.constraints.rooms_preferences
+            self.__penalized_rooms.append({room_index[uuid] for uuid in rooms_preferences.penalized_rooms
+                                           if uuid in room_index})
+            self.__preferred_rooms.append({room_index[uuid] for uuid in rooms_preferences.preferred_rooms
+                                           if uuid in room_index})
+
+        self.__cannot_overlap = self.__find_related(session_index, lambda s: s.constraints.cannot_conflict_in_time)
+        self.__avoid_overlap = self.__find_related(session_index, lambda s: s.constraints.avoid_conflict_in_time)
+        self.__contiguous = self.__find_related(session_index,
+                                                lambda s: s.constraints.same_room_if_contiguous_in_time)
+        self.__apply_distances = self.__find_related(session_index, lambda s: s.constraints.apply_room_distances)
+        # Overlap penalties are charged to the session sorting first in the ASP program
+        self.__clingo_names = [ClN.session_to_clingo(session) for session in sessions]
+        self.__room_distances = {(room_index[room1], room_index[room2],): distance for (room1, room2), distance
+                                 in get_room_distances_in_timeslots(rooms, week).items()}
+
+    def __find_related(self, session_index: Dict[UUID4, int],
+                       related_uuids_getter: Callable[[Session], List[UUID4]]) -> List[Set[int]]:
+        relations: List[Set[int]] = [set() for _ in self._sessions]
+        for i, session in enumerate(self._sessions):
+            for other_session_uuid in related_uuids_getter(session):
+                j = session_index[other_session_uuid]
+                relations[i].add(j)
+                relations[j].add(i)
+        return relations
+
+    def __get_order(self) -> List[int]:
+        def constrainedness(i: int) -> Tuple[float, int]:
+            options = len(self.__eligible_starts[i]) * len(self.__eligible_rooms[i])
+            relations = len(self.__cannot_overlap[i]) + len(self.__contiguous[i]) + len(self.__apply_distances[i])
+            return options / (1 + relations), -self.__durations[i]
+
+        return sorted(range(len(self._sessions)), key=constrainedness)
+
+    def __is_feasible(self, i: int, start: int, room: int, placements: List[Optional[Tuple[int, int]]]) -> bool:
+        end, day = start + self.__durations[i], (start - 1) // self.__slots_per_day
+        for j in self.__contiguous[i]:
+            if placements[j] is None:
+                continue
+            other_start, other_room = placements[j]
+            other_end = other_start + self.__durations[j]
+            if (other_start - 1) // self.__slots_per_day == day \
+                    and (other_end == start or end == other_start) and other_room != room:
+                return False
+        for j in self.__apply_distances[i]:
+            if placements[j] is None:
+                continue
+            other_start, other_room = placements[j]
+            if (other_start - 1) // self.__slots_per_day != day:
+                continue
+            other_end = other_start + self.__durations[j]
+            if 0 <= start - other_end < self.__room_distances.get((other_room, room,), 0) \
+                    or 0 <= other_start - end < self.__room_distances.get((room, other_room,), 0):
+                return False
+        return True
+
+    def __get_timeslot_cost(self, i: int, start: int, placements: List[Optional[Tuple[int, int]]],
+                            charged: Set[int]) -> List[int]:
+        costs = [0] * get_levels_count()
+        end = start + self.__durations[i]
+        for level, cost, prefix in self.__undesirable:
+            if prefix[end - 1] - prefix[start - 1] > 0:
+                costs[level] += cost
+        slots = range(start, end)
+        if any(t in self.__penalized_slots[i] for t in slots):
+            costs[get_level_index(OptimizationPriorities.PENALTY__AVOID_TIMESLOT_FOR_SESSION)] += \
+                PenaltyCosts.AVOID_TIMESLOT_FOR_SESSION
+        if any(t in self.__preferred_slots[i] for t in slots):
+            costs[get_level_index(OptimizationPriorities.BONUS__PREFER_TIMESLOT_FOR_SESSION)] -= \
+                BonusCosts.PREFER_TIMESLOT_FOR_SESSION
+        for j in self.__avoid_overlap[i]:
+            if placements[j] is None:
+                continue
+            charged_session = min(i, j, key=lambda k: self.__clingo_names[k])
+            other_start = placements[j][0]
+            if charged_session not in charged and start < other_start + self.__durations[j] and other_start < end:
+                costs[get_level_index(OptimizationPriorities.PENALTY__AVOID_SESSION_OVERLAP)] += \
+                    PenaltyCosts.AVOID_SESSION_OVERLAP
+                break
+        return costs
+
+    def __place(self, i: int, placements: List[Optional[Tuple[int, int]]], room_occupancy: List[bytearray],
+                charged: Set[int]) -> Optional[Tuple[int, int]]:
+        duration = self.__durations[i]
+        room_penalty_level = get_level_index(OptimizationPriorities.PENALTY__AVOID_ROOM_FOR_SESSION)
+        room_bonus_level = get_level_index(OptimizationPriorities.BONUS__PREFER_ROOM_FOR_SESSION)
+
+        best: Optional[Tuple[List[int], int, int]] = None
+        for start in self.__eligible_starts[i]:
+            end = start + duration
+            if any(placements[j] is not None and start < placements[j][0] + self.__durations[j]
+                   and placements[j][0] < end for j in self.__cannot_overlap[i]):
+                continue
+
+            timeslot_costs = self.__get_timeslot_cost(i, start, placements, charged)
+            if best is not None and timeslot_costs[:room_penalty_level] > best[0][:room_penalty_level]:
+                # Rooms only change lower priorities, so none can make this timeslot cheaper than the best one so far
+                continue
+
+            for room in self.__eligible_rooms[i]:
+                if room_occupancy[room].find(1, start, end) != -1 or not self.__is_feasible(i, start, room, placements):
+                    continue
+                costs = list(timeslot_costs)
+                if room in self.__penalized_rooms[i]:
+                    costs[room_penalty_level] += PenaltyCosts.AVOID_ROOM_FOR_SESSION
+                if room in self.__preferred_rooms[i]:
+                    costs[room_bonus_level] -= BonusCosts.PREFER_ROOM_FOR_SESSION
+                if best is None or costs < best[0]:
+                    best = (costs, start, room,)
+
+        if best is None:
+            return None
+
+        _, start, room = best
+        for j in self.__avoid_overlap[i]:
+            if placements[j] is not None and start < placements[j][0] + self.__durations[j] \
+                    and placements[j][0] < start + duration:
+                charged.add(min(i, j, key=lambda k: self.__clingo_names[k]))
+        return start, room
+
+    def find_placements(self, week: Week, log: Callable[[str], None] = print) -> List[Placement]:
+        self.__prepare(week)
+        deadline = time.time() + (self._timeout or self.MAX_TIME)
+
+        order = self.__get_order()
+        best_placements: List[Optional[Tuple[int, int]]] = [None] * len(self._sessions)
+        for attempt in range(1, self.MAX_ATTEMPTS + 1):
+            placements: List[Optional[Tuple[int, int]]] = [None] * len(self._sessions)
+            room_occupancy = [bytearray(week.get_total_slot_count() + 1) for _ in self._rooms]
+            charged: Set[int] = set()
+            unplaced: List[int] = []
+            for i in order:
+                placement = self.__place(i, placements, room_occupancy, charged)
+                if placement is None:
+                    unplaced.append(i)
+                    continue
+                placements[i] = placement
+                start, room = placement
+                room_occupancy[room][start:start + self.__durations[i]] = b"\x01" * self.__durations[i]
+
+            if sum(p is not None for p in placements) > sum(p is not None for p in best_placements):
+                best_placements = placements
+            if not unplaced or time.time() > deadline:
+                break
+            # The sessions which could not be placed go first next time
+            order = unplaced + [i for i in order if i not in unplaced]
+
+        log(f"Greedy placement: {sum(p is not None for p in best_placements)}/{len(self._sessions)} sessions "
+            f"placed after {attempt} attempts")
+        return [None if placement is None else (placement[0], self._rooms[placement[1]],)
+                for placement in best_placements]
+
+    def build_output(self, week: Week, placements: List[Placement]) -> Output:
+        output = Output()
+        for session, placement in zip(self._sessions, placements):
+            if placement is None:
+                continue
+            start, room = placement
+            for timeslot in range(start, start + get_session_slots_count(session, week)):
+                output.timetable.append(ScheduleUnit(
+                    slot=week.get_slot_by_number(timeslot - 1).to_slot(),
+                    session=session,
+                    room=room,
+                ))
+        return output
+
+    def solve(self) -> Output:
+        start = time.time()
+        week = get_compiled_settings_cache().get(self._settings).week
+        placements = self.find_placements(week)
+
+        # Same status artifacts as clingo runs, although a greedy timetable is never known to be the best one
+        placed = sum(placement is not None for placement in placements)
+        statistics = {
+            "Backend": "greedy",
+            "Placed Sessions": f"{placed}/{len(placements)}",
+            "Time": f"{time.time() - start:.3f}s",
+        }
+        save_status("SATISFIABLE" if placed == len(placements) else "UNKNOWN", statistics, self._execution_uuid,
+                    self._local_dir, self._artifact_writer or get_artifact_writer())
+
+        if placed < len(placements):
+            raise RuntimeError("Could not generate schedule; some sessions could not be placed.")
+        return self.build_output(week, placements)
+
+
+def get_clingo_placements(sessions: List[Session], placements: List[Placement]) -> Dict[str, Tuple[int, str]]:
+    # Assigned timeslot and room of every placed session, named as in the ASP program
+    return {ClN.session_to_clingo(session): (placement[0], ClN.room_to_clingo(placement[1]),)
+            for session, placement in zip(sessions, placements) if placement is not None}
+
+
+def get_scheduled_sessions(sessions: List[Session], placements: List[Placement],
+                           week: Week) -> List[Tuple[str, Tuple[int, str, str]]]:
+    # Same shape as the scheduled session atoms of a clingo answer
+    scheduled_sessions: List[Tuple[str, Tuple[int, str, str]]] = []
+    for session, placement in zip(sessions, placements):
+        if placement is None:
+            continue
+        start, room = placement
+        for timeslot in range(start, start + get_session_slots_count(session, week)):
+            scheduled_sessions.append((ClP.SCHEDULED_SESSION,
+                                       (timeslot, ClN.session_to_clingo(session), ClN.room_to_clingo(room),),))
+    return scheduled_sessions
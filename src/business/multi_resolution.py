@@ -0,0 +1,63 @@
+from datetime import timedelta
+from functools import reduce
+from math import gcd
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from adapter.asp.constants import ClingoPredicates as ClP
+from adapter.time.week import Week
+from models.session import Session
+from models.settings import Settings
+from models.slot import Slot
+from utils.time_utils import time_to_minutes, timedelta_to_minutes
+
+Solution = List[Tuple[str, tuple]]
+
+
+def __get_slot_offsets(slots: Iterable[Slot], day_start: int) -> List[int]:
+    return [time_to_minutes(t) - day_start for slot in slots for t in (slot.timeframe.start, slot.timeframe.end,)]
+
+
+def get_coarse_slot_minutes(sessions: List[Session], settings: Settings) -> int:
+    # Longest slot which every time of the problem is still aligned to, so a coarser week loses no information
+    day_start = time_to_minutes(settings.day_start)
+    minutes = [
+        time_to_minutes(settings.day_end) - day_start,
+        *__get_slot_offsets(settings.modified_slots, day_start),
+    ]
+    for session in sessions:
+        preferences = session.constraints.timeslots_preferences
+        minutes.append(timedelta_to_minutes(session.constraints.duration))
+        for slots in (preferences.disallowed_slots, preferences.penalized_slots, preferences.preferred_slots,):
+            minutes.extend(__get_slot_offsets(slots, day_start))
+    return reduce(gcd, (abs(m) for m in minutes))
+
+
+def get_coarse_settings(sessions: List[Session], settings: Settings) -> Optional[Settings]:
+    slot_minutes = timedelta_to_minutes(settings.slot_duration)
+    coarse_slot_minutes = get_coarse_slot_minutes(sessions, settings)
+    if coarse_slot_minutes <= slot_minutes or coarse_slot_minutes % slot_minutes:
+        return None
+    return settings.copy(update={"slot_duration": timedelta(minutes=coarse_slot_minutes)})
+
+
+def refine_solution(coarse_solution: Solution, coarse_week: Week, week: Week) -> Solution:
+    # Every coarse timeslot covers a whole number of timeslots of the finer week, with the same slot types;
+    # room distances round up to more coarse timeslots, so the refined timetable is always valid too
+    factor = week.get_slots_count_for_timedelta(coarse_week.slot_duration)
+    solution: Solution = []
+    for predicate, variables in coarse_solution:
+        if predicate != ClP.SCHEDULED_SESSION:
+            continue
+        timeslot, session, room = variables
+        first_timeslot = week.get_slot_id(coarse_week.get_slot_by_number(timeslot - 1))
+        solution.extend((predicate, (t, session, room,),) for t in range(first_timeslot, first_timeslot + factor))
+    return solution
+
+
+def get_solution_placements(solution: Solution) -> Dict[str, Tuple[int, str]]:
+    # First timeslot and room of every scheduled session
+    placements: Dict[str, Tuple[int, str]] = {}
+    for predicate, (timeslot, session, room) in ((p, v) for p, v in solution if p == ClP.SCHEDULED_SESSION):
+        if session not in placements or timeslot < placements[session][0]:
+            placements[session] = (timeslot, room,)
+    return placements
@@ -0,0 +1,176 @@
+import os
+import signal
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Optional, Set, Tuple, TypeVar
+
+T = TypeVar("T")
+
+__PROC = Path("/proc")
+# Share of the container memory the solver may use, leaving room for this process and the output processing
+__CONTAINER_MEMORY_SHARE = 0.85
+__CGROUP_MEMORY_LIMITS = (
+    Path("/sys/fs/cgroup/memory.max"),
+    Path("/sys/fs/cgroup/memory/memory.limit_in_bytes"),
+)
+__spawn_lock = threading.Lock()
+
+
+class ResourceLimits:
+    def __init__(self, memory: Optional[int] = None, cpu_time: Optional[float] = None, interval: float = 1.):
+        # Resident memory in bytes, and CPU time in seconds (across all threads)
+        self.memory = memory
+        self.cpu_time = cpu_time
+        self.interval = interval
+
+
+class ResourceUsage:
+    def __init__(self, rss: int, cpu_time: float):
+        self.rss = rss
+        self.cpu_time = cpu_time
+
+
+def get_container_memory() -> Optional[int]:
+    if os.environ.get("AWS_LAMBDA_FUNCTION_MEMORY_SIZE"):
+        return int(os.environ["AWS_LAMBDA_FUNCTION_MEMORY_SIZE"]) * 1024 * 1024
+    for cgroup_memory_limit in __CGROUP_MEMORY_LIMITS:
+        try:
+            limit = cgroup_memory_limit.read_text().strip()
+        except OSError:
+            continue
+        # Unlimited cgroups report "max", or a huge number in cgroups v1
+        if limit.isdigit() and int(limit) < 2 ** 60:
+            return int(limit)
+    return None
+
+
+def get_resource_limits() -> ResourceLimits:
+    memory = None
+    if os.environ.get("SOLVER__MEMORY_LIMIT_MB"):
+        memory = int(os.environ["SOLVER__MEMORY_LIMIT_MB"]) * 1024 * 1024
+    elif get_container_memory() is not None:
+        memory = int(get_container_memory() * __CONTAINER_MEMORY_SHARE)
+
+    cpu_time = None
+    if os.environ.get("SOLVER__CPU_LIMIT_SECONDS"):
+        cpu_time = float(os.environ["SOLVER__CPU_LIMIT_SECONDS"])
+
+    return ResourceLimits(memory, cpu_time, float(os.environ.get("SOLVER__MONITOR_INTERVAL", "1")))
+
+
+def get_child_processes() -> Set[int]:
+    children: Set[int] = set()
+    if not __PROC.exists():
+        return children
+
+    parent = os.getpid()
+    for stat_file in __PROC.glob("[0-9]*/stat"):
+        try:
+            stat = stat_file.read_text()
+        except OSError:
+            continue
+        # The command name may contain spaces, so fields are counted from its closing parenthesis
+        if int(stat[stat.rindex(")") + 2:].split()[1]) == parent:
+            children.add(int(stat_file.parent.name))
+    return children
+
+
+def spawn_child_process(spawn: Callable[[], T]) -> Tuple[T, Optional[int]]:
+    # Serialized, so solvers running in other threads never mistake each other's processes
+    with __spawn_lock:
+        existing_children = get_child_processes()
+        result = spawn()
+        new_children = get_child_processes() - existing_children
+    return result, min(new_children) if new_children else None
+
+
+def read_process_usage(pid: int) -> Optional[ResourceUsage]:
+    try:
+        stat = (__PROC / str(pid) / "stat").read_text()
+        statm = (__PROC / str(pid) / "statm").read_text()
+    except OSError:
+        return None
+
+    fields = stat[stat.rindex(")") + 2:].split()
+    if fields[0] == "Z":
+        return None
+    # utime and stime are fields 14 and 15 of stat, in clock ticks; resident pages are the second field of statm
+    cpu_time = (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+    rss = int(statm.split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    return ResourceUsage(rss, cpu_time)
+
+
+class ResourceMonitor:
+    # Time the process gets to report its best model after being interrupted, before being killed
+    GRACE_TIME = 10.
+
+    def __init__(self, pid: Optional[int], limits: ResourceLimits, log: Callable[[str], None] = print,
+                 cancelled: Optional[threading.Event] = None):
+        self.__pid = pid
+        self.__limits = limits
+        self.__log = log
+        self.__cancelled = cancelled
+        self.__stopped = threading.Event()
+        self.__thread = threading.Thread(target=self.__run, name="resource-monitor", daemon=True)
+
+        self.peak_rss = 0
+        self.exceeded_limit: Optional[str] = None
+
+    def start(self):
+        if self.__pid is not None:
+            self.__thread.start()
+
+    def stop(self):
+        self.__stopped.set()
+        if self.__thread.is_alive():
+            self.__thread.join()
+
+    def __terminate(self, status: str, reason: str):
+        self.exceeded_limit = status
+        self.__log(f"Interrupting clingo: {reason}")
+        try:
+            # Clingo reports the best model found so far when interrupted
+            os.kill(self.__pid, signal.SIGINT)
+        except ProcessLookupError:
+            return
+
+        deadline = time.time() + self.GRACE_TIME
+        while time.time() < deadline:
+            if self.__stopped.wait(0.1) or read_process_usage(self.__pid) is None:
+                return
+        self.__log("Killing clingo, as it did not finish after being interrupted")
+        try:
+            os.kill(self.__pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
+    def __run(self):
+        while True:
+            usage = read_process_usage(self.__pid)
+            if usage is None:
+                return
+            self.peak_rss = max(self.peak_rss, usage.rss)
+
+            if self.__limits.memory is not None and usage.rss > self.__limits.memory:
+                self.__terminate("MEMOUT", f"using {usage.rss / 1024 / 1024:.0f}MB, over the "
+                                           f"{self.__limits.memory / 1024 / 1024:.0f}MB limit")
+                return
+            if self.__limits.cpu_time is not None and usage.cpu_time > self.__limits.cpu_time:
+                self.__terminate("CPUOUT", f"used {usage.cpu_time:.0f}s of CPU time, over the "
+                                           f"{self.__limits.cpu_time:.0f}s limit")
+                return
+
+            if self.__cancelled is not None and self.__cancelled.is_set():
+                self.__terminate("CANCELLED", "the execution was cancelled")
+                return
+
+            if self.__stopped.wait(self.__limits.interval):
+                return
+
+    def get_statistics(self) -> Dict[str, str]:
+        # Clingo already reports its CPU time
+        statistics = {"Peak Memory": f"{self.peak_rss / 1024 / 1024:.1f}MB"}
+        if self.exceeded_limit is not None:
+            statistics["Resource Limit"] = self.exceeded_limit
+        return statistics
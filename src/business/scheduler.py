@@ -1,33 +1,204 @@
+import re
+import time
 from datetime import timedelta
-
-from aws_lambda_powertools import Logger
-from clyngor import solve
+from functools import lru_cache
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
 
 from adapter.asp.constants import ClingoNaming as ClN, ClingoPredicates as ClP
-from adapter.asp.rules import Rules
+from adapter.asp.room_pools import assign_pooled_rooms, get_pooled_rooms
+from adapter.asp.rules import Directives, Rules
+from adapter.compilation import get_compiled_settings_cache
 from adapter.time.week import Week
+from business.greedy import GreedySolver, Placement, get_clingo_placements, get_scheduled_sessions
+from business.multi_resolution import Solution, get_coarse_settings, get_solution_placements, refine_solution
+from business.solver_status import save_status
+from business.tuning import load_tuned_solver_options
 from models.dto.output import Output
 from models.schedule import ScheduleUnit
 from models.solver import Solver
+from models.solver_options import Heuristic, SolverOptions
+from sdk.artifact_writer import ArtifactWriter, get_artifact_writer
 from sdk.aws_s3 import save_txt_file
 from sdk.local_fs import save_local_txt_file
 from utils.env_utils import is_short_execution_environment
 
-logger = Logger()
+if TYPE_CHECKING:
+    from aws_lambda_powertools import Logger
+
+@lru_cache(maxsize=None)
+def get_logger() -> "Logger":
+    # Powertools is only needed to log executions, so local runs do not pay for importing it
+    from aws_lambda_powertools import Logger
+    return Logger()
 
 
 class AspSolver(Solver):
-    def solve(self) -> Output:
-        week = Week(self._settings)
-        rules = Rules(week, self._sessions, self._rooms)
-        asp_problem = rules.generate_asp_problem()
+    # Share of the time limit given to the coarse problem in multi-resolution mode
+    COARSE_TIME_SHARE = 0.25
+    # Share of the time limit given to diagnosing the input before solving it, but never less than the minimum
+    # unless the whole time limit is shorter than that
+    DIAGNOSIS_TIME_SHARE = 0.1
+    MIN_DIAGNOSIS_TIME = timedelta(seconds=10)
+    # Grounding the diagnosis program took up to ten times as long as the problem on the example input, as it keeps
+    # every constraint on every timeslot
+    DIAGNOSIS_GROUNDING_FACTOR = 10
 
+    def __log(self, text: str):
         if self._execution_uuid is not None:
-            save_txt_file(self._execution_uuid, "asp_problem", asp_problem)
+            get_logger().info(text, extra={"execution": self._execution_uuid})
+        else:
+            print(text)
+
+    def __get_artifact_writer(self) -> ArtifactWriter:
+        return self._artifact_writer or get_artifact_writer()
+
+    def __solve_single_shot(self, asp_problem: str, solver_options: SolverOptions,
+                            timeout: timedelta) -> Tuple[Optional[List[Tuple[str, tuple]]], str, Dict]:
+        from clyngor import solve
+
+        from business.resource_monitor import ResourceMonitor, get_resource_limits, spawn_child_process
+
+        models, clingo_pid = spawn_child_process(lambda: solve(
+            inline=asp_problem,
+            options=solver_options.to_clingo_options(),
+            use_clingo_module=False,
+            stats=True,
+            time_limit=int(timeout.total_seconds()),
+        ))
+        # Clingo is interrupted before going over the limits, instead of getting the whole container killed
+        monitor = ResourceMonitor(clingo_pid, get_resource_limits(), log=self.__log, cancelled=self._cancelled)
+        monitor.start()
+
+        solution, found_optimal = None, False
+        try:
+            for answer, optimization, optimality, answer_number in models.with_answer_number:
+                # Keep retrieving answers till timeout
+                solution = answer
+                if not optimality:
+                    self.__log(f"Found solution #{answer_number} with {optimization} penalty")
+                else:
+                    found_optimal = True
+        except RuntimeError:
+            # Output is cut short if clingo had to be killed
+            if monitor.exceeded_limit is None:
+                raise
+        finally:
+            monitor.stop()
+
+        statistics = {**models.statistics, **monitor.get_statistics()}
+        # Clingo only reports the total and the solving times, so grounding is about the rest
+        times = re.match(r"([\d.]+)s \(Solving: ([\d.]+)s", statistics.get("Time", ""))
+        if times:
+            statistics["Grounding Time"] = f"{float(times[1]) - float(times[2]):.3f}s"
+        if monitor.exceeded_limit is not None:
+            return solution, monitor.exceeded_limit, statistics
+
+        status = "UNKNOWN"
+        if solution is not None and not found_optimal:
+            status = "SATISFIABLE"
+        elif solution is not None and found_optimal:
+            status = "SATISFIABLE_BEST"
+        elif solution is None and models.is_unknown:
+            status = "TIMEOUT"
+        elif solution is None and models.is_unsatisfiable:
+            status = "UNSATISFIABLE"
+
+        return solution, status, statistics
+
+    def __solve_stepwise(self, asp_problem: str, solver_options: SolverOptions,
+                         timeout: timedelta) -> Tuple[Optional[List[Tuple[str, tuple]]], str, Dict]:
+        from business.stepwise import StepwiseOptimizer
+
+        optimizer = StepwiseOptimizer(asp_problem, solver_options, log=self.__log, cancelled=self._cancelled)
+        return optimizer.solve(timeout)
+
+    def __solve_with_stopping_criteria(self, asp_problem: str, solver_options: SolverOptions,
+                                       timeout: timedelta) -> Tuple[Optional[List[Tuple[str, tuple]]], str, Dict]:
+        from business.early_stopping import EarlyStoppingSolver
+
+        solver = EarlyStoppingSolver(asp_problem, solver_options, log=self.__log, cancelled=self._cancelled)
+        return solver.solve(timeout)
+
+    def __solve_difference_logic(self, dl_problem: str, week: Week, solver_options: SolverOptions,
+                                 timeout: timedelta) -> Tuple[Optional[List[Tuple[str, tuple]]], str, Dict]:
+        from adapter.asp.difference_logic import get_session_durations
+        from business.difference_logic import DifferenceLogicSolver
+
+        solver = DifferenceLogicSolver(dl_problem, get_session_durations(self._sessions, week), solver_options,
+                                       log=self.__log, cancelled=self._cancelled)
+        return solver.solve(timeout)
+
+    def __diagnose(self, week: Week, timeout: timedelta) -> Tuple[str, Dict]:
+        from adapter.asp.diagnosis import DiagnosisRules
+        from business.diagnosis import InfeasibilityDiagnoser
+
+        diagnoser = InfeasibilityDiagnoser(DiagnosisRules(week, self._sessions, self._rooms), log=self.__log,
+                                           cancelled=self._cancelled)
+        status, statistics = diagnoser.diagnose(timeout)
+        if status != "UNSATISFIABLE":
+            return status, statistics
+
+        unsat_core = f"{'MINIMAL' if diagnoser.minimal else 'NOT MINIMAL'}\n{diagnoser.describe_core()}\n"
+        if self._execution_uuid is not None:
+            self.__get_artifact_writer().submit(save_txt_file, self._execution_uuid, "asp_unsat_core", unsat_core)
         elif self._local_dir is not None:
-            save_local_txt_file(self._local_dir, "asp_problem", asp_problem)
+            save_local_txt_file(self._local_dir, "asp_unsat_core", unsat_core)
         else:
-            print(asp_problem)
+            print(unsat_core)
+        return status, statistics
+
+    def __save_status(self, status: str, statistics: Dict):
+        save_status(status, statistics, self._execution_uuid, self._local_dir, self.__get_artifact_writer())
+
+    def __find_greedy_placements(self, week: Week) -> Optional[List[Placement]]:
+        placements = GreedySolver(self._sessions, self._rooms, self._settings).find_placements(week, log=self.__log)
+        if any(placement is None for placement in placements):
+            return None
+        return placements
+
+    def __solve_coarse(self, week: Week, solver_options: SolverOptions,
+                       timeout: timedelta) -> Tuple[Optional[Solution], Dict]:
+        coarse_settings = get_coarse_settings(self._sessions, self._settings)
+        if coarse_settings is None:
+            self.__log("Multi-resolution skipped, as times are not aligned to any coarser slot")
+            return None, {}
+
+        coarse_compiled_settings = get_compiled_settings_cache().get(coarse_settings)
+        coarse_week = coarse_compiled_settings.week
+        self.__log(f"Solving first with {coarse_week.slot_duration} slots: {coarse_week}")
+        coarse_rules = Rules(coarse_week, self._sessions, self._rooms)
+        coarse_problem = coarse_rules.generate_asp_problem(compiled_settings=coarse_compiled_settings)
+        # A plain optimization run; the remaining time belongs to the full resolution
+        coarse_options = solver_options.copy(update={
+            "stepwise": False,
+            "stagnation_timeout": None,
+            "gap_threshold": None,
+            "warm_start": False,
+            "multi_resolution": False,
+        })
+        coarse_solution, coarse_status, _ = self.__solve_single_shot(coarse_problem, coarse_options, timeout)
+
+        statistics = {"Coarse Slot": str(coarse_week.slot_duration), "Coarse Status": coarse_status}
+        if coarse_solution is None:
+            return None, statistics
+        coarse_solution = assign_pooled_rooms(coarse_solution, coarse_rules.room_pools, self._sessions)
+        return refine_solution(coarse_solution, coarse_week, week), statistics
+
+    def solve(self) -> Output:
+        # S3 uploads run in background, in parallel with solving; whoever invokes the solver must flush them
+        artifact_writer = self.__get_artifact_writer()
+        # Warm containers and workers usually get the same settings again, so the week and static rules are reused
+        compiled_settings_cache = get_compiled_settings_cache()
+        compiled_settings = compiled_settings_cache.get(self._settings)
+        self.__log(f"Compiled settings cache: {compiled_settings_cache.hits} hits, "
+                   f"{compiled_settings_cache.misses} misses")
+        week = compiled_settings.week
+        rules = Rules(week, self._sessions, self._rooms)
+
+        solver_options = self._solver_options
+        if solver_options is None:
+            solver_options = load_tuned_solver_options(len(self._sessions)) or SolverOptions()
+        self.__log(f"Solver configuration: {solver_options}")
 
         # 1 hour
         time_limit = 60 * 60
@@ -49,7 +220,7 @@ class AspSolver(Solver):
         actual_timeout = time_limit - out_buffer_time
 
         if self._execution_uuid is not None:
-            logger.info({
+            get_logger().info({
                 "originalTimeout": str(time_limit),
                 "outBufferTime": str(out_buffer_time),
                 "actualTimeout": str(actual_timeout),
@@ -59,44 +230,120 @@ class AspSolver(Solver):
                   "Out Buffer Time", out_buffer_time, "|",
                   "Actual Timeout", actual_timeout)
 
-        models = solve(
-            inline=asp_problem,
-            use_clingo_module=False,
-            stats=True,
-            time_limit=int(actual_timeout.total_seconds()),
-        )
-        solution, found_optimal = None, False
-        for answer, optimization, optimality, answer_number in models.with_answer_number:
-            # Keep retrieving answers till timeout
-            solution = answer
-            if not optimality:
-                text = f"Found solution #{answer_number} with {optimization} penalty"
-                if self._execution_uuid is not None:
-                    logger.info(text, extra={"execution": self._execution_uuid})
-                else:
-                    print(text)
-            else:
-                found_optimal = True
+        if solver_options.difference_logic:
+            ignored_options = [name for name, enabled in (
+                ("stepwise", solver_options.stepwise,),
+                ("early stopping", solver_options.has_stopping_criteria(),),
+                ("warm start", solver_options.warm_start,),
+                ("multi-resolution", solver_options.multi_resolution,),
+            ) if enabled]
+            if ignored_options:
+                self.__log(f"Ignored by the difference logic backend: {', '.join(ignored_options)}")
 
-        status = "UNKNOWN"
-        if solution is not None and not found_optimal:
-            status = "SATISFIABLE"
-        elif solution is not None and found_optimal:
-            status = "SATISFIABLE_BEST"
-        elif solution is None and models.is_unknown:
-            status = "TIMEOUT"
-        elif solution is None and models.is_unsatisfiable:
-            status = "UNSATISFIABLE"
+        diagnosis_status, diagnosis_statistics = None, {}
+        if solver_options.diagnose:
+            diagnosis_start = time.monotonic()
+            diagnosis_timeout = actual_timeout * self.DIAGNOSIS_TIME_SHARE
+            if self.MIN_DIAGNOSIS_TIME <= actual_timeout:
+                diagnosis_timeout = max(diagnosis_timeout, self.MIN_DIAGNOSIS_TIME)
+            diagnosis_status, diagnosis_statistics = self.__diagnose(week, diagnosis_timeout)
+            self._check_cancelled()
+            if diagnosis_status == "UNSATISFIABLE":
+                # There is no timetable to look for, so it is not even tried
+                self.__save_status(diagnosis_status, diagnosis_statistics)
+                raise RuntimeError("Could not generate schedule; the input is infeasible, see asp_unsat_core.")
+            actual_timeout -= timedelta(seconds=time.monotonic() - diagnosis_start)
+
+        coarse_solution, coarse_statistics = None, {}
+        if solver_options.multi_resolution and not solver_options.difference_logic:
+            coarse_start = time.monotonic()
+            coarse_solution, coarse_statistics = self.__solve_coarse(week, solver_options,
+                                                                     actual_timeout * self.COARSE_TIME_SHARE)
+            self._check_cancelled()
+            actual_timeout -= timedelta(seconds=time.monotonic() - coarse_start)
+
+        if solver_options.difference_logic:
+            from adapter.asp.difference_logic import DifferenceLogicRules
+            asp_problem = DifferenceLogicRules(week, self._sessions, self._rooms).generate_dl_problem()
+        else:
+            # Stepwise optimization brings its own objective, one priority level at a time
+            asp_problem = rules.generate_asp_problem(optimization_directives=not solver_options.stepwise,
+                                                     compiled_settings=compiled_settings)
+
+        greedy_placements = None
+        hints = None
+        if coarse_solution is not None:
+            hints = get_solution_placements(coarse_solution)
+        elif solver_options.warm_start and not solver_options.difference_logic:
+            greedy_placements = self.__find_greedy_placements(week)
+            if greedy_placements is not None:
+                hints = get_clingo_placements(self._sessions, greedy_placements)
+        if hints is not None:
+            # Hints refer to concrete rooms, which the program may have merged into pools
+            pooled_rooms = get_pooled_rooms(rules.room_pools)
+            hints = {session: (timeslot, pooled_rooms.get(room, room),) for session, (timeslot, room) in hints.items()}
+            asp_problem += "\n" + "\n".join(Directives.generate_warm_start(hints))
+            if solver_options.heuristic not in (None, Heuristic.DOMAIN):
+                self.__log(f"Initial assignment is ignored by the {solver_options.heuristic.value} heuristic")
 
-        statistics_lines = [f"{key}\t{value}\n" for key, value in models.statistics.items()]
         if self._execution_uuid is not None:
-            save_txt_file(self._execution_uuid, "asp_statistics", "".join(statistics_lines))
-            save_txt_file(self._execution_uuid, "asp_status", f"{status}\n")
+            artifact_writer.submit(save_txt_file, self._execution_uuid, "asp_problem", asp_problem)
         elif self._local_dir is not None:
-            save_local_txt_file(self._local_dir, "asp_statistics", "".join(statistics_lines))
-            save_local_txt_file(self._local_dir, "asp_status", f"{status}\n")
+            save_local_txt_file(self._local_dir, "asp_problem", asp_problem)
+        else:
+            print(asp_problem)
+
+        if solver_options.difference_logic:
+            solution, status, statistics = self.__solve_difference_logic(asp_problem, week, solver_options,
+                                                                         actual_timeout)
+        elif solver_options.stepwise:
+            solution, status, statistics = self.__solve_stepwise(asp_problem, solver_options, actual_timeout)
+        elif solver_options.has_stopping_criteria():
+            solution, status, statistics = self.__solve_with_stopping_criteria(asp_problem, solver_options,
+                                                                               actual_timeout)
+        else:
+            solution, status, statistics = self.__solve_single_shot(asp_problem, solver_options, actual_timeout)
+        # Whatever was found until then is discarded, as the execution will run again from scratch
+        self._check_cancelled()
+        statistics.update(coarse_statistics)
+        statistics.update(diagnosis_statistics)
+        if solution is not None:
+            solution = assign_pooled_rooms(solution, rules.room_pools, self._sessions)
+
+        if solution is None and status != "UNSATISFIABLE":
+            # Clingo ran out of time or resources before any model; a rough timetable is better than none
+            if coarse_solution is not None:
+                self.__log("Falling back to the coarse timetable")
+                solution = coarse_solution
+                statistics["Fallback"] = "coarse"
+            else:
+                if greedy_placements is None:
+                    greedy_placements = self.__find_greedy_placements(week)
+                if greedy_placements is not None:
+                    self.__log("Falling back to the greedy timetable")
+                    solution = get_scheduled_sessions(self._sessions, greedy_placements, week)
+                    statistics["Fallback"] = "greedy"
+
+        if status == "UNSATISFIABLE" and diagnosis_status is None:
+            # Without a timetable there is no output to write, so its buffer time goes to finding out why; grounding
+            # cannot be interrupted, so it is not even tried if it would not fit, judging by the problem grounding
+            diagnosis_timeout = out_buffer_time / 2
+            grounding_time = statistics.get("Grounding Time")
+            expected_grounding_time = None if grounding_time is None \
+                else float(grounding_time.rstrip("s")) * self.DIAGNOSIS_GROUNDING_FACTOR
+            if expected_grounding_time is None or expected_grounding_time > diagnosis_timeout.total_seconds():
+                self.__log(f"Diagnosis skipped, as grounding the problem took {grounding_time or 'an unknown time'}, "
+                           f"too long for the {diagnosis_timeout.total_seconds():.0f}s left")
+            else:
+                diagnosis_status, diagnosis_statistics = self.__diagnose(week, diagnosis_timeout)
+                self._check_cancelled()
+                statistics.update(diagnosis_statistics)
+
+        self.__save_status(status, statistics)
 
         if solution is None:
+            if diagnosis_status == "UNSATISFIABLE":
+                raise RuntimeError("Could not generate schedule; the input is infeasible, see asp_unsat_core.")
             raise RuntimeError("Could not generate schedule; a valid solution could not be returned.")
 
         scheduled_sessions = [f"{variables[0]}\t{variables[1]}\t{variables[2]}\n"
@@ -105,8 +352,8 @@ class AspSolver(Solver):
                               for predicate, variables in solution if predicate in (ClP.PENALTY, ClP.BONUS,)]
 
         if self._execution_uuid is not None:
-            save_txt_file(self._execution_uuid, "asp_solution", "".join(scheduled_sessions))
-            save_txt_file(self._execution_uuid, "asp_optimization", "".join(optimization_lines))
+            artifact_writer.submit(save_txt_file, self._execution_uuid, "asp_solution", "".join(scheduled_sessions))
+            artifact_writer.submit(save_txt_file, self._execution_uuid, "asp_optimization", "".join(optimization_lines))
 
         elif self._local_dir is not None:
             save_local_txt_file(self._local_dir, "asp_solution", "".join(scheduled_sessions))
@@ -124,7 +371,7 @@ class AspSolver(Solver):
             timeslot, clingo_session, clingo_room = variables
             session_hex, room_hex = ClN.get_id_from_clingo(clingo_session), ClN.get_id_from_clingo(clingo_room)
             output.timetable.append(ScheduleUnit(
-                slot=week.get_slot_by_number(timeslot - 1),
+                slot=week.get_slot_by_number(timeslot - 1).to_slot(),
                 session=self._find_session_by_hex(session_hex),
                 room=self._find_room_by_hex(room_hex),
             ))
@@ -0,0 +1,23 @@
+from pathlib import Path
+from typing import Dict, Optional
+
+from sdk.artifact_writer import ArtifactWriter
+from sdk.aws_s3 import save_txt_file
+from sdk.local_fs import save_local_txt_file
+
+# Statistics which are also worth reporting next to the final status
+STATUS_STATISTICS = ("Stop Reason", "Costs", "Lower Bound", "Gap", "Resource Limit", "Peak Memory", "Fallback",
+                     "Coarse Status", "Diagnosis", "Unsat Core", "Placed Sessions")
+
+
+def save_status(status: str, statistics: Dict, execution_uuid: Optional[str], local_dir: Optional[Path],
+                artifact_writer: ArtifactWriter):
+    statistics_lines = [f"{key}\t{value}\n" for key, value in statistics.items()]
+    status_lines = [f"{status}\n"] + [f"{key}\t{statistics[key]}\n"
+                                     for key in STATUS_STATISTICS if key in statistics]
+    if execution_uuid is not None:
+        artifact_writer.submit(save_txt_file, execution_uuid, "asp_statistics", "".join(statistics_lines))
+        artifact_writer.submit(save_txt_file, execution_uuid, "asp_status", "".join(status_lines))
+    elif local_dir is not None:
+        save_local_txt_file(local_dir, "asp_statistics", "".join(statistics_lines))
+        save_local_txt_file(local_dir, "asp_status", "".join(status_lines))
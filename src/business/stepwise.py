@@ -0,0 +1,176 @@
+import threading
+import time
+from datetime import timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+from clingo import Control, Function, Number, SymbolType
+
+from adapter.asp.constants import ClingoPredicates as ClP, ClingoPrograms as ClPr, ClingoVariables as ClV
+from adapter.asp.optimizations import OptimizationPriorities
+from adapter.asp.rules import Directives
+from models.solver_options import Heuristic, SolverOptions
+
+Solution = List[Tuple[str, tuple]]
+
+# How often a running solve checks whether its execution was cancelled
+__CANCELLATION_INTERVAL = 0.5
+
+
+def get_priority_levels() -> List[int]:
+    return sorted({priority.value for priority in OptimizationPriorities}, reverse=True)
+
+
+def symbols_to_solution(symbols) -> Solution:
+    # Same shape as the answers returned by clyngor: (predicate, (arg1, arg2, ...))
+    return [(symbol.name, tuple(argument.number if argument.type == SymbolType.Number else str(argument)
+                                for argument in symbol.arguments))
+            for symbol in symbols]
+
+
+def get_level_cost(solution: Solution, level: int) -> int:
+    cost = 0
+    for predicate, variables in solution:
+        if predicate == ClP.PENALTY and variables[3] == level:
+            cost += variables[1]
+        elif predicate == ClP.BONUS and variables[3] == level:
+            cost -= variables[1]
+    return cost
+
+
+def generate_incumbent_heuristics(solution: Solution, step: int) -> str:
+    # Biases the next step towards the previous best model, as long as it remains active
+    starts: Dict[str, Tuple[int, str]] = {}
+    for predicate, variables in solution:
+        if predicate != ClP.SCHEDULED_SESSION:
+            continue
+        timeslot, session, room = variables
+        if session not in starts or timeslot < starts[session][0]:
+            starts[session] = (timeslot, room,)
+
+    incumbent_active = ClP.incumbent_active(step)
+    statements = [f"#external {incumbent_active}."]
+    for session, (timeslot, room) in starts.items():
+        for atom in (ClP.assigned_timeslot(timeslot, session), ClP.assigned_room(room, session)):
+            statements.append(f"#heuristic {atom} : {incumbent_active}. [1,true]")
+    return "\n".join(statements)
+
+
+def wait_for_solve(handle, timeout: float, cancelled: Optional[threading.Event] = None) -> bool:
+    # Same as handle.wait(timeout), but gives up early if the execution gets cancelled from another thread
+    deadline = time.monotonic() + timeout
+    while cancelled is None or not cancelled.is_set():
+        remaining_time = deadline - time.monotonic()
+        if handle.wait(max(0., remaining_time if cancelled is None else min(__CANCELLATION_INTERVAL, remaining_time))):
+            return True
+        if time.monotonic() >= deadline:
+            return False
+    return False
+
+
+def summarize_clingo_statistics(clingo_statistics) -> Dict:
+    statistics = {"CPU Time": clingo_statistics.get("summary", {}).get("times", {}).get("cpu")}
+    for name in ("choices", "conflicts", "restarts"):
+        statistics[name.capitalize()] = clingo_statistics.get("solving", {}).get("solvers", {}).get(name)
+    for name in ("atoms", "rules"):
+        statistics[name.capitalize()] = clingo_statistics.get("problem", {}).get("lp", {}).get(name)
+    return statistics
+
+
+class StepwiseOptimizer:
+    def __init__(self, asp_problem: str, solver_options: SolverOptions, log: Callable[[str], None] = print,
+                 cancelled: Optional[threading.Event] = None):
+        self.__asp_problem = asp_problem
+        self.__log = log
+        self.__cancelled = cancelled
+
+        # Incumbents are carried forward through domain heuristics
+        if solver_options.heuristic not in (None, Heuristic.DOMAIN):
+            log(f"The {solver_options.heuristic.value} heuristic is replaced by {Heuristic.DOMAIN.value} in stepwise "
+                f"optimization")
+        solver_options = solver_options.copy(update={"heuristic": Heuristic.DOMAIN})
+        self.__control = Control([*solver_options.to_clingo_options(), "--opt-mode=opt"])
+
+        self.level_bounds: Dict[int, int] = {}
+        self.level_optimal: Dict[int, bool] = {}
+        self.level_times: Dict[int, float] = {}
+        self.grounding_time: Optional[float] = None
+
+    def __solve_level(self, level: int, time_slice: float) -> Tuple[Optional[Solution], bool, bool]:
+        solution: List[Optional[Solution]] = [None]
+
+        def on_model(model):
+            solution[0] = symbols_to_solution(model.symbols(shown=True))
+            self.__log(f"Level {level}: found solution with {get_level_cost(solution[0], level)} penalty")
+
+        with self.__control.solve(on_model=on_model, async_=True) as handle:
+            if not wait_for_solve(handle, time_slice, self.__cancelled):
+                handle.cancel()
+            result = handle.get()
+
+        return solution[0], result.exhausted and not result.interrupted, result.unsatisfiable
+
+    def solve(self, timeout: timedelta) -> Tuple[Optional[Solution], str, Dict]:
+        ctl = self.__control
+        ctl.add(ClPr.BASE, [], self.__asp_problem)
+        ctl.add(ClPr.OBJECTIVE, [ClV.LEVEL], Directives.generate_stepwise_objective())
+        ctl.add(ClPr.FREEZE, [ClV.LEVEL, ClV.BOUND], Directives.generate_stepwise_freeze())
+        start = time.monotonic()
+        ctl.ground([(ClPr.BASE, [])])
+        self.grounding_time = time.monotonic() - start
+
+        deadline = time.monotonic() + timeout.total_seconds()
+        levels = get_priority_levels()
+        incumbent: Optional[Solution] = None
+
+        for i, level in enumerate(levels):
+            if self.__cancelled is not None and self.__cancelled.is_set():
+                break
+            # Every level gets an even share of the remaining time, so fast levels leave more for the rest
+            time_slice = max(0., (deadline - time.monotonic()) / (len(levels) - i))
+            ctl.ground([(ClPr.OBJECTIVE, [Number(level)])])
+            ctl.assign_external(Function(ClP.OBJECTIVE_ACTIVE, [Number(level)]), True)
+
+            start = time.monotonic()
+            solution, optimal, unsatisfiable = self.__solve_level(level, time_slice)
+            self.level_times[level] = time.monotonic() - start
+
+            if unsatisfiable and incumbent is None:
+                return None, "UNSATISFIABLE", self.__get_statistics()
+            if solution is not None:
+                incumbent = solution
+            if incumbent is None:
+                # Without any model there is nothing to freeze; the next level keeps searching for the first one
+                ctl.assign_external(Function(ClP.OBJECTIVE_ACTIVE, [Number(level)]), False)
+                self.level_optimal[level] = False
+                continue
+
+            self.level_bounds[level] = get_level_cost(incumbent, level)
+            self.level_optimal[level] = optimal
+            self.__log(f"Level {level}: frozen at {self.level_bounds[level]} penalty "
+                       f"({'optimal' if optimal else 'not proven optimal'})")
+
+            ctl.ground([(ClPr.FREEZE, [Number(level), Number(self.level_bounds[level])])])
+            ctl.assign_external(Function(ClP.OBJECTIVE_ACTIVE, [Number(level)]), False)
+
+            incumbent_program = f"{ClPr.INCUMBENT}_{level}"
+            ctl.add(incumbent_program, [], generate_incumbent_heuristics(incumbent, level))
+            ctl.ground([(incumbent_program, [])])
+            if i > 0 and levels[i - 1] in self.level_bounds:
+                ctl.assign_external(Function(ClP.INCUMBENT_ACTIVE, [Number(levels[i - 1])]), False)
+            ctl.assign_external(Function(ClP.INCUMBENT_ACTIVE, [Number(level)]), True)
+
+        if incumbent is None:
+            return None, "TIMEOUT", self.__get_statistics()
+        if all(self.level_optimal.get(level, False) for level in levels):
+            return incumbent, "SATISFIABLE_BEST", self.__get_statistics()
+        return incumbent, "SATISFIABLE", self.__get_statistics()
+
+    def __get_statistics(self) -> Dict:
+        statistics = {"Grounding Time": f"{self.grounding_time:.3f}s"}
+        for level in get_priority_levels():
+            if level in self.level_times:
+                statistics[f"Level {level}"] = f"bound={self.level_bounds.get(level)} " \
+                                               f"optimal={self.level_optimal.get(level, False)} " \
+                                               f"time={self.level_times[level]:.3f}s"
+        statistics.update(summarize_clingo_statistics(self.__control.statistics))
+        return statistics
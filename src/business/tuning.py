@@ -0,0 +1,136 @@
+import json
+import os
+import re
+import time
+from enum import Enum
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from adapter.asp.rules import Rules
+from adapter.time.week import Week
+from models.dto.input import SolverInput
+from models.solver_options import Configuration, Heuristic, OptimizationStrategy, RestartPolicy, SolverOptions
+
+__TUNING_FILE = Path(os.environ.get("SOLVER_TUNING_FILE", Path(__file__).parent.parent / "solver_tuning.json"))
+
+CANDIDATE_SOLVER_OPTIONS: List[SolverOptions] = [
+    SolverOptions(),
+    SolverOptions(optimization_strategy=OptimizationStrategy.BB_HIER),
+    SolverOptions(optimization_strategy=OptimizationStrategy.BB_DEC),
+    SolverOptions(optimization_strategy=OptimizationStrategy.USC_OLL),
+    SolverOptions(optimization_strategy=OptimizationStrategy.USC_ONE),
+    SolverOptions(configuration=Configuration.CRAFTY),
+    SolverOptions(configuration=Configuration.TRENDY),
+    SolverOptions(configuration=Configuration.HANDY, optimization_strategy=OptimizationStrategy.BB_HIER),
+    SolverOptions(heuristic=Heuristic.VSIDS, restart_policy=RestartPolicy.LUBY),
+    SolverOptions(heuristic=Heuristic.BERKMIN, restart_policy=RestartPolicy.GEOMETRIC),
+]
+
+
+class SizeClass(str, Enum):
+    SMALL = "small"
+    MEDIUM = "medium"
+    LARGE = "large"
+
+
+def get_size_class(sessions_count: int) -> SizeClass:
+    if sessions_count < 50:
+        return SizeClass.SMALL
+    if sessions_count < 250:
+        return SizeClass.MEDIUM
+    return SizeClass.LARGE
+
+
+def load_tuned_solver_options(sessions_count: int) -> Optional[SolverOptions]:
+    if not __TUNING_FILE.exists():
+        return None
+
+    with open(__TUNING_FILE) as f:
+        tuned = json.loads(f.read())
+
+    size_class = get_size_class(sessions_count)
+    if size_class.value not in tuned:
+        return None
+    return SolverOptions.parse_obj(tuned[size_class.value])
+
+
+def save_tuned_solver_options(tuned_options: Dict[SizeClass, SolverOptions]) -> Path:
+    tuned = {}
+    if __TUNING_FILE.exists():
+        with open(__TUNING_FILE) as f:
+            tuned = json.loads(f.read())
+
+    for size_class, solver_options in tuned_options.items():
+        tuned[size_class.value] = json.loads(solver_options.json(by_alias=True, exclude_defaults=True))
+
+    with open(__TUNING_FILE, 'w') as f:
+        f.write(json.dumps(tuned, indent=2, sort_keys=True) + "\n")
+    return __TUNING_FILE
+
+
+def load_tuning_instance(path: Path) -> Tuple[str, int]:
+    # Either an already generated ASP program or a solver input, from which the program is generated
+    if path.is_dir():
+        path = path / "input.json"
+
+    if path.suffix == ".json":
+        input_data = SolverInput.parse_file(path)
+        rules = Rules(Week(input_data.settings), input_data.sessions, input_data.rooms)
+        return rules.generate_asp_problem(), len(input_data.sessions)
+
+    with open(path) as f:
+        asp_problem = f.read()
+    return asp_problem, len(re.findall(r"^session\(", asp_problem, re.MULTILINE))
+
+
+def run_candidate(asp_problem: str, solver_options: SolverOptions, time_limit: int) -> Tuple[Optional[tuple], float]:
+    from clyngor import solve
+
+    start = time.perf_counter()
+    models = solve(
+        inline=asp_problem,
+        options=solver_options.to_clingo_options(),
+        use_clingo_module=False,
+        stats=False,
+        time_limit=time_limit,
+    )
+
+    best_optimization, time_to_best = None, float(time_limit)
+    for _, optimization, _, _ in models.with_answer_number:
+        best_optimization = optimization if isinstance(optimization, tuple) else (optimization,)
+        time_to_best = time.perf_counter() - start
+    return best_optimization, time_to_best
+
+
+def race_solver_options(instance_paths: List[Path], time_limit: int,
+                        candidates: Optional[List[SolverOptions]] = None) -> Dict[SizeClass, SolverOptions]:
+    if candidates is None:
+        candidates = CANDIDATE_SOLVER_OPTIONS
+
+    instances_per_class: Dict[SizeClass, List[Tuple[Path, str, int]]] = {}
+    for instance_path in instance_paths:
+        asp_problem, sessions_count = load_tuning_instance(instance_path)
+        size_class = get_size_class(sessions_count)
+        instances_per_class.setdefault(size_class, []).append((instance_path, asp_problem, sessions_count,))
+
+    tuned_options: Dict[SizeClass, SolverOptions] = {}
+    for size_class, instances in instances_per_class.items():
+        alive = list(range(len(candidates)))
+        rank_sums = [0] * len(candidates)
+
+        # Successive halving: after every instance, the worse half of the remaining candidates is dropped
+        for instance_path, asp_problem, _ in sorted(instances, key=lambda i: i[2]):
+            results = {}
+            for i in alive:
+                optimization, time_to_best = run_candidate(asp_problem, candidates[i], time_limit)
+                print(f"[{size_class.value}] {instance_path} | {candidates[i]} | {optimization} in {time_to_best:.2f}s")
+                results[i] = (optimization is None, optimization or (), time_to_best,)
+
+            for rank, i in enumerate(sorted(alive, key=lambda c: results[c])):
+                rank_sums[i] += rank
+            alive = sorted(alive, key=lambda c: rank_sums[c])[:max(2, (len(alive) + 1) // 2)]
+
+        tuned_options[size_class] = candidates[min(alive, key=lambda c: rank_sums[c])]
+        print(f"[{size_class.value}] Best configuration: {tuned_options[size_class]}")
+
+    return tuned_options
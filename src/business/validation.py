@@ -0,0 +1,228 @@
+from collections import defaultdict
+from typing import Callable, Dict, List, Set, Tuple
+
+import numpy as np
+from pydantic import UUID4
+
+from adapter.asp.constants import ClingoNaming as ClN
+from adapter.asp.optimizations import BonusCosts, OptimizationPriorities, PenaltyCosts
+from adapter.time.minute_slot import MinuteSlot
+from adapter.time.week import Week
+from models.dto.input import SolverInput
+from models.dto.output import Output
+from models.session import Session
+from models.slot import SlotType
+from utils.session_utils import get_eligible_timeslots, get_room_distances_in_timeslots, \
+    get_session_slots_count, is_room_eligible_for_session
+
+
+class ValidationResult:
+    def __init__(self, violations: List[str], costs: Dict[int, int]):
+        self.violations = violations
+        # Cost per optimization priority, with bonuses as negative costs, as clingo reports them
+        self.costs = costs
+
+    @property
+    def is_valid(self) -> bool:
+        return not self.violations
+
+    @property
+    def penalty(self) -> int:
+        return sum(self.costs.values())
+
+    def get_cost_vector(self) -> List[int]:
+        return [self.costs[priority] for priority in sorted(self.costs, reverse=True)]
+
+
+class TimetableValidator:
+    # Checks every hard constraint and computes every optimization expressed in Rules, without clingo.
+    # The input is turned into arrays once, so each candidate timetable is scored in a few vectorized operations
+
+    def __init__(self, input_data: SolverInput):
+        self.__sessions = input_data.sessions
+        self.__rooms = input_data.rooms
+        self.__week = Week(input_data.settings)
+        self.__session_index = {session.id: i for i, session in enumerate(self.__sessions)}
+        self.__room_index = {room.id: i for i, room in enumerate(self.__rooms)}
+
+        n_sessions, n_rooms = len(self.__sessions), len(self.__rooms)
+        n_timeslots = self.__week.get_total_slot_count()
+        self.__slots_per_day = self.__week.get_slots_per_day_count()
+
+        self.__durations = np.array([get_session_slots_count(s, self.__week) for s in self.__sessions], dtype=int)
+        self.__eligible_starts = np.zeros((n_sessions, n_timeslots), dtype=bool)
+        self.__eligible_rooms = np.zeros((n_sessions, n_rooms), dtype=bool)
+        self.__penalized_timeslots = np.zeros((n_sessions, n_timeslots), dtype=bool)
+        self.__preferred_timeslots = np.zeros((n_sessions, n_timeslots), dtype=bool)
+        self.__penalized_rooms = np.zeros((n_sessions, n_rooms), dtype=bool)
+        self.__preferred_rooms = np.zeros((n_sessions, n_rooms), dtype=bool)
+        for i, session in enumerate(self.__sessions):
+            self.__eligible_starts[i, [t - 1 for t in get_eligible_timeslots(session, self.__week)]] = True
+            self.__eligible_rooms[i] = [is_room_eligible_for_session(session, room) for room in self.__rooms]
+
+            preferences = session.constraints.timeslots_preferences
+            for slot in preferences.penalized_slots:
+                self.__penalized_timeslots[i, [t - 1 for t in self.__week.get_sub_slot_ids(slot)]] = True
+            for slot in preferences.preferred_slots:
+                self.__preferred_timeslots[i, [t - 1 for t in self.__week.get_sub_slot_ids(slot)]] = True
+
+            room_preferences = session.constraints.rooms_preferences
+            for room_uuid in room_preferences.penalized_rooms:
+                if room_uuid in self.__room_index:
+                    self.__penalized_rooms[i, self.__room_index[room_uuid]] = True
+            for room_uuid in room_preferences.preferred_rooms:
+                if room_uuid in self.__room_index:
+                    self.__preferred_rooms[i, self.__room_index[room_uuid]] = True
+
+        self.__undesirable_timeslots: List[Tuple[OptimizationPriorities, PenaltyCosts, np.ndarray]] = []
+        for slot_type, priority, cost in (
+                (SlotType.UNDESIRABLE_1, OptimizationPriorities.PENALTY__UNDESIRABLE_TIMESLOT_1,
+                 PenaltyCosts.UNDESIRABLE_TIMESLOT_1,),
+                (SlotType.UNDESIRABLE_2, OptimizationPriorities.PENALTY__UNDESIRABLE_TIMESLOT_2,
+                 PenaltyCosts.UNDESIRABLE_TIMESLOT_2,),
+                (SlotType.UNDESIRABLE_5, OptimizationPriorities.PENALTY__UNDESIRABLE_TIMESLOT_5,
+                 PenaltyCosts.UNDESIRABLE_TIMESLOT_5,),
+        ):
+            timeslots = np.zeros(n_timeslots, dtype=bool)
+            timeslots[[t - 1 for t in self.__week.get_slot_ids_per_type(slot_type)]] = True
+            self.__undesirable_timeslots.append((priority, cost, timeslots,))
+
+        self.__room_distances = np.zeros((n_rooms, n_rooms), dtype=int)
+        for (room1, room2), distance in get_room_distances_in_timeslots(self.__rooms, self.__week).items():
+            self.__room_distances[self.__room_index[room1], self.__room_index[room2]] = distance
+
+        self.__no_overlap_pairs = self.__find_related_pairs(lambda s: s.constraints.cannot_conflict_in_time)
+        self.__avoid_overlap_pairs = self.__find_related_pairs(lambda s: s.constraints.avoid_conflict_in_time)
+        self.__contiguous_pairs = self.__find_related_pairs(lambda s: s.constraints.same_room_if_contiguous_in_time)
+        self.__distance_pairs = self.__find_related_pairs(lambda s: s.constraints.apply_room_distances)
+
+    def __find_related_pairs(self, related_uuids_getter: Callable[[Session], List[UUID4]]) -> np.ndarray:
+        # Unique pairs, with the session sorting first in the ASP program as the first one, which is the one
+        # overlap penalties are charged to
+        pairs = set()
+        for session in self.__sessions:
+            for other_session_uuid in related_uuids_getter(session):
+                other_session = self.__sessions[self.__session_index[other_session_uuid]]
+                session1, session2 = sorted((session, other_session,), key=lambda s: ClN.session_to_clingo(s))
+                pairs.add((self.__session_index[session1.id], self.__session_index[session2.id],))
+        return np.array(sorted(pairs), dtype=int).reshape(-1, 2)
+
+    def get_assignment(self, output: Output) -> Tuple[np.ndarray, np.ndarray, List[str]]:
+        # Start timeslot (as numbered in the ASP program) and room index of every session; 0 and -1 if unscheduled
+        violations: List[str] = []
+        session_timeslots: Dict[int, List[int]] = defaultdict(list)
+        session_rooms: Dict[int, Set[int]] = defaultdict(set)
+        for unit in output.timetable:
+            if unit.session.id not in self.__session_index or unit.room.id not in self.__room_index:
+                violations.append(f"Unknown session {unit.session.id} or room {unit.room.id} in the timetable")
+                continue
+            try:
+                timeslot = self.__week.get_slot_id(MinuteSlot.from_slot(unit.slot))
+            except ValueError:
+                violations.append(f"Session {unit.session.id} scheduled out of the week at {unit.slot}")
+                continue
+            i = self.__session_index[unit.session.id]
+            session_timeslots[i].append(timeslot)
+            session_rooms[i].add(self.__room_index[unit.room.id])
+
+        starts = np.zeros(len(self.__sessions), dtype=int)
+        rooms = np.full(len(self.__sessions), -1, dtype=int)
+        for i, session in enumerate(self.__sessions):
+            if i not in session_timeslots:
+                violations.append(f"Session {session.id} is not scheduled")
+                continue
+
+            timeslots = sorted(session_timeslots[i])
+            if timeslots != list(range(timeslots[0], timeslots[0] + int(self.__durations[i]))):
+                violations.append(f"Session {session.id} is not scheduled in {self.__durations[i]} "
+                                  f"contiguous timeslots: {timeslots}")
+            if len(session_rooms[i]) > 1:
+                violations.append(f"Session {session.id} is scheduled in {len(session_rooms[i])} rooms")
+            starts[i], rooms[i] = timeslots[0], min(session_rooms[i])
+        return starts, rooms, violations
+
+    def validate(self, output: Output) -> ValidationResult:
+        starts, rooms, violations = self.get_assignment(output)
+        result = self.score(starts, rooms)
+        result.violations[:0] = violations
+        return result
+
+    def score(self, starts: np.ndarray, rooms: np.ndarray) -> ValidationResult:
+        violations: List[str] = []
+        costs = {priority.value: 0 for priority in OptimizationPriorities}
+        n_sessions, n_timeslots = self.__eligible_starts.shape
+
+        scheduled = (starts > 0) & (starts <= n_timeslots) & (rooms >= 0)
+        ends = starts + self.__durations
+        days = (starts - 1) // self.__slots_per_day
+        indices = np.flatnonzero(scheduled)
+
+        for i in indices[~self.__eligible_starts[indices, starts[indices] - 1]]:
+            violations.append(f"Session {self.__sessions[i].id} cannot start at timeslot {starts[i]}")
+        for i in indices[~self.__eligible_rooms[indices, rooms[indices]]]:
+            violations.append(f"Session {self.__sessions[i].id} cannot use room {self.__rooms[rooms[i]].id}")
+
+        # Session x timeslot and room x timeslot occupancy
+        durations = self.__durations[indices]
+        occupied_sessions = np.repeat(indices, durations)
+        occupied_timeslots = starts[occupied_sessions] - 1 \
+            + np.arange(occupied_sessions.size) - np.repeat(np.cumsum(durations) - durations, durations)
+        within_week = occupied_timeslots < n_timeslots
+        occupied_sessions, occupied_timeslots = occupied_sessions[within_week], occupied_timeslots[within_week]
+        session_occupancy = np.zeros((n_sessions, n_timeslots), dtype=bool)
+        session_occupancy[occupied_sessions, occupied_timeslots] = True
+        room_occupancy = np.zeros((len(self.__rooms), n_timeslots), dtype=int)
+        np.add.at(room_occupancy, (rooms[occupied_sessions], occupied_timeslots,), 1)
+
+        for room, timeslot in np.argwhere(room_occupancy > 1):
+            violations.append(f"Room {self.__rooms[room].id} has {room_occupancy[room, timeslot]} sessions "
+                              f"at timeslot {timeslot + 1}")
+
+        first, second = self.__no_overlap_pairs[:, 0], self.__no_overlap_pairs[:, 1]
+        for i, j in self.__no_overlap_pairs[self.__overlap(first, second, starts, ends, scheduled)]:
+            violations.append(f"Sessions {self.__sessions[i].id} and {self.__sessions[j].id} cannot overlap")
+
+        for pairs in (self.__contiguous_pairs, self.__contiguous_pairs[:, ::-1],):
+            first, second = pairs[:, 0], pairs[:, 1]
+            broken = scheduled[first] & scheduled[second] & (ends[first] == starts[second]) \
+                & (days[first] == days[second]) & (rooms[first] != rooms[second])
+            for i, j in pairs[broken]:
+                violations.append(f"Sessions {self.__sessions[i].id} and {self.__sessions[j].id} are contiguous "
+                                  f"but in different rooms")
+
+        for pairs in (self.__distance_pairs, self.__distance_pairs[:, ::-1],):
+            first, second = pairs[:, 0], pairs[:, 1]
+            gaps = starts[second] - ends[first]
+            broken = scheduled[first] & scheduled[second] & (days[first] == days[second]) & (gaps >= 0) \
+                & (gaps < self.__room_distances[rooms[first], rooms[second]])
+            for i, j in pairs[broken]:
+                violations.append(f"Sessions {self.__sessions[i].id} and {self.__sessions[j].id} are too close "
+                                  f"for the distance between their rooms")
+
+        # Optimizations are charged once per session, no matter in how many timeslots they apply
+        for priority, cost, timeslots in self.__undesirable_timeslots:
+            costs[priority] += cost * int(session_occupancy[:, timeslots].any(axis=1).sum())
+        costs[OptimizationPriorities.PENALTY__AVOID_ROOM_FOR_SESSION] += \
+            PenaltyCosts.AVOID_ROOM_FOR_SESSION * int(self.__penalized_rooms[indices, rooms[indices]].sum())
+        costs[OptimizationPriorities.PENALTY__AVOID_TIMESLOT_FOR_SESSION] += \
+            PenaltyCosts.AVOID_TIMESLOT_FOR_SESSION \
+            * int((session_occupancy & self.__penalized_timeslots).any(axis=1).sum())
+
+        first, second = self.__avoid_overlap_pairs[:, 0], self.__avoid_overlap_pairs[:, 1]
+        overlapping = self.__overlap(first, second, starts, ends, scheduled)
+        costs[OptimizationPriorities.PENALTY__AVOID_SESSION_OVERLAP] += \
+            PenaltyCosts.AVOID_SESSION_OVERLAP * np.unique(first[overlapping]).size
+
+        costs[OptimizationPriorities.BONUS__PREFER_ROOM_FOR_SESSION] -= \
+            BonusCosts.PREFER_ROOM_FOR_SESSION * int(self.__preferred_rooms[indices, rooms[indices]].sum())
+        costs[OptimizationPriorities.BONUS__PREFER_TIMESLOT_FOR_SESSION] -= \
+            BonusCosts.PREFER_TIMESLOT_FOR_SESSION \
+            * int((session_occupancy & self.__preferred_timeslots).any(axis=1).sum())
+
+        return ValidationResult(violations, costs)
+
+    @staticmethod
+    def __overlap(first: np.ndarray, second: np.ndarray, starts: np.ndarray, ends: np.ndarray,
+                  scheduled: np.ndarray) -> np.ndarray:
+        return scheduled[first] & scheduled[second] & (starts[first] < ends[second]) & (starts[second] < ends[first])
+
@@ -0,0 +1,146 @@
+import signal
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+from business.greedy import GreedySolver
+from business.scheduler import AspSolver
+from models.solver import ExecutionCancelledError
+from models.solver_options import SolverOptions
+from sdk.artifact_writer import create_artifact_writer
+from sdk.aws_s3 import get_input_object, save_output_object
+from sdk.execution_queue import ExecutionQueue, QueueMessage
+
+
+def process_execution(execution_id: str, cancelled: threading.Event,
+                      solver_options: Optional[SolverOptions] = None, greedy: bool = False) -> str:
+    execution_uuid = execution_id.split(":")[-1]
+    input_data = get_input_object(execution_uuid)
+
+    # Other executions may be running next to this one, so it only waits for its own artifacts
+    artifact_writer = create_artifact_writer()
+    solver_class = GreedySolver if greedy else AspSolver
+    solver = solver_class(input_data.sessions, input_data.rooms, input_data.settings)
+    solver.with_execution_uuid(execution_uuid)
+    solver.with_artifact_writer(artifact_writer)
+    solver.with_cancellation(cancelled)
+    if solver_options is not None:
+        solver.with_solver_options(solver_options)
+    try:
+        output = solver.solve()
+        object_key = save_output_object(execution_uuid, output)
+    finally:
+        artifacts_stored = artifact_writer.flush()
+    if not artifacts_stored:
+        # Failed, so the execution is retried instead of being completed without all of its artifacts
+        raise RuntimeError("Could not store every artifact of the execution")
+    return object_key
+
+
+class Worker:
+    def __init__(self, queue: ExecutionQueue, concurrency: int, poll_interval: float = 5.,
+                 heartbeat_interval: float = 30., exit_when_empty: bool = False,
+                 process: Callable[[str, threading.Event], str] = process_execution):
+        self.__queue = queue
+        self.__concurrency = concurrency
+        self.__poll_interval = poll_interval
+        self.__heartbeat_interval = heartbeat_interval
+        self.__exit_when_empty = exit_when_empty
+        self.__process = process
+
+        self.__in_flight: Dict[str, QueueMessage] = {}
+        # Reentrant, as the signal handler may interrupt the main thread while holding it
+        self.__lock = threading.RLock()
+        self.__slot_released = threading.Event()
+        self.__stopping = threading.Event()
+        # Shared by every in-flight execution, which stops solving as soon as it is set
+        self.__cancelled = threading.Event()
+        self.__stopped = threading.Event()
+        self.processed = 0
+        self.failed = 0
+
+    def stop(self, *_):
+        if self.__stopping.is_set():
+            with self.__lock:
+                print(f"Already stopping, waiting for {len(self.__in_flight)} executions to be cancelled")
+            return
+
+        # Clingo is interrupted, and the in-flight executions are handed back to the queue once it exits
+        print("Stopping: cancelling the in-flight executions")
+        self.__stopping.set()
+        self.__cancelled.set()
+        self.__slot_released.set()
+
+    def __run_message(self, message: QueueMessage):
+        start = time.time()
+        print(f"[{message.execution_id}] Started (attempt {message.attempts})")
+        try:
+            object_key = self.__process(message.execution_id, self.__cancelled)
+        except ExecutionCancelledError:
+            # Not a failure of the execution, so the attempt is not consumed
+            self.__queue.release(message)
+            print(f"[{message.execution_id}] Cancelled after {time.time() - start:.1f}s, released to the queue")
+        except Exception as e:
+            self.__queue.fail(message, repr(e))
+            with self.__lock:
+                self.failed += 1
+            print(f"[{message.execution_id}] Failed after {time.time() - start:.1f}s: {e!r}")
+        else:
+            self.__queue.complete(message)
+            with self.__lock:
+                self.processed += 1
+            print(f"[{message.execution_id}] Stored {object_key} after {time.time() - start:.1f}s")
+        finally:
+            with self.__lock:
+                del self.__in_flight[message.receipt]
+            self.__slot_released.set()
+
+    def __heartbeat(self):
+        # Keeps going while stopping, so the leases of the executions still running are not lost
+        while not self.__stopped.wait(self.__heartbeat_interval):
+            with self.__lock:
+                in_flight = list(self.__in_flight.values())
+            for message in in_flight:
+                self.__queue.heartbeat(message)
+            print(f"Heartbeat: {len(in_flight)} in flight, {self.processed} processed, {self.failed} failed")
+
+    def run(self):
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGINT, self.stop)
+            signal.signal(signal.SIGTERM, self.stop)
+
+        heartbeat = threading.Thread(target=self.__heartbeat, name="worker-heartbeat", daemon=True)
+        heartbeat.start()
+
+        print(f"Worker started with {self.__concurrency} concurrent executions")
+        waiting_for = 0
+        with ThreadPoolExecutor(max_workers=self.__concurrency, thread_name_prefix="worker") as executor:
+            while not self.__stopping.is_set():
+                self.__slot_released.clear()
+                with self.__lock:
+                    free_slots = self.__concurrency - len(self.__in_flight)
+
+                messages = self.__queue.receive(free_slots) if free_slots > 0 else []
+                for message in messages:
+                    with self.__lock:
+                        self.__in_flight[message.receipt] = message
+                    executor.submit(self.__run_message, message)
+
+                with self.__lock:
+                    idle = not messages and not self.__in_flight
+                if self.__exit_when_empty and idle:
+                    # Failed executions waiting for their retry are not due yet, but they are still to be processed
+                    delayed = self.__queue.count_pending()
+                    if not delayed:
+                        break
+                    if delayed != waiting_for:
+                        print(f"Waiting for {delayed} executions to be retried")
+                    waiting_for = delayed
+
+                # Woken up as soon as an execution finishes, otherwise polls the queue again after a while
+                self.__slot_released.wait(self.__poll_interval)
+
+        # Leaving the executor context waits for the in-flight executions, either finished or cancelled
+        self.__stopped.set()
+        print(f"Worker stopped: {self.processed} processed, {self.failed} failed")
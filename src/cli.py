@@ -1,13 +1,19 @@
 import argparse
+import os
+import sys
 from pathlib import Path
-from typing import Optional
+from typing import List, Optional
 
+from business.greedy import GreedySolver
 from business.scheduler import AspSolver
-from sdk.aws_s3 import get_input_object, save_output_object
+from models.solver_options import Configuration, Heuristic, OptimizationStrategy, RestartPolicy, SolverOptions
 from sdk.local_fs import get_local_input_object, save_local_output_object
 
 
 def aws_execution(execution_arn: str):
+    from sdk.artifact_writer import get_artifact_writer
+    from sdk.aws_s3 import get_input_object, save_output_object
+
     execution_uuid = execution_arn.split(":")[-1]
     print(f"Execution UUID: {execution_uuid}")
 
@@ -15,25 +21,126 @@ def aws_execution(execution_arn: str):
 
     solver = AspSolver(input_data.sessions, input_data.rooms, input_data.settings)
     solver.with_execution_uuid(execution_uuid)
-    output = solver.solve()
+    try:
+        output = solver.solve()
 
-    object_key = save_output_object(execution_uuid, output)
-    print(f"File saved in S3: {object_key}")
+        object_key = save_output_object(execution_uuid, output)
+        print(f"File saved in S3: {object_key}")
+    finally:
+        get_artifact_writer().flush()
 
 
-def local_execution(working_directory_path_raw: str, timeout: Optional[int]):
+def local_execution(working_directory_path_raw: str, timeout: Optional[int],
+                    solver_options: Optional[SolverOptions] = None, greedy: bool = False):
     working_directory_path = Path(working_directory_path_raw)
     input_data = get_local_input_object(working_directory_path)
 
-    solver = AspSolver(input_data.sessions, input_data.rooms, input_data.settings)
+    solver_class = GreedySolver if greedy else AspSolver
+    solver = solver_class(input_data.sessions, input_data.rooms, input_data.settings)
     solver.with_local_working_directory(working_directory_path)
     if timeout is not None and timeout > 0:
         solver.with_timeout(timeout)
+    if solver_options is not None:
+        solver.with_solver_options(solver_options)
     output = solver.solve()
 
     save_local_output_object(working_directory_path, output)
 
 
+def tune_execution(corpus: List[str], time_limit: Optional[int]):
+    from business.tuning import race_solver_options, save_tuned_solver_options
+
+    if time_limit is None or time_limit <= 0:
+        time_limit = 60
+
+    tuned_options = race_solver_options([Path(instance) for instance in corpus], int(time_limit))
+    tuning_file = save_tuned_solver_options(tuned_options)
+    print(f"Tuned configurations saved in {tuning_file}")
+
+
+def batch_execution(patterns: List[str], timeout: Optional[int], solver_options: Optional[SolverOptions],
+                    jobs: Optional[int], greedy: bool = False):
+    from business.batch import expand_work_dirs, run_batch
+    from utils.table_utils import print_table
+
+    results = run_batch(expand_work_dirs(patterns), timeout, solver_options or SolverOptions(), jobs, greedy)
+
+    rows = [["Working Directory", "Status", "Penalty", "Wall Time"]]
+    for result in results:
+        rows.append([result.work_dir, result.status, "-" if result.penalty is None else str(result.penalty),
+                     f"{result.wall_time:.1f}s"])
+    print_table(rows)
+
+
+def validate_execution(patterns: List[str]) -> bool:
+    import time
+
+    from business.batch import expand_work_dirs
+    from business.validation import TimetableValidator
+    from sdk.local_fs import get_local_output_object
+    from utils.table_utils import print_table
+
+    rows = [["Working Directory", "Violations", "Costs", "Penalty", "Scoring Time"]]
+    for work_dir in expand_work_dirs(patterns):
+        validator = TimetableValidator(get_local_input_object(Path(work_dir)))
+        output = get_local_output_object(Path(work_dir))
+
+        start = time.perf_counter()
+        result = validator.validate(output)
+        elapsed = time.perf_counter() - start
+
+        for violation in result.violations:
+            print(f"[{work_dir}] {violation}")
+        rows.append([work_dir, str(len(result.violations)), str(tuple(result.get_cost_vector())),
+                     str(result.penalty), f"{elapsed * 1000:.1f}ms"])
+    print_table(rows)
+    return all(row[1] == "0" for row in rows[1:])
+
+
+def worker_execution(queue_path: str, concurrency: Optional[int], solver_options: Optional[SolverOptions],
+                     exit_when_empty: bool, greedy: bool = False):
+    from functools import partial
+
+    from business.worker import Worker, process_execution
+    from sdk.execution_queue import SqliteExecutionQueue
+
+    worker = Worker(SqliteExecutionQueue(Path(queue_path)), concurrency or 1, exit_when_empty=exit_when_empty,
+                    process=partial(process_execution, solver_options=solver_options, greedy=greedy))
+    worker.run()
+
+
+def enqueue_executions(queue_path: str, execution_ids: List[str]):
+    from sdk.execution_queue import SqliteExecutionQueue
+
+    queue = SqliteExecutionQueue(Path(queue_path))
+    for execution_id in execution_ids:
+        queue.send(execution_id)
+    print(f"Enqueued {len(execution_ids)} executions in {queue_path}")
+
+
+def parse_solver_options(args: argparse.Namespace) -> Optional[SolverOptions]:
+    solver_options = SolverOptions(
+        configuration=args.configuration,
+        optimization_strategy=args.optStrategy,
+        heuristic=args.heuristic,
+        restart_policy=args.restarts,
+        seed=args.seed,
+        threads=args.threads,
+        stepwise=args.stepwise,
+        stagnation_timeout=args.stagnation,
+        gap_threshold=args.gap,
+        warm_start=args.warmStart,
+        multi_resolution=args.multiResolution,
+        difference_logic=args.differenceLogic,
+        diagnose=args.diagnose,
+    )
+    if not solver_options.to_clingo_options() and not solver_options.stepwise \
+            and not solver_options.has_stopping_criteria() and not solver_options.difference_logic \
+            and not solver_options.diagnose:
+        return None
+    return solver_options
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(
         prog='ASP Solver',
@@ -42,12 +149,66 @@ if __name__ == "__main__":
     group = parser.add_mutually_exclusive_group(required=True)
     group.add_argument('-e', '--executionArn', type=str, help="AWS State Machine Execution ARN")
     group.add_argument('-f', '--workDir', type=str, help="Local working directory with input.json file")
+    group.add_argument('--tune', type=str, nargs='+',
+                       help="Race solver configurations over these .lp programs or input.json files")
+    group.add_argument('--batch', type=str, nargs='+',
+                       help="Solve these local working directories (or glob patterns) in parallel")
+    group.add_argument('--worker', action='store_true', help="Keep solving executions received from the queue")
+    group.add_argument('--enqueue', type=str, nargs='+', help="Add these AWS State Machine Executions to the queue")
+    group.add_argument('--validate', type=str, nargs='+',
+                       help="Check and score the output.json of these local working directories (or glob patterns)")
     parser.add_argument('-t', '--timeout', type=float, help="Clingo will timeout after these minutes have passed")
+
+    parser.add_argument('--configuration', type=str, choices=[c.value for c in Configuration],
+                        help="Clingo default configuration")
+    parser.add_argument('--optStrategy', type=str, choices=[o.value for o in OptimizationStrategy],
+                        help="Clingo optimization strategy (bb is model-guided, usc is core-guided)")
+    parser.add_argument('--heuristic', type=str, choices=[h.value for h in Heuristic],
+                        help="Clingo decision heuristic")
+    parser.add_argument('--restarts', type=str, choices=[r.value for r in RestartPolicy],
+                        help="Clingo restart policy")
+    parser.add_argument('--seed', type=int, help="Clingo random seed")
+    parser.add_argument('--threads', type=int, help="Clingo number of parallel search threads")
+    parser.add_argument('--stepwise', action='store_true',
+                        help="Optimize one priority level at a time, freezing each achieved bound")
+    parser.add_argument('--stagnation', type=int,
+                        help="Stop searching after these seconds without finding a better solution")
+    parser.add_argument('--gap', type=float,
+                        help="Stop searching once the relative gap to the proven lower bound is below this value")
+    parser.add_argument('--warmStart', action='store_true',
+                        help="Guide clingo towards a timetable built by the greedy solver first")
+    parser.add_argument('--multiResolution', action='store_true',
+                        help="Solve on a coarser slot grid first, and refine that timetable at full resolution")
+    parser.add_argument('--differenceLogic', action='store_true',
+                        help="Solve start times with difference constraints (clingo-dl) instead of per timeslot")
+    parser.add_argument('--diagnose', action='store_true',
+                        help="Look for an unsatisfiable core of conflicting constraints before solving")
+    parser.add_argument('--greedy', action='store_true',
+                        help="Build the timetable with the greedy solver only, without clingo")
+    parser.add_argument('--jobs', type=int,
+                        help="Concurrent batch jobs (by default as many as CPUs allow without oversubscribing "
+                             "threads) or worker executions (1 by default)")
+    parser.add_argument('--queue', type=str, default=os.environ.get("EXECUTION_QUEUE__PATH", "executions.sqlite3"),
+                        help="SQLite file backing the executions queue")
+    parser.add_argument('--drain', action='store_true', help="Stop the worker once the queue is empty")
     args = parser.parse_args()
+    if args.greedy and not (args.workDir or args.batch or args.worker):
+        parser.error("--greedy only applies to --workDir, --batch and --worker")
 
     if args.executionArn:
         aws_execution(args.executionArn)
     elif args.workDir:
-        local_execution(args.workDir, args.timeout)
+        local_execution(args.workDir, args.timeout, parse_solver_options(args), args.greedy)
+    elif args.tune:
+        tune_execution(args.tune, args.timeout)
+    elif args.batch:
+        batch_execution(args.batch, args.timeout, parse_solver_options(args), args.jobs, args.greedy)
+    elif args.worker:
+        worker_execution(args.queue, args.jobs, parse_solver_options(args), args.drain, args.greedy)
+    elif args.enqueue:
+        enqueue_executions(args.queue, args.enqueue)
+    elif args.validate:
+        if not validate_execution(args.validate):
+            sys.exit(1)
     else:
         raise NotImplementedError("Unknown Invocation")
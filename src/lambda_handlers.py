@@ -2,12 +2,16 @@ from aws_lambda_powertools import Logger, Metrics, Tracer
 from aws_lambda_powertools.utilities.typing import LambdaContext
 
 from business.scheduler import AspSolver
+from sdk.artifact_writer import get_artifact_writer
 from sdk.aws_s3 import get_input_object, save_output_object
 
 logger = Logger()
 metrics = Metrics()
 tracer = Tracer()
 
+# Seconds kept aside so the handler can still return after waiting for pending artifacts
+__FLUSH_MARGIN = 5
+
 
 @tracer.capture_lambda_handler
 @logger.inject_lambda_context
@@ -23,11 +27,18 @@ def event_handler(event: dict, context: LambdaContext):
     logger.info("Creating ASP Solver")
     solver = AspSolver(input_data.sessions, input_data.rooms, input_data.settings)
     solver.with_execution_uuid(execution_uuid)
-    logger.info("Invoking ASP Solver")
-    output = solver.solve()
-
-    logger.info("Storing OUTPUT")
-    object_key = save_output_object(execution_uuid, output)
+    try:
+        logger.info("Invoking ASP Solver")
+        output = solver.solve()
+
+        logger.info("Storing OUTPUT")
+        object_key = save_output_object(execution_uuid, output)
+    finally:
+        # Artifacts are also needed to diagnose failed executions
+        logger.info("Flushing ARTIFACTS")
+        flush_timeout = max(0., context.get_remaining_time_in_millis() / 1000 - __FLUSH_MARGIN)
+        if not get_artifact_writer().flush(flush_timeout):
+            logger.warning("Some artifacts could not be stored")
 
     return {
         "result": object_key
@@ -1,11 +1,20 @@
+import threading
 from abc import ABC, abstractmethod
 from pathlib import Path
-from typing import List, Optional
+from typing import TYPE_CHECKING, List, Optional
 
 from models.dto.output import Output
 from models.room import Room
 from models.session import Session
 from models.settings import Settings
+from models.solver_options import SolverOptions
+
+if TYPE_CHECKING:
+    from sdk.artifact_writer import ArtifactWriter
+
+
+class ExecutionCancelledError(RuntimeError):
+    pass
 
 
 class Solver(ABC):
@@ -16,6 +25,9 @@ class Solver(ABC):
         self._execution_uuid: Optional[str] = None
         self._local_dir: Optional[Path] = None
         self._timeout: Optional[int] = None
+        self._solver_options: Optional[SolverOptions] = None
+        self._artifact_writer: Optional["ArtifactWriter"] = None
+        self._cancelled: Optional[threading.Event] = None
 
     def with_execution_uuid(self, execution_uuid: str):
         self._execution_uuid = execution_uuid
@@ -26,6 +38,20 @@ class Solver(ABC):
     def with_timeout(self, timeout: int):
         self._timeout = timeout
 
+    def with_solver_options(self, solver_options: SolverOptions):
+        self._solver_options = solver_options
+
+    def with_artifact_writer(self, artifact_writer: "ArtifactWriter"):
+        self._artifact_writer = artifact_writer
+
+    def with_cancellation(self, cancelled: threading.Event):
+        # Once set, solving stops as soon as possible, without returning any timetable
+        self._cancelled = cancelled
+
+    def _check_cancelled(self):
+        if self._cancelled is not None and self._cancelled.is_set():
+            raise ExecutionCancelledError("Execution cancelled before finishing")
+
     def _find_session_by_hex(self, uuid_hex: str) -> Session:
         return next(session for session in self._sessions if session.id.hex == uuid_hex)
 
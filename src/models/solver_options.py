@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+from enum import Enum
+from typing import List, Optional
+
+from pydantic import BaseModel, Field
+
+
+class Configuration(str, Enum):
+    AUTO = "auto"
+    FRUMPY = "frumpy"
+    JUMPY = "jumpy"
+    TWEETY = "tweety"
+    HANDY = "handy"
+    CRAFTY = "crafty"
+    TRENDY = "trendy"
+
+
+class OptimizationStrategy(str, Enum):
+    # Model-guided
+    BB_LIN = "bb,lin"
+    BB_HIER = "bb,hier"
+    BB_INC = "bb,inc"
+    BB_DEC = "bb,dec"
+    # Core-guided
+    USC_OLL = "usc,oll"
+    USC_ONE = "usc,one"
+    USC_K = "usc,k"
+    USC_PMRES = "usc,pmres"
+
+    @property
+    def is_core_guided(self) -> bool:
+        return self.value.startswith("usc")
+
+
+class Heuristic(str, Enum):
+    BERKMIN = "Berkmin"
+    VMTF = "Vmtf"
+    VSIDS = "Vsids"
+    DOMAIN = "Domain"
+    UNIT = "Unit"
+
+
+class RestartPolicy(str, Enum):
+    NONE = "no"
+    FIXED = "F,16000"
+    LUBY = "L,100"
+    GEOMETRIC = "x,100,1.5"
+    DYNAMIC = "D,100,0.7"
+
+
+class SolverOptions(BaseModel):
+    class Config:
+        allow_population_by_field_name = True
+
+    configuration: Optional[Configuration] = None
+    optimization_strategy: Optional[OptimizationStrategy] = Field(alias="optimizationStrategy", default=None)
+    heuristic: Optional[Heuristic] = None
+    restart_policy: Optional[RestartPolicy] = Field(alias="restartPolicy", default=None)
+    seed: Optional[int] = None
+    threads: Optional[int] = None
+    # Optimize one priority level at a time, freezing each achieved bound before moving to the next one
+    stepwise: bool = False
+    # Stop searching once no better model has been found for these seconds
+    stagnation_timeout: Optional[int] = Field(alias="stagnationTimeout", default=None)
+    # Stop searching once the incumbent is within this relative gap of the proven lower bound
+    gap_threshold: Optional[float] = Field(alias="gapThreshold", default=None)
+    # Guide the search towards a timetable built by the greedy solver first
+    warm_start: bool = Field(alias="warmStart", default=False)
+    # Solve on a coarser slot grid first, and use that timetable as the initial assignment
+    multi_resolution: bool = Field(alias="multiResolution", default=False)
+    # Leave the exact session start times to difference constraints, instead of grounding every timeslot
+    difference_logic: bool = Field(alias="differenceLogic", default=False)
+    # Look for a minimal set of conflicting hard constraints before solving, and stop there if there is one
+    diagnose: bool = False
+
+    def has_stopping_criteria(self) -> bool:
+        return self.stagnation_timeout is not None or self.gap_threshold is not None
+
+    def to_clingo_options(self) -> List[str]:
+        options: List[str] = []
+        if self.configuration is not None:
+            options.append(f"--configuration={self.configuration.value}")
+        if self.optimization_strategy is not None:
+            options.append(f"--opt-strategy={self.optimization_strategy.value}")
+        if self.heuristic is not None:
+            options.append(f"--heuristic={self.heuristic.value}")
+        elif self.warm_start or self.multi_resolution:
+            # Initial assignment directives are only followed by the domain heuristic
+            options.append(f"--heuristic={Heuristic.DOMAIN.value}")
+        if self.restart_policy is not None:
+            options.append(f"--restarts={self.restart_policy.value}")
+        if self.seed is not None:
+            options.append(f"--seed={self.seed}")
+        if self.threads is not None and self.threads > 1:
+            options.append(f"--parallel-mode={self.threads}")
+        return options
+
+    def __str__(self):
+        description = " ".join(self.to_clingo_options()) or "(clingo defaults)"
+        if self.stepwise:
+            description += " (stepwise)"
+        if self.stagnation_timeout is not None:
+            description += f" (stop after {self.stagnation_timeout}s without improvement)"
+        if self.gap_threshold is not None:
+            description += f" (stop within {self.gap_threshold:.2%} gap)"
+        if self.warm_start:
+            description += " (warm start)"
+        if self.multi_resolution:
+            description += " (multi-resolution)"
+        if self.difference_logic:
+            description += " (difference logic)"
+        if self.diagnose:
+            description += " (diagnose)"
+        return description
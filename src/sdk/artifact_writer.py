@@ -0,0 +1,64 @@
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Callable, List, Optional
+
+__UPLOAD_THREADS = int(os.environ.get("ARTIFACTS__UPLOAD_THREADS", "4"))
+
+
+class ArtifactWriter:
+    def __init__(self, executor: ThreadPoolExecutor):
+        # The executor may be shared with other writers; each one only keeps track of its own artifacts
+        self.__executor = executor
+        self.__pending: List[Future] = []
+        self.__lock = threading.Lock()
+
+    def submit(self, save: Callable[..., object], *args) -> Future:
+        # Saving happens in background, so callers only pay for queueing the artifact
+        future = self.__executor.submit(save, *args)
+        with self.__lock:
+            self.__pending.append(future)
+        return future
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        with self.__lock:
+            pending, self.__pending = self.__pending, []
+
+        done, not_done = wait(pending, timeout=timeout)
+
+        failed = [future for future in done if future.exception() is not None]
+        for future in failed:
+            print(f"Could not store artifact: {future.exception()!r}")
+        if not_done:
+            print(f"Gave up waiting for {len(not_done)} artifacts after {timeout}s")
+            with self.__lock:
+                self.__pending.extend(not_done)
+
+        return not failed and not not_done
+
+
+__upload_executor: Optional[ThreadPoolExecutor] = None
+__artifact_writer: Optional[ArtifactWriter] = None
+__artifact_writer_lock = threading.Lock()
+
+
+def __get_upload_executor() -> ThreadPoolExecutor:
+    global __upload_executor
+    with __artifact_writer_lock:
+        if __upload_executor is None:
+            __upload_executor = ThreadPoolExecutor(max_workers=__UPLOAD_THREADS, thread_name_prefix="artifact-writer")
+        return __upload_executor
+
+
+def get_artifact_writer() -> ArtifactWriter:
+    global __artifact_writer
+    executor = __get_upload_executor()
+    with __artifact_writer_lock:
+        if __artifact_writer is None:
+            __artifact_writer = ArtifactWriter(executor)
+        return __artifact_writer
+
+
+def create_artifact_writer() -> ArtifactWriter:
+    # For executions running next to others in the same process, which must only wait for their own artifacts
+    return ArtifactWriter(__get_upload_executor())
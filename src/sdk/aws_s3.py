@@ -1,26 +1,43 @@
 import json
 import os
-
-import boto3
-from mypy_boto3_s3.client import S3Client
+import threading
+from typing import TYPE_CHECKING, Optional
 
 from models.dto.input import SolverInput
 from models.dto.output import Output
+from sdk.compression import compress_text, decompress_bytes, get_artifacts_compression
+from sdk.output_json import encode_output_json
+
+if TYPE_CHECKING:
+    from mypy_boto3_s3.client import S3Client
 
 __SOLVERS_BUCKET = os.environ.get('S3__SOLVERS_FILES__BUCKET_NAME')
 
-s3: S3Client = boto3.client('s3')
+__s3_client: Optional["S3Client"] = None
+__s3_client_lock = threading.Lock()
+
+
+def get_s3_client() -> "S3Client":
+    # Created on first use, so importing this module (e.g. for local runs) does not pay for boto3
+    global __s3_client
+    with __s3_client_lock:
+        if __s3_client is None:
+            import boto3
+            # Custom endpoint allows pointing to a local S3 stand-in
+            __s3_client = boto3.client('s3', endpoint_url=os.environ.get('S3__ENDPOINT_URL'))
+        return __s3_client
 
 
 def get_input_object(execution_uuid: str) -> SolverInput:
     object_key = f"{execution_uuid}/input.json"
     print(f"Fetching object {object_key} from bucket {__SOLVERS_BUCKET}")
 
-    content_object = s3.get_object(
+    content_object = get_s3_client().get_object(
         Bucket=__SOLVERS_BUCKET,
         Key=object_key
     )
-    file_content = content_object["Body"].read().decode(encoding="utf-8")
+    file_content = decompress_bytes(content_object["Body"].read(), content_object.get("ContentEncoding"))
+    file_content = file_content.decode(encoding="utf-8")
     json_content = json.loads(file_content)
 
     return SolverInput(**json_content)
@@ -30,11 +47,8 @@ def save_output_object(execution_uuid: str, output: Output) -> str:
     object_key = f"{execution_uuid}/output.json"
     print(f"Storing object {object_key} in bucket {__SOLVERS_BUCKET}")
 
-    s3.put_object(
-        Body=output.json(by_alias=True, exclude_none=True),
-        Bucket=__SOLVERS_BUCKET,
-        Key=object_key
-    )
+    with encode_output_json(output) as body:
+        get_s3_client().upload_fileobj(body, __SOLVERS_BUCKET, object_key)
 
     return object_key
 
@@ -43,10 +57,20 @@ def save_txt_file(execution_uuid: str, file_name: str, content: str) -> str:
     object_key = f"{execution_uuid}/{file_name}.txt"
     print(f"Storing object {object_key} in bucket {__SOLVERS_BUCKET}")
 
-    s3.put_object(
-        Body=content,
-        Bucket=__SOLVERS_BUCKET,
-        Key=object_key
-    )
+    compression = get_artifacts_compression(content)
+    if compression is None:
+        get_s3_client().put_object(
+            Body=content,
+            Bucket=__SOLVERS_BUCKET,
+            Key=object_key
+        )
+        return object_key
+
+    # Same key, so HTTP clients honouring the Content-Encoding keep reading it transparently
+    with compress_text(content, compression) as body:
+        get_s3_client().upload_fileobj(body, __SOLVERS_BUCKET, object_key, ExtraArgs={
+            "ContentEncoding": compression.value,
+            "ContentType": "text/plain; charset=utf-8",
+        })
 
     return object_key
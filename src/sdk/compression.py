@@ -0,0 +1,59 @@
+import gzip
+import os
+import tempfile
+from enum import Enum
+from pathlib import Path
+from typing import IO, Optional
+
+__CHUNK_SIZE = 1024 * 1024
+# Compressed artifacts are kept in memory up to this size, and spilled to disk past it
+__SPOOL_SIZE = 16 * 1024 * 1024
+# Headers outweigh any savings on tiny artifacts, like the status one
+__MIN_COMPRESSION_SIZE = 1024
+
+
+class Compression(str, Enum):
+    GZIP = "gzip"
+
+
+def get_artifacts_compression(content: str) -> Optional[Compression]:
+    compression = os.environ.get("ARTIFACTS__COMPRESSION")
+    if not compression or len(content) < __MIN_COMPRESSION_SIZE:
+        return None
+    return Compression(compression)
+
+
+def get_compressed_file_name(file_name: str, compression: Compression) -> str:
+    if compression == Compression.GZIP:
+        return f"{file_name}.gz"
+    raise NotImplementedError(f"Unknown compression {compression}")
+
+
+def write_compressed_text(f: IO[bytes], content: str, compression: Compression) -> None:
+    if compression != Compression.GZIP:
+        raise NotImplementedError(f"Unknown compression {compression}")
+
+    # Encoding in chunks avoids holding a second, encoded copy of the whole content
+    with gzip.GzipFile(fileobj=f, mode='wb', compresslevel=6, mtime=0) as gz:
+        for i in range(0, len(content), __CHUNK_SIZE):
+            gz.write(content[i:i + __CHUNK_SIZE].encode(encoding="utf-8"))
+
+
+def compress_text(content: str, compression: Compression) -> IO[bytes]:
+    compressed = tempfile.SpooledTemporaryFile(max_size=__SPOOL_SIZE)
+    write_compressed_text(compressed, content, compression)
+    compressed.seek(0)
+    return compressed
+
+
+def save_compressed_text(path: Path, content: str, compression: Compression) -> None:
+    with open(path, 'wb') as f:
+        write_compressed_text(f, content, compression)
+
+
+def decompress_bytes(data: bytes, content_encoding: Optional[str]) -> bytes:
+    if not content_encoding:
+        return data
+    if content_encoding == Compression.GZIP.value:
+        return gzip.decompress(data)
+    raise NotImplementedError(f"Unknown content encoding {content_encoding}")
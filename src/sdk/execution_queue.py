@@ -0,0 +1,134 @@
+import sqlite3
+import time
+from abc import ABC, abstractmethod
+from contextlib import closing
+from pathlib import Path
+from typing import List, Optional
+
+
+class QueueMessage:
+    def __init__(self, receipt: str, execution_id: str, attempts: int):
+        self.receipt = receipt
+        self.execution_id = execution_id
+        self.attempts = attempts
+
+    def __repr__(self):
+        return f"QueueMessage({self.execution_id}, attempt {self.attempts})"
+
+
+class ExecutionQueue(ABC):
+    # Modelled after SQS: received messages are leased, and come back to the queue if their lease expires
+
+    @abstractmethod
+    def send(self, execution_id: str) -> None:
+        raise NotImplementedError()
+
+    @abstractmethod
+    def receive(self, max_messages: int) -> List[QueueMessage]:
+        raise NotImplementedError()
+
+    @abstractmethod
+    def count_pending(self) -> int:
+        # Including the messages which cannot be received yet, e.g. failed ones waiting to be retried
+        raise NotImplementedError()
+
+    @abstractmethod
+    def heartbeat(self, message: QueueMessage) -> None:
+        raise NotImplementedError()
+
+    @abstractmethod
+    def complete(self, message: QueueMessage) -> None:
+        raise NotImplementedError()
+
+    @abstractmethod
+    def fail(self, message: QueueMessage, error: str) -> None:
+        raise NotImplementedError()
+
+    @abstractmethod
+    def release(self, message: QueueMessage) -> None:
+        raise NotImplementedError()
+
+
+class SqliteExecutionQueue(ExecutionQueue):
+    def __init__(self, path: Path, lease_time: int = 5 * 60, max_attempts: int = 3, retry_delay: int = 30):
+        self.__path = path
+        self.__lease_time = lease_time
+        self.__max_attempts = max_attempts
+        self.__retry_delay = retry_delay
+
+        with closing(self.__connect()) as connection:
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS executions (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    execution_id TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    -- Lease expiration while running; earliest retry time while pending
+                    leased_until REAL,
+                    error TEXT,
+                    updated_at REAL NOT NULL
+                )
+            """)
+
+    def __connect(self) -> sqlite3.Connection:
+        # One connection per operation, as connections cannot be shared across the worker threads;
+        # autocommit mode, so every multi-statement operation opens its own transaction
+        return sqlite3.connect(self.__path, timeout=30, isolation_level=None)
+
+    def send(self, execution_id: str) -> None:
+        with closing(self.__connect()) as connection:
+            connection.execute("INSERT INTO executions (execution_id, status, updated_at) VALUES (?, 'PENDING', ?)",
+                               (execution_id, time.time(),))
+
+    def receive(self, max_messages: int) -> List[QueueMessage]:
+        now = time.time()
+        with closing(self.__connect()) as connection:
+            # Write lock straight away, so concurrent workers never lease the same message
+            connection.execute("BEGIN IMMEDIATE")
+            rows = connection.execute("""
+                SELECT id, execution_id, attempts FROM executions
+                WHERE (status = 'PENDING' AND (leased_until IS NULL OR leased_until <= ?))
+                    OR (status = 'RUNNING' AND leased_until < ?)
+                ORDER BY id LIMIT ?
+            """, (now, now, max_messages,)).fetchall()
+            for row_id, _, _ in rows:
+                connection.execute("""
+                    UPDATE executions SET status = 'RUNNING', attempts = attempts + 1, leased_until = ?, updated_at = ?
+                    WHERE id = ?
+                """, (now + self.__lease_time, now, row_id,))
+            connection.execute("COMMIT")
+        return [QueueMessage(str(row_id), execution_id, attempts + 1) for row_id, execution_id, attempts in rows]
+
+    def count_pending(self) -> int:
+        with closing(self.__connect()) as connection:
+            return connection.execute("SELECT COUNT(*) FROM executions WHERE status = 'PENDING'").fetchone()[0]
+
+    def __update(self, message: QueueMessage, status: str, leased_until: Optional[float] = None,
+                 error: Optional[str] = None) -> None:
+        with closing(self.__connect()) as connection:
+            connection.execute("""
+                UPDATE executions SET status = ?, leased_until = ?, error = ?, updated_at = ?
+                WHERE id = ? AND status = 'RUNNING'
+            """, (status, leased_until, error, time.time(), int(message.receipt),))
+
+    def heartbeat(self, message: QueueMessage) -> None:
+        self.__update(message, "RUNNING", leased_until=time.time() + self.__lease_time)
+
+    def complete(self, message: QueueMessage) -> None:
+        self.__update(message, "DONE")
+
+    def fail(self, message: QueueMessage, error: str) -> None:
+        # Retried by any worker, with an increasing delay, until running out of attempts
+        if message.attempts >= self.__max_attempts:
+            self.__update(message, "FAILED", error=error)
+        else:
+            self.__update(message, "PENDING", leased_until=time.time() + self.__retry_delay * message.attempts,
+                          error=error)
+
+    def release(self, message: QueueMessage) -> None:
+        # Handed back without consuming an attempt, e.g. when a worker shuts down
+        with closing(self.__connect()) as connection:
+            connection.execute("""
+                UPDATE executions SET status = 'PENDING', attempts = attempts - 1, leased_until = NULL, updated_at = ?
+                WHERE id = ? AND status = 'RUNNING'
+            """, (time.time(), int(message.receipt),))
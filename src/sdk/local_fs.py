@@ -1,16 +1,13 @@
+import gzip
 import json
-import os
 from pathlib import Path
-
-import boto3
-from mypy_boto3_s3.client import S3Client
+from typing import Optional
 
 from models.dto.input import SolverInput
 from models.dto.output import Output
-
-__SOLVERS_BUCKET = os.environ.get('S3__SOLVERS_FILES__BUCKET_NAME')
-
-s3: S3Client = boto3.client('s3')
+from sdk.compression import Compression, get_artifacts_compression, get_compressed_file_name, \
+    save_compressed_text
+from sdk.output_json import write_output_json
 
 
 def get_local_input_object(working_directory_path: Path) -> SolverInput:
@@ -20,11 +17,43 @@ def get_local_input_object(working_directory_path: Path) -> SolverInput:
     return SolverInput.parse_obj(data)
 
 
+def get_local_output_object(working_directory_path: Path) -> Output:
+    with open(working_directory_path / 'output.json') as f:
+        data = json.loads(f.read())
+
+    return Output.parse_obj(data)
+
+
 def save_local_output_object(working_directory_path: Path, output: Output) -> None:
     with open(working_directory_path / 'output.json', 'w') as f:
-        f.write(output.json(by_alias=True, exclude_none=True) + "\n")
+        write_output_json(f, output)
+        f.write("\n")
 
 
 def save_local_txt_file(working_directory_path: Path, file_name: str, content: str) -> None:
-    with open(working_directory_path / f"{file_name}.txt", 'w') as f:
-        f.write(content)
+    compression = get_artifacts_compression(content)
+    if compression is None:
+        with open(working_directory_path / f"{file_name}.txt", 'w') as f:
+            f.write(content)
+        return
+
+    save_compressed_text(working_directory_path / get_compressed_file_name(f"{file_name}.txt", compression),
+                         content, compression)
+
+
+def read_local_txt_file(working_directory_path: Path, file_name: str,
+                        modified_after: Optional[float] = None) -> Optional[str]:
+    # Artifacts may have been stored compressed; the most recent one wins if both are present
+    candidates = [path for path in (
+        working_directory_path / f"{file_name}.txt",
+        working_directory_path / get_compressed_file_name(f"{file_name}.txt", Compression.GZIP),
+    ) if path.exists() and (modified_after is None or path.stat().st_mtime >= modified_after)]
+    if not candidates:
+        return None
+
+    path = max(candidates, key=lambda p: p.stat().st_mtime)
+    if path.suffix == ".gz":
+        with gzip.open(path, 'rt', encoding="utf-8") as f:
+            return f.read()
+    with open(path) as f:
+        return f.read()
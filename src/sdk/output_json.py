@@ -0,0 +1,71 @@
+import json
+import tempfile
+from typing import IO, Dict, Iterator
+
+from pydantic import BaseModel
+
+from models.dto.output import Output
+from models.schedule import ScheduleUnit
+
+# Encoded output is kept in memory up to this size, and spilled to disk past it
+__SPOOL_SIZE = 16 * 1024 * 1024
+# Units are written in batches, instead of one write call per timeslot
+__UNITS_PER_CHUNK = 1000
+
+
+def __get_field_key(model: type, field_name: str) -> str:
+    return json.dumps(model.__fields__[field_name].alias)
+
+
+# Same keys, order and separators as pydantic, which only changes per model field definitions
+__TIMETABLE_START = f"{{{__get_field_key(Output, 'timetable')}: ["
+__TIMETABLE_END = "]}"
+__UNIT_FORMAT = "{{" + ", ".join(f"{__get_field_key(ScheduleUnit, field_name)}: {{{field_name}}}"
+                                for field_name in ScheduleUnit.__fields__) + "}}"
+
+
+def __encode_model(model: BaseModel, encoded_models: Dict[int, str]) -> str:
+    # Every session and room is repeated in each of its timeslots, but the same model object is only encoded once
+    encoded = encoded_models.get(id(model))
+    if encoded is None:
+        encoded = model.json(by_alias=True, exclude_none=True)
+        encoded_models[id(model)] = encoded
+    return encoded
+
+
+def iter_output_json(output: Output) -> Iterator[str]:
+    # Byte-identical to output.json(by_alias=True, exclude_none=True), without building the whole dict first
+    encoded_models: Dict[int, str] = {}
+    encoded_slots: Dict[tuple, str] = {}
+    timetable = output.timetable
+
+    yield __TIMETABLE_START
+    for i in range(0, len(timetable), __UNITS_PER_CHUNK):
+        units = []
+        for unit in timetable[i:i + __UNITS_PER_CHUNK]:
+            # Slots are rebuilt for every unit, so they are told apart by value instead
+            slot_key = (unit.slot.week_day, unit.slot.timeframe.start, unit.slot.timeframe.end, unit.slot.slot_type)
+            slot = encoded_slots.get(slot_key)
+            if slot is None:
+                slot = unit.slot.json(by_alias=True, exclude_none=True)
+                encoded_slots[slot_key] = slot
+            units.append(__UNIT_FORMAT.format(
+                slot=slot,
+                session=__encode_model(unit.session, encoded_models),
+                room=__encode_model(unit.room, encoded_models),
+            ))
+        yield (", " if i else "") + ", ".join(units)
+    yield __TIMETABLE_END
+
+
+def write_output_json(f: IO[str], output: Output) -> None:
+    for chunk in iter_output_json(output):
+        f.write(chunk)
+
+
+def encode_output_json(output: Output) -> IO[bytes]:
+    encoded = tempfile.SpooledTemporaryFile(max_size=__SPOOL_SIZE)
+    for chunk in iter_output_json(output):
+        encoded.write(chunk.encode(encoding="utf-8"))
+    encoded.seek(0)
+    return encoded
@@ -0,0 +1,36 @@
+from collections import defaultdict
+from typing import Dict, Iterable, List, Set, Tuple
+
+
+def find_clique_cover(pairs: Iterable[Tuple[str, str]]) -> List[List[str]]:
+    # Greedy cover of every edge of the graph by cliques; the densest part of the graph is always grown first,
+    # so whole cohorts of mutually related nodes end up in a single clique
+    adjacency: Dict[str, Set[str]] = defaultdict(set)
+    for a, b in pairs:
+        if a != b:
+            adjacency[a].add(b)
+            adjacency[b].add(a)
+    uncovered: Dict[str, Set[str]] = {node: set(neighbours) for node, neighbours in adjacency.items()}
+
+    cliques: List[List[str]] = []
+    while True:
+        seed = min((node for node, neighbours in uncovered.items() if neighbours),
+                   key=lambda node: (-len(uncovered[node]), node), default=None)
+        if seed is None:
+            return cliques
+
+        clique = {seed}
+        candidates = set(adjacency[seed])
+        while candidates:
+            best = min(candidates, key=lambda node: (
+                -len(uncovered[node] & clique), -len(uncovered[node] & candidates), node,
+            ))
+            if not uncovered[best] & clique:
+                # Growing any further would not cover any new edge
+                break
+            clique.add(best)
+            candidates &= adjacency[best]
+
+        for node in clique:
+            uncovered[node] -= clique
+        cliques.append(sorted(clique))
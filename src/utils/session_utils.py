@@ -0,0 +1,58 @@
+from datetime import timedelta
+from typing import Dict, List, Set, Tuple
+
+from pydantic import UUID4
+
+from adapter.time.week import Week
+from models.room import Room
+from models.session import Session
+from models.slot import SlotType
+from utils.slot_utils import generate_slot_groups
+
+
+def get_session_slots_count(session: Session, week: Week) -> int:
+    return week.get_slots_count_for_timedelta(session.constraints.duration)
+
+
+def get_eligible_timeslot_ranges(session: Session, week: Week) -> List[Tuple[int, int]]:
+    blocked_slots = set(week.get_slot_ids_per_type(SlotType.BLOCKED))
+    session_eligible_slots = {i for i in range(1, week.get_total_slot_count() + 1) if i not in blocked_slots}
+    day_breaks = [first for first, _ in week.get_day_breaks()]
+    session_slots = get_session_slots_count(session, week)
+
+    for disallowed_slots in session.constraints.timeslots_preferences.disallowed_slots:
+        session_eligible_slots.difference_update(week.get_sub_slot_ids(disallowed_slots))
+
+    return [(a, b - session_slots + 1,)
+            for a, b
+            in generate_slot_groups(list(session_eligible_slots), day_breaks)
+            if (abs(a - b) + 1) >= session_slots]
+
+
+def get_eligible_timeslots(session: Session, week: Week) -> Set[int]:
+    return {t for a, b in get_eligible_timeslot_ranges(session, week) for t in range(a, b + 1)}
+
+
+def is_room_eligible_for_session(session: Session, room: Room) -> bool:
+    if session.constraints.session_type not in room.constraints.session_types:
+        return False
+    return room.id not in session.constraints.rooms_preferences.disallowed_rooms
+
+
+def get_eligible_rooms(session: Session, rooms: List[Room]) -> List[Room]:
+    return [room for room in rooms if is_room_eligible_for_session(session, room)]
+
+
+def get_room_distances_in_timeslots(rooms: List[Room], week: Week) -> Dict[Tuple[UUID4, UUID4], int]:
+    # Both directions are stored, and the longest one wins if they were defined differently
+    room_ids = {room.id for room in rooms}
+    distances: Dict[Tuple[UUID4, UUID4], int] = {}
+    for room in rooms:
+        for other_room_uuid, distance in room.constraints.distances_in_minutes.items():
+            other_room_id = UUID4(other_room_uuid)
+            if distance <= 0 or other_room_id not in room_ids:
+                continue
+            timeslots = week.get_slots_count_for_timedelta_ceil(timedelta(minutes=distance))
+            for pair in ((room.id, other_room_id,), (other_room_id, room.id,)):
+                distances[pair] = max(distances.get(pair, 0), timeslots)
+    return distances
@@ -1,22 +1,11 @@
-from datetime import timedelta
 from typing import List, Optional, Tuple
 
-from models.slot import Slot
-from models.timeframe import Timeframe
-from utils.time_utils import add_time
+from adapter.time.minute_slot import MinuteSlot
 
 
-def generate_sub_slots(full_slot: Slot, slot_duration: timedelta) -> List[Slot]:
-    timeframe = Timeframe(start=full_slot.timeframe.start, end=add_time(full_slot.timeframe.start, slot_duration))
-    slots: List[Slot] = []
-    while timeframe.end <= full_slot.timeframe.end:
-        slots.append(Slot(
-            week_day=full_slot.week_day,
-            timeframe=timeframe,
-            slot_type=full_slot.slot_type,
-        ))
-        timeframe = Timeframe(start=timeframe.end, end=add_time(timeframe.end, slot_duration))
-    return slots
+def generate_sub_slots(full_slot: MinuteSlot, slot_minutes: int) -> List[MinuteSlot]:
+    return [MinuteSlot(full_slot.week_day, start, start + slot_minutes, full_slot.slot_type)
+            for start in range(full_slot.start, full_slot.end - slot_minutes + 1, slot_minutes)]
 
 
 def generate_slot_groups(nums: List[int], manual_breaks: Optional[List[int]] = None) -> List[Tuple[int, int]]:
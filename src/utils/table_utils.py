@@ -0,0 +1,7 @@
+from typing import List
+
+
+def print_table(rows: List[List[str]]):
+    widths = [max(len(str(row[i])) for row in rows) for i in range(len(rows[0]))]
+    for row in rows:
+        print(" | ".join(str(value).ljust(width) for value, width in zip(row, widths)))
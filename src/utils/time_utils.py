@@ -1,9 +1,18 @@
-from datetime import date, datetime, time, timedelta
+from datetime import time, timedelta
 
 
-def add_time(time_obj: time, timedelta_obj: timedelta) -> time:
-    return (time_to_datetime(time_obj) + timedelta_obj).time()
+def time_to_minutes(time_obj: time) -> int:
+    return time_obj.hour * 60 + time_obj.minute
 
 
-def time_to_datetime(time_obj: time) -> datetime:
-    return datetime.combine(date(1, 1, 1), time_obj)
+def timedelta_to_minutes(timedelta_obj: timedelta) -> int:
+    return timedelta_obj // timedelta(minutes=1)
+
+
+def minutes_to_time(minutes: int) -> time:
+    return time(minutes // 60, minutes % 60)
+
+
+def format_minutes(minutes: int) -> str:
+    # Same as str() of the equivalent time, without building it
+    return f"{minutes // 60:02d}:{minutes % 60:02d}:00"
@@ -0,0 +1,48 @@
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterator, NamedTuple, Tuple
+
+
+class StandInRequest(NamedTuple):
+    method: str
+    path: str
+    headers: Dict[str, str]
+    body: bytes
+
+
+# Status code, headers and body of the response
+StandInResponse = Tuple[int, Dict[str, str], bytes]
+
+
+@contextmanager
+def serve(respond: Callable[[StandInRequest], StandInResponse]) -> Iterator[str]:
+    # Local server answering every request with whatever respond returns, yielding its base URL
+    class Handler(BaseHTTPRequestHandler):
+        def __handle(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            status, headers, content = respond(StandInRequest(self.command, self.path, dict(self.headers), body))
+            self.send_response(status)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header("Content-Length", str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+
+        def do_GET(self):
+            self.__handle()
+
+        def do_POST(self):
+            self.__handle()
+
+        def log_message(self, *_):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,135 @@
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import pytest
+
+import injector
+from injector import STAGES, BulkInjector, InjectionRequest, InjectionResult, InjectionState
+from tests.http_stand_in import StandInRequest, serve
+
+
+class StandInApi:
+    # Answers every path with the given status codes in turn, and 200 once they are used up
+    def __init__(self, responses: Dict[str, List[int]], delay: float = 0.):
+        self.responses = responses
+        self.delay = delay
+        self.posted: List[str] = []
+
+    def __call__(self, request: StandInRequest):
+        path = request.path[1:]
+        self.posted.append(path)
+        time.sleep(self.delay)
+        status_codes = self.responses.get(path, [])
+        return (status_codes.pop(0) if status_codes else 200), {}, b"{}"
+
+
+@pytest.fixture
+def state_file(tmp_path) -> Path:
+    return tmp_path / "state.txt"
+
+
+def run_stage(monkeypatch, api: StandInApi, state_file: Path, requests_to_inject: List[InjectionRequest],
+              retries: int = 2) -> BulkInjector:
+    bulk_injector = BulkInjector(InjectionState(state_file), 2, retries, 0.)
+    with serve(api) as base_url:
+        monkeypatch.setattr(injector, "API_URL", base_url)
+        bulk_injector.run_stage("test", requests_to_inject)
+    return bulk_injector
+
+
+def test_retries_idempotent_requests(monkeypatch, state_file):
+    api = StandInApi({"course/set-status": [502, 500]})
+    bulk_injector = run_stage(monkeypatch, api, state_file, [InjectionRequest("status", "course/set-status", {})])
+
+    assert api.posted == ["course/set-status"] * 3
+    assert bulk_injector.summary["test"][InjectionResult.DONE] == 1
+    assert InjectionState(state_file).completed == {"status"}
+
+
+def test_gives_up_after_the_last_retry(monkeypatch, state_file):
+    api = StandInApi({"course/set-status": [503, 503, 503]})
+    bulk_injector = run_stage(monkeypatch, api, state_file, [InjectionRequest("status", "course/set-status", {})])
+
+    assert len(api.posted) == 3
+    assert bulk_injector.failures == [("status", "HTTP 503: {} after 3 attempts")]
+    assert InjectionState(state_file).completed == set()
+
+
+def test_does_not_retry_non_idempotent_requests_which_may_have_been_applied(monkeypatch, state_file):
+    api = StandInApi({"course/create-session-group/A": [502], "course/create-session-group/B": [500]})
+    bulk_injector = run_stage(monkeypatch, api, state_file, [
+        InjectionRequest("group-a", "course/create-session-group/A", {}, idempotent=False),
+        InjectionRequest("group-b", "course/create-session-group/B", {}, idempotent=False),
+    ])
+
+    assert sorted(api.posted) == ["course/create-session-group/A", "course/create-session-group/B"]
+    assert bulk_injector.summary["test"][InjectionResult.FAILED] == 2
+    assert all("may have been applied" in error for _, error in bulk_injector.failures)
+
+
+def test_does_not_retry_non_idempotent_requests_after_a_read_timeout(monkeypatch, state_file):
+    monkeypatch.setattr(injector, "REQUEST_TIMEOUT", 0.2)
+    api = StandInApi({}, delay=0.5)
+    bulk_injector = run_stage(monkeypatch, api, state_file, [
+        InjectionRequest("group", "course/create-session-group/A", {}, idempotent=False),
+    ])
+
+    assert api.posted == ["course/create-session-group/A"]
+    assert "may have been applied" in bulk_injector.failures[0][1]
+
+
+def test_retries_non_idempotent_requests_which_were_not_processed(monkeypatch, state_file):
+    api = StandInApi({"course/create-session-group/A": [429, 503]})
+    bulk_injector = run_stage(monkeypatch, api, state_file, [
+        InjectionRequest("group", "course/create-session-group/A", {}, idempotent=False),
+    ])
+
+    assert len(api.posted) == 3
+    assert bulk_injector.summary["test"][InjectionResult.DONE] == 1
+
+
+def test_conflict_counts_as_already_done(monkeypatch, state_file):
+    api = StandInApi({"course/create/etse": [409]})
+    bulk_injector = run_stage(monkeypatch, api, state_file, [InjectionRequest("course", "course/create/etse", {})])
+
+    assert bulk_injector.summary["test"][InjectionResult.ALREADY_DONE] == 1
+    assert not bulk_injector.failures
+    assert InjectionState(state_file).completed == {"course"}
+
+
+def test_blocks_requests_whose_dependencies_never_completed(monkeypatch, state_file):
+    InjectionState(state_file).complete("courses:A")
+    api = StandInApi({})
+    bulk_injector = run_stage(monkeypatch, api, state_file, [
+        InjectionRequest("editions:A", "course/create-edition/A", {}, ("courses:A",)),
+        InjectionRequest("editions:B", "course/create-edition/B", {}, ("courses:B",)),
+    ])
+
+    assert api.posted == ["course/create-edition/A"]
+    assert bulk_injector.summary["test"][InjectionResult.BLOCKED] == 1
+    assert bulk_injector.failures == [("editions:B", "blocked by courses:B, not completed")]
+
+
+def test_resumes_from_the_state_file(monkeypatch, state_file):
+    requests_to_inject = [InjectionRequest(f"course:{code}", f"course/create/{code}", {}) for code in "ABC"]
+    api = StandInApi({"course/create/B": [400]})
+    run_stage(monkeypatch, api, state_file, requests_to_inject)
+
+    api = StandInApi({})
+    bulk_injector = run_stage(monkeypatch, api, state_file, requests_to_inject)
+
+    assert api.posted == ["course/create/B"]
+    assert bulk_injector.summary["test"]["resumed"] == 2
+    assert InjectionState(state_file).completed == {"course:A", "course:B", "course:C"}
+
+
+def test_stages_only_depend_on_earlier_stages(monkeypatch):
+    monkeypatch.chdir(Path(__file__).parent.parent)
+    keys = set()
+    for build_requests in STAGES.values():
+        requests_to_inject = build_requests()
+        assert all(key in keys for request in requests_to_inject for key in request.depends_on)
+        stage_keys = {request.key for request in requests_to_inject}
+        assert len(stage_keys) == len(requests_to_inject)
+        keys.update(stage_keys)
@@ -0,0 +1,87 @@
+import gzip
+from email import policy
+from email.parser import BytesParser
+from typing import Dict, List
+
+import pytest
+
+import manual_execution
+from manual_execution import download_file, upload_s3_file
+from tests.http_stand_in import StandInRequest, serve
+
+
+class StandInBucket:
+    # Answers with the given status codes in turn, and with the success one once they are used up
+    def __init__(self, status_codes: List[int], success: int, content: bytes = b""):
+        self.status_codes = status_codes
+        self.success = success
+        self.content = content
+        self.requests: List[StandInRequest] = []
+
+    def __call__(self, request: StandInRequest):
+        self.requests.append(request)
+        status = self.status_codes.pop(0) if self.status_codes else self.success
+        return status, {}, self.content if status == 200 else b""
+
+
+def parse_form(request: StandInRequest) -> Dict[str, bytes]:
+    message = BytesParser(policy=policy.default).parsebytes(
+        f"Content-Type: {request.headers['Content-Type']}\r\n\r\n".encode() + request.body)
+    return {part.get_param("name", header="content-disposition"): part.get_payload(decode=True)
+            for part in message.iter_parts()}
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(manual_execution, "__TRANSFER_BACKOFF", 0.)
+
+
+def test_upload_is_sent_again_after_a_retryable_error(tmp_path):
+    content = "".join(f"penalty\t\t{i}\t1\t2\n" for i in range(100000)).encode()
+    file = tmp_path / "asp_optimization.txt.gz"
+    with gzip.open(file, 'wb') as f:
+        f.write(content)
+
+    bucket = StandInBucket([503], 204)
+    with serve(bucket) as url:
+        upload_s3_file(file, url, {"key": "executions/asp_optimization.txt", "policy": "abc"})
+
+    assert len(bucket.requests) == 2
+    for request in bucket.requests:
+        assert int(request.headers["Content-Length"]) == len(request.body)
+        assert parse_form(request) == {
+            "key": b"executions/asp_optimization.txt",
+            "policy": b"abc",
+            "file": content,
+        }
+
+
+def test_upload_fails_on_rejected_files(tmp_path):
+    file = tmp_path / "asp_status.txt"
+    file.write_text("SATISFIABLE\n")
+
+    with serve(StandInBucket([], 403)) as url, pytest.raises(RuntimeError):
+        upload_s3_file(file, url, {})
+
+
+def test_download_replaces_the_file_once_complete(tmp_path):
+    path = tmp_path / "input.json"
+    path.write_text("old")
+
+    bucket = StandInBucket([503], 200, b'{"sessions": []}')
+    with serve(bucket) as url:
+        download_file(url, path)
+
+    assert len(bucket.requests) == 2
+    assert path.read_bytes() == b'{"sessions": []}'
+    assert not path.with_name("input.json.part").exists()
+
+
+def test_failed_download_keeps_the_previous_file(tmp_path):
+    path = tmp_path / "input.json"
+    path.write_text("old")
+
+    with serve(StandInBucket([], 404)) as url, pytest.raises(RuntimeError):
+        download_file(url, path)
+
+    assert path.read_text() == "old"
@@ -0,0 +1,65 @@
+import json
+import random
+
+from http_utils import create_session
+from scrapper import RateLimiter, ResponseCache, build_scrape_content, decode_page, fetch_page, \
+    get_schedule_content, merge_page_content, parse_content, parse_page
+from tests.http_stand_in import serve
+
+SESSION_TYPES = ["CLE", "CLIS", "EPD", "CLE_inglés"]
+
+
+def generate_page(seed: int) -> str:
+    # Same markup as the USC occupancy pages: hour cells, free, overlapping, exam and class cells
+    rnd = random.Random(seed)
+    rows = []
+    for hour in range(9, 21):
+        cells = [f'<td class="hora">{hour}:00</td>']
+        for course in range(8):
+            cls = rnd.choice(["oc0", "oc1", "oc", "oc4", "oc3", "oc3", "oc3"])
+            if cls != "oc3":
+                cells.append(f'<td class="{cls}"><div>-</div></td>')
+                continue
+            session_type = rnd.choice(SESSION_TYPES)
+            group = rnd.randint(1, 4)
+            activity = f"Clase: Programación &amp; Ñ {course} [G40111{course:02d}] - Grupo /{session_type}_{group:02d}"
+            tooltip = f"&#10;return escape(&#10;    'Actividade: {activity}'&#10;);"
+            cells.append(f'<td class="oc3"><div onmouseover="{tooltip}"><span>{course}</span></div></td>')
+        rows.append(f"<tr>{''.join(cells)}</tr>")
+    return f'<html><body><table summary="Leyenda"><tr><td class="oc3">?</td></tr></table>' \
+           f'<table summary="Ocupación">{"".join(rows)}</table></body></html>'
+
+
+def test_parse_page_matches_beautiful_soup():
+    for seed in range(20):
+        page = generate_page(seed)
+        assert parse_page(page) == parse_content(get_schedule_content(page))
+
+
+def test_scrape_content_matches_beautiful_soup():
+    pages = [generate_page(seed) for seed in range(60)]
+
+    expected = {}
+    for i, page in enumerate(pages):
+        merge_page_content(expected, parse_content(get_schedule_content(page)), i // 5)
+
+    assert json.dumps(build_scrape_content(pages)) == json.dumps(expected)
+
+
+def test_fetch_page_replaces_stray_bytes(tmp_path):
+    # Encoding detection gives nothing for this page, so the charset of the response is used
+    page = "<p>Ocupación</p>\n".encode() * 200 + b"\x81"
+    with serve(lambda request: (200, {"Content-Type": "text/html; charset=utf-8"}, page)) as base_url, \
+            create_session(1) as session:
+        cache = ResponseCache(tmp_path)
+        fetched = fetch_page(session, RateLimiter(100.), cache, f"{base_url}/page", refresh=False)
+        cached = fetch_page(session, RateLimiter(100.), cache, f"{base_url}/page", refresh=False)
+
+    assert fetched.startswith("<p>Ocupación</p>")
+    assert fetched.endswith("\ufffd")
+    assert cached == fetched
+
+
+def test_decode_page_replaces_stray_bytes():
+    assert decode_page(b"Ocupaci\xf3n \xff", "utf-8") == "Ocupaci\ufffdn \ufffd"
+    assert decode_page(b"", None) == ""